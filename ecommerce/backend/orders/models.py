@@ -135,6 +135,9 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} - {self.user.email}"
@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from .models import Cart, CartItem, Order, OrderItem
-from products.serializers import ProductListSerializer
+from products.serializers import ProductListSerializer, ProductCardSerializer
+from shopfluence.fast_serializers import CompiledListSerializer
+from shopfluence.sparse_fields import SparseFieldsMixin
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for cart items"""
-    product = ProductListSerializer(read_only=True)
+    product = ProductCardSerializer(source='product.card', read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     is_available = serializers.BooleanField(read_only=True)
@@ -14,9 +16,10 @@ class CartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['id', 'product', 'product_id', 'quantity', 'total_price', 'is_available', 'created_at']
         read_only_fields = ['id', 'total_price', 'is_available', 'created_at']
+        list_serializer_class = CompiledListSerializer
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for shopping cart"""
     items = CartItemSerializer(many=True, read_only=True)
     total_items = serializers.IntegerField(read_only=True)
@@ -39,7 +42,7 @@ class UpdateCartItemSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1)
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for order items"""
     product = ProductListSerializer(read_only=True)
     
@@ -48,7 +51,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'product_name', 'product_sku', 'quantity', 'unit_price', 'total_price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for orders"""
     items = OrderItemSerializer(many=True, read_only=True)
     total_items = serializers.IntegerField(read_only=True)
@@ -105,7 +108,7 @@ class CreateOrderSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Invalid shipping address")
 
 
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Simplified serializer for order listing"""
     total_items = serializers.IntegerField(read_only=True)
     
@@ -115,6 +118,7 @@ class OrderListSerializer(serializers.ModelSerializer):
             'id', 'order_number', 'status', 'payment_status', 'total_amount',
             'total_items', 'created_at'
         ]
+        list_serializer_class = CompiledListSerializer
 
 
 class CheckoutSerializer(serializers.Serializer):
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from products.models import ProductCard
+from products.tests import CatalogTestCase, compiled_and_plain
+from .models import Cart, CartItem, Order, OrderItem
+from .serializers import CartItemSerializer, OrderListSerializer
+
+
+class CompiledSerializerTests(CatalogTestCase):
+    """CompiledListSerializer renders cart items and order lists exactly like DRF's ListSerializer"""
+
+    SPARSE_QUERIES = (
+        {'fields': 'id,quantity,product.name,product.category.slug'}, {'omit': 'product.brand,created_at'},
+        {'fields': 'id,order_number,total_items'}, {'omit': 'total_amount'},
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        user = cls.users[0]
+        cart = Cart.objects.create(user=user)
+        # The hose has no image and no original price; the laptop has lost its card
+        for product, quantity in ((cls.phone, 2), (cls.hose, 1), (cls.laptop, 20)):
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        ProductCard.objects.filter(pk=cls.laptop.pk).delete()
+
+        order = Order.objects.create(user=user, subtotal=Decimal('1023.50'), total_amount=Decimal('1023.50'))
+        for product, quantity in ((cls.phone, 2), (cls.hose, 1)):
+            OrderItem.objects.create(
+                order=order, product=product, product_name=product.name, product_sku=product.sku,
+                quantity=quantity, unit_price=product.price, total_price=product.price * quantity,
+            )
+        # No items at all
+        Order.objects.create(user=user, status='cancelled', subtotal=0, total_amount=0)
+
+    def assertSameOutput(self, serializer_class, instances):
+        for params in ({}, *self.SPARSE_QUERIES):
+            compiled, plain = compiled_and_plain(serializer_class, instances, **params)
+            self.assertEqual(compiled, plain, params)
+
+    def test_cart_item_serializer(self):
+        items = CartItem.objects.select_related('product__card').order_by('pk')
+        self.assertSameOutput(CartItemSerializer, items)
+        compiled, _ = compiled_and_plain(CartItemSerializer, items)
+        self.assertIn(b'"product":null', compiled)
+
+    def test_order_list_serializer(self):
+        self.assertSameOutput(OrderListSerializer, Order.objects.prefetch_related('items').order_by('pk'))
@@ -3,6 +3,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from shopfluence.pagination import KeysetPagination
+from shopfluence.renderers import StreamingListMixin
+from shopfluence.sparse_fields import SparseFields
 from .models import Cart, CartItem, Order, OrderItem
 from .serializers import (
     CartSerializer, CartItemSerializer, AddToCartSerializer, UpdateCartItemSerializer,
@@ -18,6 +22,15 @@ class CartView(generics.RetrieveAPIView):
 
     def get_object(self):
         cart, created = Cart.objects.get_or_create(user=self.request.user)
+        fields = SparseFields.from_request(self.request)
+        # The cart totals read the items and their products as well
+        if fields.wants('items') or fields.wants('total_items') or fields.wants('total_price'):
+            items = CartItem.objects.all()
+            if fields.wants('items.product'):
+                items = items.select_related('product__card')
+            elif fields.wants('total_price') or fields.wants('items.total_price') or fields.wants('items.is_available'):
+                items = items.select_related('product')
+            prefetch_related_objects([cart], Prefetch('items', queryset=items))
         return cart
 
 
@@ -167,13 +180,17 @@ class ClearCartView(generics.DestroyAPIView):
         return Response({'message': 'Cart cleared successfully'})
 
 
-class OrderListView(generics.ListAPIView):
+class OrderListView(StreamingListMixin, generics.ListAPIView):
     """List user's orders"""
     serializer_class = OrderListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        orders = Order.objects.filter(user=self.request.user)
+        if SparseFields.from_request(self.request).wants('total_items'):
+            orders = orders.prefetch_related(Prefetch('items', queryset=OrderItem.objects.only('order', 'quantity')))
+        return orders
 
 
 class OrderDetailView(generics.RetrieveAPIView):
@@ -182,7 +199,19 @@ class OrderDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        fields = SparseFields.from_request(self.request)
+        orders = Order.objects.filter(user=self.request.user)
+        for address in ('billing_address', 'shipping_address'):
+            if fields.wants(address):
+                orders = orders.select_related(address)
+        if fields.wants('items') or fields.wants('total_items'):
+            items = OrderItem.objects.all()
+            if fields.wants('items.product'):
+                items = items.select_related('product__category', 'product__brand', 'product__rating_summary')
+                if fields.wants('items.product.image'):
+                    items = items.prefetch_related('product__images')
+            orders = orders.prefetch_related(Prefetch('items', queryset=items))
+        return orders
 
 
 class CreateOrderView(generics.CreateAPIView):
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Category, Brand, Product, ProductImage, ProductSpecification, Review
+from .models import (
+    Category, Brand, Product, ProductImage, ProductSpecification, SpecAttribute, Review, RatingSummary, CatalogStats,
+)
+from . import response_cache
 
 
 class ProductImageInline(admin.TabularInline):
@@ -86,11 +89,18 @@ class ProductImageAdmin(admin.ModelAdmin):
 @admin.register(ProductSpecification)
 class ProductSpecificationAdmin(admin.ModelAdmin):
     list_display = ['product', 'name', 'value', 'order']
-    list_filter = ['order']
+    list_filter = ['attribute', 'order']
     search_fields = ['product__name', 'name', 'value']
     ordering = ['product', 'order']
 
 
+@admin.register(SpecAttribute)
+class SpecAttributeAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key']
+    search_fields = ['name', 'key']
+    ordering = ['name']
+
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ['product', 'user', 'rating', 'is_approved', 'created_at']
@@ -102,11 +112,34 @@ class ReviewAdmin(admin.ModelAdmin):
     actions = ['approve_reviews', 'disapprove_reviews']
     
     def approve_reviews(self, request, queryset):
+        product_ids = list(queryset.values_list('product_id', flat=True).distinct())
         updated = queryset.update(is_approved=True)
+        RatingSummary.rebuild(product_ids=product_ids)
+        CatalogStats.recount_category_reviews(
+            category_ids=Product.objects.filter(id__in=product_ids).values('category_id')
+        )
+        response_cache.invalidate('products')
         self.message_user(request, f'{updated} reviews have been approved.')
     approve_reviews.short_description = "Approve selected reviews"
     
     def disapprove_reviews(self, request, queryset):
+        product_ids = list(queryset.values_list('product_id', flat=True).distinct())
         updated = queryset.update(is_approved=False)
+        RatingSummary.rebuild(product_ids=product_ids)
+        CatalogStats.recount_category_reviews(
+            category_ids=Product.objects.filter(id__in=product_ids).values('category_id')
+        )
+        response_cache.invalidate('products')
         self.message_user(request, f'{updated} reviews have been disapproved.')
     disapprove_reviews.short_description = "Disapprove selected reviews"
+
+
+@admin.register(RatingSummary)
+class RatingSummaryAdmin(admin.ModelAdmin):
+    list_display = ['product', 'average_rating', 'review_count', 'updated_at']
+    search_fields = ['product__name']
+    ordering = ['-average_rating']
+    readonly_fields = [
+        'product', 'review_count', 'rating_sum', 'average_rating',
+        'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5', 'updated_at'
+    ]
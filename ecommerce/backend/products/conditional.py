@@ -0,0 +1,127 @@
+"""
+Validators for conditional GET on product and category detail.
+
+Each resource's ETag and Last-Modified come from one query over the
+``updated_at`` columns it is built from, so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with 304 before the detail serializer runs.
+Child deletes touch the product's ``updated_at`` (see signals), so removing an
+image or specification also moves the validators.
+
+The embedded related products (``RelatedProduct.cards_for``) are folded into
+the same query as correlated subqueries: the number of links and their newest
+id, which a RelatedProduct rebuild always changes, and the newest ``updated_at``
+of the linked cards, which any change to one of them (deactivation included)
+moves. When fewer links than are displayed are active, the page is filled up
+with the newest active cards of the category, so the ids and newest
+``updated_at`` of the category's ``FILL_WINDOW`` newest active cards are read as
+well; SQLite only evaluates those subqueries for such products, and reads them
+from the ``card_category_created_idx`` index.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import cache
+
+from django.db.models import Case, Count, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import Category, Product, ProductCard, ProductImage, ProductSpecification, RelatedProduct
+
+# Newest active category cards that can fill the related products: enough to skip
+# the product itself and every displayed link
+FILL_WINDOW = 2 * RelatedProduct.DISPLAYED
+
+EARLIEST = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def aggregate(rows, group, **expression):
+    """Correlated subquery for one aggregate over ``rows``, grouped by the column they are correlated on"""
+    (name, value), = expression.items()
+    return Subquery(rows.order_by().values(group).annotate(**{name: value}).values(name)[:1])
+
+
+def latest(model):
+    """Correlated subquery for the newest ``updated_at`` among a product's rows of ``model``"""
+    return aggregate(model.objects.filter(product=OuterRef('pk')), 'product', latest=Max('updated_at'))
+
+
+def related_validators():
+    """Annotations fingerprinting a product's embedded related products"""
+    links = RelatedProduct.objects.filter(product=OuterRef('pk'))
+    cards = ProductCard.objects.filter(category_id=OuterRef('category_id'), is_active=True)
+    oldest = ProductCard.objects.filter(category_id=OuterRef(OuterRef('category_id')), is_active=True).order_by(
+        '-created_at'
+    ).values('created_at')[FILL_WINDOW - 1:FILL_WINDOW]
+    # A category with fewer cards than the window has no boundary: all of its cards are in it
+    window = cards.filter(created_at__gte=Coalesce(Subquery(oldest), Value(EARLIEST)))
+    fill = Q(active_links__isnull=True) | Q(active_links__lt=RelatedProduct.DISPLAYED)
+    return {
+        'links': aggregate(links, 'product', total=Count('pk')),
+        'newest_link': aggregate(links, 'product', newest=Max('pk')),
+        'links_updated': aggregate(links, 'product', latest=Max('related__card__updated_at')),
+        'active_links': aggregate(links.filter(related__card__is_active=True), 'product', total=Count('pk')),
+        'fill_cards': Case(When(fill, then=aggregate(window, 'category', ids=Sum('pk')))),
+        'fill_updated': Case(When(fill, then=aggregate(window, 'category', latest=Max('updated_at')))),
+    }
+
+
+def strong_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+@cache
+def product_rows():
+    """
+    The annotated validator query, built once per process: resolving its
+    subqueries costs more than running them, so requests only add the slug
+    """
+    return Product.objects.filter(is_active=True).values('pk', 'category_id', 'updated_at').annotate(
+        images_updated=latest(ProductImage),
+        specifications_updated=latest(ProductSpecification),
+        summary_updated=Coalesce('rating_summary__updated_at', 'updated_at'),
+        **related_validators(),
+    )
+
+
+def product_validators(slug):
+    row = product_rows().filter(slug=slug).first()
+    if row is None:
+        return None
+    timestamps = [
+        row[key] for key in (
+            'updated_at', 'images_updated', 'specifications_updated', 'summary_updated', 'links_updated',
+            'fill_updated',
+        )
+        if row[key] is not None
+    ]
+    counts = [row[key] for key in ('links', 'newest_link', 'active_links', 'fill_cards')]
+    return strong_etag('product', row['pk'], counts, *timestamps), max(timestamps)
+
+
+def category_validators(slug):
+    row = Category.objects.filter(slug=slug, is_active=True).values('pk', 'updated_at').first()
+    if row is None:
+        return None
+    return strong_etag('category', row['pk'], row['updated_at']), row['updated_at']
+
+
+def conditional_get(compute):
+    """
+    Method decorator adding ETag/Last-Modified handling to a detail view's ``get``;
+    ``compute(slug)`` runs once per request and feeds both validators.
+    """
+    def validators(request, slug):
+        if not hasattr(request, '_conditional_validators'):
+            request._conditional_validators = compute(slug)
+        return request._conditional_validators
+
+    def etag(request, *args, slug=None, **kwargs):
+        found = validators(request, slug)
+        return found[0] if found else None
+
+    def last_modified(request, *args, slug=None, **kwargs):
+        found = validators(request, slug)
+        return found[1] if found else None
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified))
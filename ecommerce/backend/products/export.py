@@ -0,0 +1,159 @@
+"""
+Streaming catalog export for feed partners.
+
+``export_chunks(fmt)`` yields the active catalog as NDJSON (one product per
+line) or CSV, a chunk of products at a time. Products are read with
+``iterator(chunk_size=...)``; category, brand and rating summary are joined in
+and images and specifications prefetched once per chunk, so an export runs a
+constant number of queries per chunk and holds one chunk in memory however
+large the catalog is. ``gzip_chunks`` compresses such a stream on the fly.
+
+``/api/products/export/`` and ``manage.py export_catalog`` both write it.
+"""
+import csv
+import io
+import json
+import zlib
+
+from django.conf import settings
+from django.db.models import Prefetch
+from rest_framework.renderers import BaseRenderer
+
+from shopfluence.renderers import FastJSONRenderer
+
+from .models import Product, ProductImage, ProductSpecification
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# CSV columns; images are joined with IMAGE_SEPARATOR and specifications are a JSON object
+CSV_COLUMNS = [
+    'id', 'sku', 'slug', 'name', 'short_description', 'description', 'price', 'original_price',
+    'discount_percentage', 'stock_quantity', 'is_in_stock', 'category', 'category_path', 'brand',
+    'image', 'images', 'specifications', 'average_rating', 'review_count', 'updated_at',
+]
+IMAGE_SEPARATOR = '|'
+
+
+def export_queryset():
+    return Product.objects.filter(is_active=True).select_related(
+        'category', 'brand', 'rating_summary'
+    ).prefetch_related(
+        Prefetch('images', queryset=ProductImage.objects.only('product', 'image', 'is_primary', 'order', 'created_at')),
+        Prefetch('specifications', queryset=ProductSpecification.objects.only('product', 'name', 'value', 'order')),
+    ).order_by('pk')
+
+
+def image_url(image, build_uri=None):
+    """Remote image names are URLs already; local files get their storage URL, absolute when possible"""
+    name = str(image.image)
+    if name.startswith('http://') or name.startswith('https://'):
+        return name
+    url = image.image.url
+    return build_uri(url) if build_uri else url
+
+
+def product_row(product, build_uri=None):
+    images = [image_url(image, build_uri) for image in product.images.all() if image.image]
+    primary = next((image for image in product.images.all() if image.is_primary and image.image), None)
+    summary = product.get_rating_summary()
+    return {
+        'id': product.pk,
+        'sku': product.sku,
+        'slug': product.slug,
+        'name': product.name,
+        'short_description': product.short_description,
+        'description': product.description,
+        'price': str(product.price),
+        'original_price': str(product.original_price) if product.original_price is not None else None,
+        'discount_percentage': product.discount_percentage,
+        'stock_quantity': product.stock_quantity,
+        'is_in_stock': product.is_in_stock,
+        'category': product.category.slug,
+        'category_path': product.category.path,
+        'brand': product.brand.slug,
+        'image': image_url(primary, build_uri) if primary else (images[0] if images else None),
+        'images': images,
+        'specifications': {spec.name: spec.value for spec in product.specifications.all()},
+        'average_rating': summary.average_rating if summary else 0,
+        'review_count': summary.review_count if summary else 0,
+        'updated_at': product.updated_at.isoformat(),
+    }
+
+
+def product_chunks(queryset, chunk_size, build_uri=None):
+    """Lists of export rows, ``chunk_size`` products at a time"""
+    chunk = []
+    for product in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(product_row(product, build_uri))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ndjson_chunks(rows):
+    renderer = FastJSONRenderer()
+    for chunk in rows:
+        yield b''.join(renderer.render(row) + b'\n' for row in chunk)
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for chunk in rows:
+        for row in chunk:
+            writer.writerow([csv_value(column, row[column]) for column in CSV_COLUMNS])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def csv_value(column, value):
+    if column == 'images':
+        return IMAGE_SEPARATOR.join(value)
+    if column == 'specifications':
+        return json.dumps(value, ensure_ascii=False) if value else ''
+    if value is None:
+        return ''
+    return value
+
+
+def export_chunks(fmt, queryset=None, chunk_size=None, build_uri=None):
+    """The catalog as NDJSON or CSV bytes, one chunk of products per item"""
+    queryset = export_queryset() if queryset is None else queryset
+    rows = product_chunks(queryset, chunk_size or settings.CATALOG_EXPORT_CHUNK_SIZE, build_uri)
+    return ndjson_chunks(rows) if fmt == 'ndjson' else csv_chunks(rows)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a byte stream into one gzip member as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Selects the NDJSON export (``?format=ndjson``); renders error bodies as a single JSON line"""
+    media_type = FORMATS['ndjson']
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return FastJSONRenderer().render(data) + b'\n'
+
+
+class CSVRenderer(NDJSONRenderer):
+    """Selects the CSV export (``?format=csv``)"""
+    media_type = FORMATS['csv']
+    format = 'csv'
+    charset = 'utf-8'
@@ -0,0 +1,168 @@
+"""
+Facet counts for product search results.
+
+All requested facets come from a single grouped query over the filtered
+ProductCard queryset: rows are grouped by (brand, category) only, and the price,
+rating and stock buckets are conditional counts on each group, so the group
+count stays small no matter how many products match. The query can be served
+from the card_facet_idx covering index, and on SQLite it runs under a fixed
+time budget and is interrupted rather than slowing the response if it overruns.
+The ``spec`` facet is a second grouped query over the matching products'
+specification postings (spec_posting_idx), under the same budget.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import connection, OperationalError
+from django.db.models import Count, Min, Q
+
+from .models import Brand, Category, ProductSpecification, SpecAttribute
+
+FACET_NAMES = ('brand', 'category', 'price', 'rating', 'stock', 'spec')
+
+# Upper bounds of the price buckets; the last bucket is open-ended
+PRICE_BUCKETS = (25, 50, 100, 250, 500, 1000)
+
+# Minimum average rating for the "N stars & up" buckets
+RATING_BUCKETS = (4, 3, 2, 1)
+
+# Attributes (most common first) and values per attribute in the spec facet
+SPEC_FACET_ATTRIBUTES = 20
+SPEC_FACET_VALUES = 20
+
+FACET_TIME_BUDGET_MS = 200
+
+
+def parse_facets(value):
+    """Parse ``facets=brand,price`` into a tuple of known facet names"""
+    requested = {name.strip() for name in (value or '').split(',')}
+    return tuple(name for name in FACET_NAMES if name in requested)
+
+
+def price_bucket_label(index):
+    """Bounds of the price bucket at ``index`` (``max`` is None for the last one)"""
+    low = PRICE_BUCKETS[index - 1] if index else 0
+    high = PRICE_BUCKETS[index] if index < len(PRICE_BUCKETS) else None
+    key = f'{low}-{high}' if high is not None else f'{low}+'
+    return {'key': key, 'min': low, 'max': high}
+
+
+@contextmanager
+def time_budget(milliseconds):
+    """Interrupt SQLite statements that run past the budget (no-op on other engines)"""
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    connection.ensure_connection()
+    deadline = time.monotonic() + milliseconds / 1000
+    raw_connection = connection.connection
+    raw_connection.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+    try:
+        yield
+    finally:
+        raw_connection.set_progress_handler(None, 0)
+
+
+def compute_facets(queryset, facets, budget_ms=FACET_TIME_BUDGET_MS):
+    """
+    Return ``{facet: [{'key', ..., 'count'}, ...]}`` for the given facets,
+    or None if the grouped query did not finish within the budget.
+    """
+    if not facets:
+        return {}
+
+    group_by = [field for facet, field in (('brand', 'brand_id'), ('category', 'category_id')) if facet in facets]
+    # Count a column of card_facet_idx rather than the pk so the scan stays index-only
+    aggregates = {'total': Count('*')}
+    if 'price' in facets:
+        # Cumulative "cheaper than bound" counts; buckets are differences of neighbours
+        for index, bound in enumerate(PRICE_BUCKETS):
+            aggregates[f'price_lt_{index}'] = Count('is_active', filter=Q(price__lt=bound))
+    if 'rating' in facets:
+        for stars in RATING_BUCKETS:
+            aggregates[f'rating_gte_{stars}'] = Count('is_active', filter=Q(average_rating__gte=stars))
+    if 'stock' in facets:
+        aggregates['in_stock'] = Count('is_active', filter=Q(is_in_stock=True))
+
+    grouped = queryset.order_by()
+    if group_by:
+        grouped = grouped.values(*group_by).annotate(**aggregates)
+    spec_rows = None
+    try:
+        with time_budget(budget_ms):
+            rows = list(grouped) if group_by else [grouped.aggregate(**aggregates)]
+            if 'spec' in facets:
+                spec_rows = list(
+                    ProductSpecification.objects.filter(product_id__in=queryset.values('product_id'))
+                    .order_by().values('attribute_id', 'value_key').annotate(count=Count('*'), label=Min('value'))
+                )
+    except OperationalError:
+        return None
+
+    result = rollup(rows, facets)
+    if spec_rows is not None:
+        result['spec'] = spec_facet(spec_rows)
+    return result
+
+
+def spec_facet(rows):
+    """``[{'key', 'label', 'values': [{'key', 'label', 'count'}, ...]}, ...]`` from grouped postings"""
+    values = {}
+    for row in rows:
+        values.setdefault(row['attribute_id'], []).append(
+            {'key': row['value_key'], 'label': row['label'], 'count': row['count']}
+        )
+    covered = sorted(values, key=lambda pk: -sum(value['count'] for value in values[pk]))[:SPEC_FACET_ATTRIBUTES]
+    attributes = SpecAttribute.objects.in_bulk(covered)
+    facet = []
+    for pk in covered:
+        buckets = sorted(values[pk], key=lambda value: (-value['count'], value['label']))[:SPEC_FACET_VALUES]
+        facet.append({'key': attributes[pk].key, 'label': attributes[pk].name, 'values': buckets})
+    return sorted(facet, key=lambda attribute: attribute['label'])
+
+
+def rollup(rows, facets):
+    result = {}
+    if 'brand' in facets:
+        result['brand'] = _count_by(rows, 'brand_id', Brand)
+    if 'category' in facets:
+        result['category'] = _count_by(rows, 'category_id', Category)
+    if 'price' in facets:
+        total = sum(row['total'] for row in rows)
+        cumulative = [sum(row[f'price_lt_{index}'] for row in rows) for index in range(len(PRICE_BUCKETS))]
+        cumulative.append(total)
+        result['price'] = [
+            dict(price_bucket_label(index), count=count - (cumulative[index - 1] if index else 0))
+            for index, count in enumerate(cumulative)
+        ]
+    if 'rating' in facets:
+        result['rating'] = [
+            {
+                'key': f'{stars}_and_up',
+                'min_rating': stars,
+                'count': sum(row[f'rating_gte_{stars}'] for row in rows),
+            }
+            for stars in RATING_BUCKETS
+        ]
+    if 'stock' in facets:
+        in_stock = sum(row['in_stock'] for row in rows)
+        result['stock'] = [
+            {'key': 'in_stock', 'count': in_stock},
+            {'key': 'out_of_stock', 'count': sum(row['total'] for row in rows) - in_stock},
+        ]
+    return result
+
+
+def _count_by(rows, field, model):
+    counts = {}
+    for row in rows:
+        counts[row[field]] = counts.get(row[field], 0) + row['total']
+    labels = {
+        pk: (slug, name)
+        for pk, slug, name in model.objects.filter(pk__in=counts).values_list('pk', 'slug', 'name')
+    }
+    buckets = [
+        {'key': labels[pk][0], 'label': labels[pk][1], 'count': count}
+        for pk, count in counts.items() if pk in labels
+    ]
+    return sorted(buckets, key=lambda bucket: (-bucket['count'], bucket['label']))
@@ -0,0 +1,57 @@
+import django_filters
+from django.db.models import Count, Q
+
+from .models import Category, ProductCard, ProductSpecification, SpecAttribute, spec_value_key
+
+SPEC_PARAM_PREFIX = 'spec.'
+
+
+def in_category(queryset, slug):
+    """Cards of the category with ``slug`` or any of its subcategories"""
+    return queryset.filter(category_id__in=Category.subtree(slug).values('pk'))
+
+
+def parse_spec_filters(params):
+    """``spec.ram=16GB&spec.color=Black&spec.color=White`` -> ``{'ram': ['16gb'], 'color': ['black', 'white']}``"""
+    specs = {}
+    for param in params:
+        if param.startswith(SPEC_PARAM_PREFIX):
+            values = [spec_value_key(value) for value in params.getlist(param) if value.strip()]
+            if values:
+                specs.setdefault(param[len(SPEC_PARAM_PREFIX):].strip().lower(), []).extend(values)
+    return specs
+
+
+def with_specs(queryset, specs):
+    """
+    Cards having one of the wanted values for every attribute (values of one
+    attribute are ORed). The posting lists of all wanted (attribute, value) pairs
+    are index ranges of spec_posting_idx read in one pass, and a product is kept
+    when it shows up under as many distinct attributes as were asked for.
+    """
+    if not specs:
+        return queryset
+    # Resolve the attribute dictionary first so every posting lookup is an index range
+    attributes = dict(SpecAttribute.objects.filter(key__in=specs).values_list('key', 'pk'))
+    if len(attributes) < len(specs):
+        return queryset.none()
+    postings = Q()
+    for key, values in specs.items():
+        postings |= Q(attribute_id=attributes[key], value_key__in=values)
+    matching = ProductSpecification.objects.filter(postings).order_by().values('product_id').annotate(
+        attributes=Count('attribute_id', distinct=True)
+    ).filter(attributes=len(specs)).values('product_id')
+    return queryset.filter(product_id__in=matching)
+
+
+class ProductCardFilter(django_filters.FilterSet):
+    """Keeps the public product list filter names while querying ProductCard columns"""
+    category__slug = django_filters.CharFilter(method='filter_category')
+    brand__slug = django_filters.CharFilter(field_name='brand_slug')
+
+    class Meta:
+        model = ProductCard
+        fields = ['is_featured', 'is_new_arrival', 'is_bestseller']
+
+    def filter_category(self, queryset, name, value):
+        return in_category(queryset, value)
@@ -0,0 +1,537 @@
+"""
+Streaming product import for XML, CSV and NDJSON feeds.
+
+Feeds carry one product per record, keyed by ``sku``, with the columns of the
+catalog export (see products.export): ``name``, ``slug``, ``price``,
+``original_price``, ``stock_quantity``, the ``is_*`` flags, ``category`` and
+``brand`` (slug or name), ``image``/``images`` and ``specifications``. Keys a
+record leaves out keep their stored value on update.
+
+The readers (``read_xml`` with ``iterparse``, ``read_csv``, ``read_ndjson``)
+yield ``(line, record)`` pairs one at a time. ``ProductImporter`` upserts them
+in batches: one query finds the batch's existing SKUs, new products go in with
+``bulk_create`` and changed ones with ``bulk_update``, and images and
+specifications are only rewritten for products whose list changed. Brands,
+categories and specification attributes are looked up in dictionaries loaded
+once. Bulk writes, and the raw deletes of replaced images and specifications,
+skip the model signals, so each batch then refreshes the read models itself
+(product cards, search index, snapshot) and the run ends by recounting the
+counters it touched and queueing the new images stored under MEDIA_ROOT for
+background rendering (products.renditions). Memory is bounded by the batch size.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.conf import settings
+from django.db import reset_queries, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import renditions, response_cache, search, snapshot, suggest
+from .models import (
+    Brand, CatalogStats, Category, Product, ProductCard, ProductImage, ProductSpecification, RatingSummary,
+    SpecAttribute, recount_active_products,
+)
+
+FORMATS = ('xml', 'csv', 'ndjson')
+
+DECIMAL_FIELDS = ('price', 'original_price', 'weight', 'length', 'width', 'height')
+INTEGER_FIELDS = ('stock_quantity', 'low_stock_threshold')
+BOOLEAN_FIELDS = ('is_active', 'is_featured', 'is_new_arrival', 'is_bestseller')
+TEXT_FIELDS = ('name', 'description', 'short_description', 'meta_title', 'meta_description')
+REQUIRED_FIELDS = ('name', 'price', 'category', 'brand')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f', ''}
+
+# Only the first errors are kept with their line numbers; the rest are just counted
+MAX_REPORTED_ERRORS = 50
+
+# CSV cells of the export: images joined with '|', specifications as a JSON object
+IMAGE_SEPARATOR = '|'
+
+
+class FeedError(ValueError):
+    """The feed as a whole cannot be read (malformed XML, unknown format)"""
+
+
+class RowError(ValueError):
+    """One record is invalid; it is reported and skipped"""
+
+
+def detect_format(name):
+    """Format from a file name, ``catalog.csv.gz`` -> ``csv``"""
+    base = name[:-3] if name.endswith('.gz') else name
+    extension = os.path.splitext(base)[1].lstrip('.').lower()
+    extension = 'ndjson' if extension == 'jsonl' else extension
+    if extension not in FORMATS:
+        raise FeedError(f'Cannot tell the feed format of {name}; pass one of {", ".join(FORMATS)}')
+    return extension
+
+
+def open_feed(path):
+    """Binary stream of a feed file, decompressing ``.gz`` files on the fly"""
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def read_feed(stream, fmt):
+    return {'xml': read_xml, 'csv': read_csv, 'ndjson': read_ndjson}[fmt](stream)
+
+
+def read_ndjson(stream):
+    for line, text in enumerate(stream, 1):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as error:
+            yield line, RowError(f'Invalid JSON: {error}')
+            continue
+        yield line, record if isinstance(record, dict) else RowError('Each line must hold a JSON object')
+
+
+def read_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='') if isinstance(stream, io.BufferedIOBase) else stream
+    reader = csv.DictReader(text)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_xml(stream):
+    """
+    ``<products><product><sku>..</sku>..<images><image>url</image></images>
+    <specifications><specification name="Color">Red</specification></specifications>
+    </product></products>``; each product is dropped from the tree once read.
+    Expat does not fetch external entities, so a DOCTYPE cannot pull in local files.
+    """
+    open_elements = []
+    count = 0
+    try:
+        for event, element in iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                open_elements.append(element)
+                continue
+            open_elements.pop()
+            if element.tag != 'product':
+                continue
+            count += 1
+            yield count, xml_record(element)
+            if open_elements:
+                open_elements[-1].remove(element)
+    except ParseError as error:
+        raise FeedError(f'Malformed XML: {error}')
+
+
+def xml_record(element):
+    record = {}
+    for child in element:
+        if child.tag == 'images':
+            record['images'] = [(image.text or '').strip() for image in child if (image.text or '').strip()]
+        elif child.tag == 'specifications':
+            record['specifications'] = {spec.get('name', ''): (spec.text or '').strip() for spec in child}
+        else:
+            record[child.tag] = (child.text or '').strip()
+    return record
+
+
+def clean_decimal(name, value):
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise RowError(f'{name} must be a number')
+    if not number.is_finite() or number < 0:
+        raise RowError(f'{name} must be a non-negative number')
+    field = Product._meta.get_field(name)
+    try:
+        number = number.quantize(Decimal(1).scaleb(-field.decimal_places))
+    except InvalidOperation:
+        raise RowError(f'{name} is too large')
+    if len(number.as_tuple().digits) > field.max_digits:
+        raise RowError(f'{name} is too large')
+    return number
+
+
+def clean_text(name, value):
+    text = str(value if value is not None else '').strip()
+    max_length = Product._meta.get_field(name).max_length
+    if max_length and len(text) > max_length:
+        raise RowError(f'{name} is longer than {max_length} characters')
+    return text
+
+
+def clean_integer(name, value):
+    try:
+        number = int(str(value).strip() or 0)
+    except ValueError:
+        raise RowError(f'{name} must be an integer')
+    if number < 0:
+        raise RowError(f'{name} must not be negative')
+    return number
+
+
+def clean_boolean(name, value):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f'{name} must be true or false')
+
+
+def clean_images(record):
+    images = record.get('images')
+    if isinstance(images, str):
+        images = [url.strip() for url in images.split(IMAGE_SEPARATOR) if url.strip()]
+    images = list(dict.fromkeys(images or []))
+    primary = (record.get('image') or '').strip() if isinstance(record.get('image'), str) else ''
+    if primary and primary not in images:
+        images.insert(0, primary)
+    primary = primary or (images[0] if images else '')
+    max_length = ProductImage._meta.get_field('image').max_length
+    if any(len(url) > max_length for url in images):
+        raise RowError(f'Image URLs are limited to {max_length} characters')
+    return [(url, url == primary) for url in images]
+
+
+def clean_specifications(value):
+    if isinstance(value, str):
+        if not value.strip():
+            return {}
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise RowError('specifications must be a JSON object')
+    if not isinstance(value, dict):
+        raise RowError('specifications must be an object of name: value')
+    specs = {}
+    for name, spec_value in value.items():
+        name = str(name).strip()[:100]
+        if name and name not in specs:
+            specs[name] = str(spec_value if spec_value is not None else '').strip()[:500]
+    return specs
+
+
+def clean_record(record):
+    """Validated field values of a feed record; only keys present in the record are returned"""
+    sku = str(record.get('sku') or '').strip()
+    if not sku:
+        raise RowError('sku is required')
+    if len(sku) > 50:
+        raise RowError('sku is longer than 50 characters')
+    cleaned = {'sku': sku}
+    for name in TEXT_FIELDS:
+        if name in record:
+            cleaned[name] = clean_text(name, record[name])
+    if 'slug' in record and record['slug']:
+        cleaned['slug'] = slugify(str(record['slug']))[:200]
+    for name in DECIMAL_FIELDS:
+        if name in record:
+            cleaned[name] = clean_decimal(name, record[name])
+    for name in INTEGER_FIELDS:
+        if name in record:
+            cleaned[name] = clean_integer(name, record[name])
+    for name in BOOLEAN_FIELDS:
+        if name in record:
+            cleaned[name] = clean_boolean(name, record[name])
+    for name in ('category', 'brand'):
+        if record.get(name):
+            cleaned[name] = str(record[name]).strip()
+    if 'images' in record or 'image' in record:
+        cleaned['images'] = clean_images(record)
+    if 'specifications' in record:
+        cleaned['specifications'] = clean_specifications(record['specifications'])
+    for name in ('name', 'price'):
+        if name in cleaned and cleaned[name] in (None, ''):
+            raise RowError(f'{name} must not be empty')
+    return cleaned
+
+
+class ImportResult:
+    """Counters of an import run, with the first errors and the throughput"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.finished = None
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    @property
+    def seconds(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'skipped': self.skipped,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class ProductImporter:
+    """
+    Upsert products by SKU from ``(line, record)`` pairs, ``batch_size`` records per
+    transaction. ``create_missing`` creates unknown brands and categories instead of
+    rejecting their rows; ``update_existing=False`` leaves known SKUs untouched.
+    """
+
+    def __init__(self, batch_size=None, create_missing=False, update_existing=True, progress=None):
+        self.batch_size = batch_size or settings.PRODUCT_IMPORT_BATCH_SIZE
+        self.create_missing = create_missing
+        self.update_existing = update_existing
+        self.progress = progress
+        self.result = ImportResult()
+        self.brands = self.lookup(Brand)
+        self.categories = self.lookup(Category)
+        self.attributes = {attribute.key: attribute for attribute in SpecAttribute.objects.all()}
+        self.touched_brands = set()
+        self.touched_categories = set()
+        # New images stored under MEDIA_ROOT, rendered once the import is done
+        self.local_images = []
+
+    @staticmethod
+    def lookup(model):
+        """Rows by slug and by case-folded name"""
+        rows = {}
+        for row in model.objects.all():
+            rows.setdefault(row.name.casefold(), row)
+            rows[row.slug] = row
+        return rows
+
+    def run(self, records):
+        batch = {}
+        for line, record in records:
+            self.result.rows += 1
+            if isinstance(record, Exception):
+                self.result.add_error(line, str(record))
+                continue
+            try:
+                cleaned = clean_record(record)
+            except RowError as error:
+                self.result.add_error(line, str(error))
+                continue
+            # A SKU repeated within a batch: the later record wins
+            batch.pop(cleaned['sku'], None)
+            batch[cleaned['sku']] = (line, cleaned)
+            if len(batch) >= self.batch_size:
+                self.import_batch(list(batch.values()))
+                batch = {}
+        if batch:
+            self.import_batch(list(batch.values()))
+        self.finish()
+        self.result.errors.sort(key=lambda error: error['line'])
+        self.result.finished = time.monotonic()
+        return self.result
+
+    def resolve(self, model, rows, value):
+        row = rows.get(value) or rows.get(value.casefold()) or rows.get(slugify(value))
+        if row is None and self.create_missing and slugify(value):
+            # Saved one by one: the signals keep paths and catalog totals right for these few rows
+            row = model.objects.create(name=value[:100], slug=slugify(value)[:50])
+            rows[row.slug] = rows[row.name.casefold()] = row
+        return row
+
+    def import_batch(self, batch):
+        with transaction.atomic():
+            existing = Product.objects.filter(sku__in=[cleaned['sku'] for _, cleaned in batch]).in_bulk(field_name='sku')
+            new, changed, children = [], [], []
+            fields = set()
+            for line, cleaned in batch:
+                product = existing.get(cleaned['sku'])
+                if product is not None and not self.update_existing:
+                    self.result.skipped += 1
+                    continue
+                try:
+                    changes = self.product_changes(cleaned, product)
+                except RowError as error:
+                    self.result.add_error(line, str(error))
+                    continue
+                if product is None:
+                    product = Product(sku=cleaned['sku'], **changes)
+                    new.append(product)
+                elif changes:
+                    self.touched_categories.add(product.category_id)
+                    self.touched_brands.add(product.brand_id)
+                    for name, value in changes.items():
+                        setattr(product, name, value)
+                    fields.update(changes)
+                    changed.append(product)
+                children.append((product, cleaned))
+            self.assign_slugs(new, changed)
+
+            Product.objects.bulk_create(new)
+            if any(product.pk is None for product in new):
+                # Backends that cannot return ids from a bulk insert
+                ids = dict(Product.objects.filter(sku__in=[product.sku for product in new]).values_list('sku', 'pk'))
+                for product in new:
+                    product.pk = ids[product.sku]
+            if changed:
+                now = timezone.now()
+                for product in changed:
+                    product.updated_at = now
+                Product.objects.bulk_update(changed, sorted(fields | {'updated_at'}))
+            self.touched_categories.update(product.category_id for product in new + changed)
+            self.touched_brands.update(product.brand_id for product in new + changed)
+
+            rewritten = self.write_children(children)
+            if rewritten:
+                # Image and specification changes move the product's updated_at too
+                Product.objects.filter(pk__in=rewritten).exclude(pk__in=[product.pk for product in new]).update(
+                    updated_at=timezone.now()
+                )
+
+            new_ids = [product.pk for product in new]
+            changed_ids = {product.pk for product in changed} | rewritten
+            self.result.created += len(new_ids)
+            self.result.updated += len(changed_ids - set(new_ids))
+            self.result.unchanged += len(children) - len(new_ids) - len(changed_ids - set(new_ids))
+
+            touched = new_ids + sorted(changed_ids - set(new_ids))
+            if touched:
+                RatingSummary.objects.bulk_create(
+                    [RatingSummary(product_id=pk) for pk in new_ids], ignore_conflicts=True
+                )
+                ProductCard.refresh(product_ids=touched)
+                search.index_products(touched)
+                transaction.on_commit(lambda: snapshot.update_products(touched))
+        # With DEBUG on, the connection keeps the SQL of every query, bulk inserts included
+        reset_queries()
+        if self.progress:
+            self.progress(self.result)
+
+    def product_changes(self, cleaned, product):
+        """Field values to write: all of them for a new product, only the differing ones otherwise"""
+        values = {name: cleaned[name] for name in (*TEXT_FIELDS, *DECIMAL_FIELDS, *INTEGER_FIELDS, *BOOLEAN_FIELDS)
+                  if name in cleaned}
+        if 'slug' in cleaned:
+            values['slug'] = cleaned['slug']
+        for name, model, rows in (('category', Category, self.categories), ('brand', Brand, self.brands)):
+            if name in cleaned:
+                row = self.resolve(model, rows, cleaned[name])
+                if row is None:
+                    raise RowError(f'Unknown {name} "{cleaned[name]}"')
+                values[f'{name}_id'] = row.pk
+
+        if product is None:
+            missing = [name for name in REQUIRED_FIELDS if name not in cleaned]
+            if missing:
+                raise RowError(f'New products need {", ".join(missing)}')
+            values.setdefault('description', '')
+            values.setdefault('slug', slugify(values['name'])[:200] or slugify(cleaned['sku']))
+        else:
+            values = {name: value for name, value in values.items() if getattr(product, name) != value}
+
+        # Product.save derives the discount from the two prices
+        price = values.get('price', product.price if product else None)
+        original_price = values.get('original_price', product.original_price if product else None)
+        if original_price and original_price > price:
+            discount = int(((original_price - price) / original_price) * 100)
+            if product is None or product.discount_percentage != discount:
+                values['discount_percentage'] = discount
+        return values
+
+    def assign_slugs(self, new, changed):
+        """Slugs are unique: a taken one gets the SKU appended"""
+        candidates = [product for product in new + changed]
+        wanted = {product.slug for product in candidates}
+        taken = dict(Product.objects.filter(slug__in=wanted).values_list('slug', 'sku'))
+        claimed = set()
+        for product in candidates:
+            owner = taken.get(product.slug)
+            if (owner is not None and owner != product.sku) or product.slug in claimed:
+                product.slug = f'{product.slug[:150]}-{slugify(product.sku)}'[:200]
+            claimed.add(product.slug)
+
+    def write_children(self, children):
+        """Replace images and specifications where the record's list differs; returns those product ids"""
+        with_images = [(product, cleaned['images']) for product, cleaned in children if 'images' in cleaned]
+        with_specs = [(product, cleaned['specifications']) for product, cleaned in children if 'specifications' in cleaned]
+        rewritten = set()
+
+        stored_images = {}
+        for product_id, name, is_primary in ProductImage.objects.filter(
+            product_id__in=[product.pk for product, _ in with_images]
+        ).order_by('product_id', 'order', 'created_at').values_list('product_id', 'image', 'is_primary'):
+            stored_images.setdefault(product_id, []).append((name, is_primary))
+        images = [(product, wanted) for product, wanted in with_images if stored_images.get(product.pk, []) != wanted]
+        if images:
+            # A raw delete sends no per-row post_delete: the batch refreshes cards, index and updated_at itself
+            stale = ProductImage.objects.filter(product_id__in=[product.pk for product, _ in images])
+            stale._raw_delete(stale.db)
+            created = ProductImage.objects.bulk_create([
+                ProductImage(product=product, image=url, alt_text=product.name[:200], is_primary=is_primary, order=order)
+                for product, wanted in images for order, (url, is_primary) in enumerate(wanted)
+            ])
+            self.local_images.extend(
+                image.pk for image in created if image.pk and not str(image.image).startswith(('http://', 'https://'))
+            )
+            rewritten.update(product.pk for product, _ in images)
+
+        stored_specs = {}
+        for product_id, name, value in ProductSpecification.objects.filter(
+            product_id__in=[product.pk for product, _ in with_specs]
+        ).order_by('product_id', 'order', 'name').values_list('product_id', 'name', 'value'):
+            stored_specs.setdefault(product_id, {})[name] = value
+        specs = [(product, wanted) for product, wanted in with_specs if stored_specs.get(product.pk, {}) != wanted]
+        if specs:
+            stale = ProductSpecification.objects.filter(product_id__in=[product.pk for product, _ in specs])
+            stale._raw_delete(stale.db)
+            rows = []
+            for product, wanted in specs:
+                for order, (name, value) in enumerate(wanted.items()):
+                    spec = ProductSpecification(product=product, name=name, value=value, order=order)
+                    spec.attribute = self.attribute(name)
+                    spec.normalize()
+                    rows.append(spec)
+            ProductSpecification.objects.bulk_create(rows)
+            rewritten.update(product.pk for product, _ in specs)
+        return rewritten
+
+    def attribute(self, name):
+        key = SpecAttribute.key_for(name)
+        if key not in self.attributes:
+            self.attributes[key] = SpecAttribute.for_name(name)
+        return self.attributes[key]
+
+    def finish(self):
+        """Counters and caches the bulk writes bypassed"""
+        if self.touched_categories:
+            recount_active_products(Category, ids=self.touched_categories)
+        if self.touched_brands:
+            recount_active_products(Brand, ids=self.touched_brands)
+        if self.result.created or self.result.updated:
+            CatalogStats.reconcile()
+            response_cache.invalidate('products', 'categories', 'brands')
+            suggest.invalidate()
+        # Rendering takes seconds per image; an import run from a request must not wait for it
+        renditions.schedule(self.local_images)
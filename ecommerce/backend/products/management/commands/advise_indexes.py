@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from orders.views import OrderListView
+from products import views
+from products.models import Brand, Category, Product, ProductCard
+from shopfluence import query_advisor
+from wishlist.models import WishlistItem
+
+PAGE_SIZE = 20
+
+
+def view_queryset(view_class, params=None, user=None, **kwargs):
+    """The queryset a list view builds for a GET with ``params``, before pagination"""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    if user is not None:
+        request.user = user
+    view = view_class(request=request, args=(), kwargs=kwargs, format_kwarg=None)
+    return view.filter_queryset(view.get_queryset())
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN for the query shapes of the catalog, order and wishlist views, '
+        'flag full scans and temporary sorts, and propose indexes for them'
+    )
+
+    def shapes(self):
+        user = get_user_model()(pk=1)
+        product = Product.objects.filter(is_active=True).only('slug', 'category_id').first()
+
+        yield 'product list', view_queryset(views.ProductListView)
+        yield 'product list by price', view_queryset(views.ProductListView, {'ordering': 'price'})
+        yield 'product list by rating', view_queryset(views.ProductListView, {'ordering': '-average_rating'})
+        yield 'product list, price range', view_queryset(views.ProductListView, {'min_price': 10, 'max_price': 100})
+        yield 'product list, category', view_queryset(views.ProductListView, {'category__slug': 'electronics'})
+        yield 'product list, brand', view_queryset(views.ProductListView, {'brand__slug': 'apple'})
+        yield 'product list, featured', view_queryset(views.ProductListView, {'is_featured': 'true'})
+        for sort_by in ('featured', 'price-low', 'price-high', 'rating', 'newest', 'name'):
+            yield f'search sorted by {sort_by}', view_queryset(views.ProductSearchView, {'sort_by': sort_by})
+        yield 'search, category', view_queryset(views.ProductSearchView, {'category': 'electronics'})
+        yield 'search, brands', view_queryset(views.ProductSearchView, {'brands': ['apple', 'samsung']})
+        yield 'search, in stock', view_queryset(views.ProductSearchView, {'in_stock_only': 'true'})
+        yield 'featured products', view_queryset(views.FeaturedProductsView)
+        yield 'new arrivals', view_queryset(views.NewArrivalsView)
+        yield 'bestsellers', view_queryset(views.BestsellersView)
+        yield 'categories', view_queryset(views.CategoryListView)
+        yield 'brands', view_queryset(views.BrandListView)
+        yield 'active product count', Product.objects.filter(is_active=True).order_by()
+        if product is not None:
+            yield 'product reviews', view_queryset(views.ProductReviewsView, slug=product.slug)
+            yield 'related products, category fill', ProductCard.objects.filter(
+                category_id=product.category_id, is_active=True
+            ).exclude(pk__in=[product.pk])
+        yield 'user reviews', view_queryset(views.UserReviewsView, user=user)
+        yield 'order list', view_queryset(OrderListView, user=user)
+        yield 'wishlist items', WishlistItem.objects.filter(wishlist_id=1)
+        yield 'category detail', Category.objects.filter(is_active=True, slug='electronics')
+        yield 'brand detail', Brand.objects.filter(is_active=True, slug='apple')
+
+    def handle(self, *args, **options):
+        try:
+            reports = query_advisor.advise(
+                (name, queryset if queryset.query.is_sliced else queryset[:PAGE_SIZE])
+                for name, queryset in self.shapes()
+            )
+        except NotImplementedError as error:
+            raise CommandError(str(error))
+
+        verbosity = options['verbosity']
+        for report in reports:
+            problems = [f'full scan of {table}' for table in report.full_scans]
+            problems += [f'temp B-tree for {clause}' for clause in report.temp_sorts]
+            status = self.style.WARNING('; '.join(problems)) if problems else self.style.SUCCESS('ok')
+            self.stdout.write(f'{report.name}: {status}')
+            if report.covered_by:
+                self.stdout.write(f'    indexed by {report.covered_by} once it is created')
+            if report.unresolved_by:
+                self.stdout.write(f'    still flagged with {report.unresolved_by}; no single index serves this shape')
+            if report.proposal:
+                self.stdout.write(f'    propose on {report.proposal.model.__name__}: {report.proposal.as_code()}')
+            if verbosity > 1:
+                self.stdout.write(f'    {report.sql}')
+                for detail in report.plan:
+                    self.stdout.write(f'      {detail}')
+
+        proposals = [report.proposal for report in reports if report.proposal]
+        self.stdout.write('')
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS('No missing indexes'))
+            return
+        self.stdout.write(self.style.WARNING(f'{len(proposals)} missing index(es):'))
+        for proposal in proposals:
+            self.stdout.write(f'  {proposal.model._meta.label}: {proposal.as_code()}')
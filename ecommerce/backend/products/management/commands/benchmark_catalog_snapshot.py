@@ -0,0 +1,156 @@
+import random
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from products import snapshot
+from products.models import Brand, Category, Product, ProductCard
+
+BATCH_SIZE = 5000
+PAGE_SIZE = 20
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the columnar snapshot against the ORM for the list/search filters and sorts. '
+        'Synthetic products are created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per scenario (the median is reported)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        directory = tempfile.mkdtemp(prefix='catalog-snapshot-bench-')
+        try:
+            with transaction.atomic():
+                self.run(sorted(options['sizes']), options['repeat'], directory)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, sizes, repeat, directory):
+        categories = Category.objects.bulk_create(
+            Category(name=f'Bench category {index}', slug=f'bench-category-{index}') for index in range(20)
+        )
+        brands = Brand.objects.bulk_create(
+            Brand(name=f'Bench brand {index}', slug=f'bench-brand-{index}') for index in range(50)
+        )
+        self.category, self.brands = categories[0], brands[:3]
+
+        created = 0
+        for size in sizes:
+            started = time.monotonic()
+            self.create_products(created, size - created, categories, brands)
+            created = size
+            self.stdout.write(f'\n{size} products (generated in {time.monotonic() - started:.1f}s)')
+
+            started = time.monotonic()
+            snapshot.rebuild(directory)
+            catalog = snapshot.Snapshot(directory, open(snapshot.current_path(directory)).read().strip())
+            self.stdout.write(f'  snapshot built in {time.monotonic() - started:.1f}s')
+
+            self.stdout.write(f'  {"scenario":<44}{"orm ms":>10}{"snapshot ms":>14}{"speedup":>10}')
+            for name, orm_query, snapshot_query in self.scenarios(catalog):
+                orm_ms = self.median(orm_query, repeat)
+                snapshot_ms = self.median(snapshot_query, repeat)
+                if orm_query() != snapshot_query():
+                    name += ' (results differ)'
+                self.stdout.write(
+                    f'  {name:<44}{orm_ms:>10.2f}{snapshot_ms:>14.2f}{orm_ms / max(snapshot_ms, 1e-6):>9.1f}x'
+                )
+
+    def scenarios(self, catalog):
+        """(name, orm, snapshot) triples; both callables return (total, page ids)"""
+        active = ProductCard.objects.filter(is_active=True)
+        brand_ids = [brand.id for brand in self.brands]
+        cases = [
+            ('newest, page 1', active, {}, 'newest', 1, ('-created_at', '-pk')),
+            ('category + price range, price-low', active.filter(
+                category_id=self.category.id, price__gte=50, price__lte=500,
+            ), {'category_ids': [self.category.id], 'min_price': 50, 'max_price': 500}, 'price-low', 1, ('price', 'pk')),
+            ('in stock + rating >= 4, rating, page 50', active.filter(is_in_stock=True, average_rating__gte=4), {
+                'require_flags': snapshot.IN_STOCK, 'min_rating': 4,
+            }, 'rating', 50, ('-average_rating', '-review_count', '-pk')),
+            ('3 brands, featured, page 10', active.filter(brand_id__in=brand_ids), {'brand_ids': brand_ids},
+             'featured', 10, ('-is_featured', '-is_bestseller', '-created_at', '-pk')),
+            ('price-high, page 500', active, {}, 'price-high', 500, ('-price', '-pk')),
+        ]
+        for name, queryset, filters, ordering, page, order_by in cases:
+            offset = (page - 1) * PAGE_SIZE
+
+            def orm(queryset=queryset, order_by=order_by, offset=offset):
+                ids = queryset.order_by(*order_by).values_list('pk', flat=True)[offset:offset + PAGE_SIZE]
+                return queryset.count(), list(ids)
+
+            def columnar(filters=filters, ordering=ordering, offset=offset):
+                results = snapshot.SnapshotResults(catalog, catalog.filter(**filters), ordering, list)
+                return results.count(), results[offset:offset + PAGE_SIZE]
+
+            yield name, orm, columnar
+
+    def median(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
+
+    def create_products(self, start, count, categories, brands):
+        now = timezone.now()
+        for offset in range(start, start + count, BATCH_SIZE):
+            products = []
+            for index in range(offset, min(offset + BATCH_SIZE, start + count)):
+                stock = self.random.choice((0, 5, 20, 100))
+                products.append(Product(
+                    name=f'Bench product {index}',
+                    slug=f'bench-product-{index}',
+                    description='Synthetic benchmark product',
+                    price=Decimal(self.random.randint(100, 200000)) / 100,
+                    sku=f'BENCH-{index}',
+                    stock_quantity=stock,
+                    category=self.random.choice(categories),
+                    brand=self.random.choice(brands),
+                    is_featured=self.random.random() < 0.05,
+                    is_bestseller=self.random.random() < 0.05,
+                    is_new_arrival=self.random.random() < 0.1,
+                ))
+            Product.objects.bulk_create(products)
+            ProductCard.objects.bulk_create(
+                ProductCard(
+                    product=product,
+                    name=product.name,
+                    slug=product.slug,
+                    price=product.price,
+                    category=product.category,
+                    category_name=product.category.name,
+                    category_slug=product.category.slug,
+                    brand=product.brand,
+                    brand_name=product.brand.name,
+                    brand_slug=product.brand.slug,
+                    is_featured=product.is_featured,
+                    is_new_arrival=product.is_new_arrival,
+                    is_bestseller=product.is_bestseller,
+                    stock_quantity=product.stock_quantity,
+                    is_in_stock=product.stock_quantity > 0,
+                    average_rating=round(self.random.uniform(0, 5), 1),
+                    review_count=self.random.randint(0, 200),
+                    created_at=now - timedelta(minutes=index),
+                )
+                for index, product in enumerate(products, offset)
+            )
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from orders.models import CartItem, Order
+from orders.serializers import CartItemSerializer, OrderListSerializer
+from products.models import Product, ProductCard
+from products.serializers import ProductCardSerializer, ProductListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the list serializers with DRF and with the compiled fast path, check the JSON is '
+        'byte-identical and report the per-row cost of each'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per serializer (existing rows are repeated)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per serializer (the median is reported)')
+
+    def cases(self, rows):
+        yield ProductListSerializer, Product.objects.filter(is_active=True).select_related(
+            'category', 'brand', 'rating_summary'
+        ).prefetch_related('images')[:rows]
+        yield ProductCardSerializer, ProductCard.objects.filter(is_active=True)[:rows]
+        yield OrderListSerializer, Order.objects.prefetch_related('items')[:rows]
+        yield CartItemSerializer, CartItem.objects.select_related('product__card')[:rows]
+
+    def handle(self, *args, **options):
+        context = {'request': Request(APIRequestFactory().get('/', SERVER_NAME='localhost'))}
+        renderer = JSONRenderer()
+        mismatches = []
+
+        self.stdout.write(f'{"serializer":<24}{"rows":>7}{"drf us/row":>13}{"compiled us/row":>18}{"speedup":>10}')
+        for serializer_class, queryset in self.cases(options['rows']):
+            name = serializer_class.__name__
+            rows = list(queryset)
+            if not rows:
+                self.stdout.write(f'{name:<24}   no rows, skipped')
+                continue
+            rows = (rows * (options['rows'] // len(rows) + 1))[:options['rows']]
+
+            def serialize():
+                return serializer_class(rows, many=True, context=context).data
+
+            with override_settings(COMPILED_SERIALIZERS=False):
+                expected = renderer.render(serialize())
+                drf_ms = self.median(serialize, options['repeat'])
+            compiled = renderer.render(serialize())
+            compiled_ms = self.median(serialize, options['repeat'])
+
+            per_row = 1000 / len(rows)
+            self.stdout.write(
+                f'{name:<24}{len(rows):>7}{drf_ms * per_row:>13.1f}{compiled_ms * per_row:>18.1f}'
+                f'{drf_ms / max(compiled_ms, 1e-6):>9.1f}x'
+            )
+            if compiled != expected:
+                mismatches.append(name)
+
+        if mismatches:
+            raise CommandError(f'Compiled output differs from DRF for: {", ".join(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Compiled output is byte-identical to DRF'))
+
+    def median(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
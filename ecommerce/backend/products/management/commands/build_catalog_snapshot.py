@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products import snapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the memory-mapped columnar catalog snapshot from ProductCard'
+
+    def handle(self, *args, **options):
+        rows = snapshot.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} products to {snapshot.snapshot_dir()}'))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import related
+
+
+class Command(BaseCommand):
+    help = 'Recompute content-based related products (TF-IDF nearest neighbours) for every active product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=related.DEFAULT_TOP_K, help='Neighbours kept per product')
+        parser.add_argument('--block-size', type=int, default=related.BLOCK_SIZE, help='Rows compared per batch')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stored = related.rebuild(top_k=options['top_k'], block_size=options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} related product links in {time.monotonic() - started:.1f}s'
+        ))
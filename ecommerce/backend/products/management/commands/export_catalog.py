@@ -0,0 +1,40 @@
+import sys
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products import export
+
+
+class Command(BaseCommand):
+    help = 'Stream the active catalog as NDJSON or CSV to a file or stdout, with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='ndjson')
+        parser.add_argument('--output', default='-', help='File to write, - for stdout')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output on the fly')
+        parser.add_argument('--chunk-size', type=int, default=settings.CATALOG_EXPORT_CHUNK_SIZE)
+        parser.add_argument('--base-url', help='Prefix for local image URLs, e.g. https://shop.example.com')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url']
+        build_uri = (lambda url: urljoin(base_url, url)) if base_url else None
+        chunks = export.export_chunks(options['format'], chunk_size=options['chunk_size'], build_uri=build_uri)
+        if options['gzip']:
+            chunks = export.gzip_chunks(chunks)
+
+        to_stdout = options['output'] == '-'
+        output = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if to_stdout:
+                output.flush()
+            else:
+                output.close()
+        if not to_stdout:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} bytes to {options["output"]}'))
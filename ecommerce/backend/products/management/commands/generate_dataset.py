@@ -0,0 +1,439 @@
+import os
+import random
+import time
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from accounts.models import User
+from orders.models import Order, OrderItem
+from products import response_cache, search, snapshot, suggest
+from products.models import (
+    Brand, CatalogStats, Category, Product, ProductCard, ProductImage, ProductSpecification, RatingSummary, Review,
+    SpecAttribute, recount_active_products, spec_value_key,
+)
+from shopfluence.datagen import (
+    DEFAULT_BATCH_SIZE, ZipfSampler, bulk_insert, cart_size, explicit_timestamps, past_datetime,
+)
+
+# Department -> subcategory -> nouns products of that subcategory are named after
+DEPARTMENTS = {
+    'Electronics': {
+        'Headphones': ['Headphones', 'Earbuds', 'Headset'],
+        'Smartphones': ['Smartphone', 'Phone Case', 'Charger'],
+        'Laptops': ['Laptop', 'Ultrabook', 'Laptop Stand'],
+        'Cameras': ['Camera', 'Lens', 'Tripod'],
+    },
+    'Fashion': {
+        'Sneakers': ['Sneakers', 'Trainers', 'Runners'],
+        'Jackets': ['Jacket', 'Parka', 'Windbreaker'],
+        'Watches': ['Watch', 'Chronograph', 'Smartwatch'],
+        'Bags': ['Backpack', 'Tote', 'Duffel'],
+    },
+    'Home & Garden': {
+        'Cookware': ['Skillet', 'Saucepan', 'Dutch Oven'],
+        'Lighting': ['Desk Lamp', 'Floor Lamp', 'Pendant Light'],
+        'Furniture': ['Chair', 'Bookshelf', 'Side Table'],
+        'Garden Tools': ['Pruner', 'Hose', 'Trowel'],
+    },
+    'Sports': {
+        'Fitness': ['Dumbbells', 'Yoga Mat', 'Kettlebell'],
+        'Cycling': ['Helmet', 'Bike Light', 'Saddle'],
+        'Camping': ['Tent', 'Sleeping Bag', 'Lantern'],
+        'Running': ['Running Vest', 'Water Bottle', 'Armband'],
+    },
+    'Beauty': {
+        'Skincare': ['Moisturizer', 'Serum', 'Cleanser'],
+        'Fragrance': ['Eau de Parfum', 'Body Mist', 'Cologne'],
+        'Haircare': ['Shampoo', 'Hair Dryer', 'Conditioner'],
+        'Makeup': ['Lipstick', 'Mascara', 'Foundation'],
+    },
+}
+ADJECTIVES = [
+    'Pro', 'Ultra', 'Classic', 'Compact', 'Essential', 'Premium', 'Lite', 'Max', 'Eco', 'Urban',
+    'Travel', 'Studio', 'Sport', 'Smart', 'Deluxe', 'Original', 'Active', 'Air', 'Prime', 'Signature',
+]
+BRAND_SYLLABLES = [
+    'ar', 'bel', 'cor', 'dex', 'el', 'fin', 'gor', 'hal', 'ion', 'jet', 'kor', 'lum', 'mar',
+    'nov', 'or', 'pax', 'quin', 'ras', 'sol', 'tek', 'ul', 'vor', 'wex', 'xen', 'yor', 'zan',
+]
+COLORS = ['Black', 'White', 'Silver', 'Navy', 'Red', 'Green', 'Grey', 'Blue', 'Beige', 'Pink']
+FIRST_NAMES = [
+    'James', 'Mary', 'Wei', 'Priya', 'Carlos', 'Fatima', 'Olga', 'Kenji', 'Amara', 'Liam',
+    'Sofia', 'Noah', 'Aisha', 'Mateo', 'Yuki', 'Elena', 'Omar', 'Chloe', 'Ravi', 'Zoe',
+]
+LAST_NAMES = [
+    'Smith', 'Garcia', 'Chen', 'Patel', 'Kim', 'Nguyen', 'Müller', 'Rossi', 'Okafor', 'Silva',
+    'Cohen', 'Ivanova', 'Tanaka', 'Dubois', 'Khan', 'Larsen', 'Novak', 'Haddad', 'Brown', 'Lopez',
+]
+REVIEW_TEXT = {
+    1: ('Disappointed', 'Stopped working after a week and support was no help.'),
+    2: ('Not great', 'Does the job but feels cheap for the price.'),
+    3: ('It is okay', 'Average quality, nothing special either way.'),
+    4: ('Very good', 'Solid product, would buy again with minor reservations.'),
+    5: ('Excellent!', 'Exceeded my expectations in every way. Highly recommended.'),
+}
+PAYMENT_METHODS = ['credit_card', 'credit_card', 'credit_card', 'paypal', 'apple_pay']
+TAX_RATE = Decimal('0.08')
+FREE_SHIPPING_OVER = Decimal('50.00')
+SHIPPING_AMOUNT = Decimal('5.99')
+CENT = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large synthetic dataset (catalog, users, orders, reviews) with skewed distributions for load '
+        'and benchmark runs; the same --seed gives the same data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0)
+        parser.add_argument('--users', type=int, default=0)
+        parser.add_argument('--orders', type=int, default=0)
+        parser.add_argument('--reviews', type=int, default=0)
+        parser.add_argument('--brands', type=int, default=60, help='Brands the generated products are spread over')
+        parser.add_argument('--seed', type=int, default=1, help='Also tags the generated SKUs, emails and orders')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per bulk_create')
+        parser.add_argument('--password', default='TestPass123!', help='Password of every generated user')
+
+    def handle(self, *args, **options):
+        self.seed = options['seed']
+        self.tag = f'G{self.seed}'
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.written = {}
+        if Product.objects.filter(sku__startswith=f'{self.tag}-').exists() or User.objects.filter(
+            email__startswith=f'{self.tag.lower()}.'
+        ).exists():
+            raise CommandError(f'A dataset with seed {self.seed} already exists; pass another --seed')
+
+        started = time.perf_counter()
+        with explicit_timestamps(Product, ProductImage, ProductSpecification, User, Review, Order):
+            if options['products']:
+                self.generate_catalog(options['products'], options['brands'])
+            if options['users']:
+                self.generate_users(options['users'], options['password'])
+            if options['reviews'] or options['orders']:
+                products, users = self.product_pool(), self.user_pool()
+                if options['reviews']:
+                    self.generate_reviews(options['reviews'], products, users)
+                if options['orders']:
+                    self.generate_orders(options['orders'], products, users)
+        generated = time.perf_counter() - started
+
+        if options['products'] or options['reviews']:
+            self.refresh_read_models()
+        total = sum(self.written.values())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {total} rows in {generated:.1f}s ({total / max(generated, 1e-6):.0f} rows/s), '
+            f'{elapsed:.1f}s with read models: '
+            + ', '.join(f'{count} {name}' for name, count in self.written.items())
+        ))
+
+    def rng(self, purpose):
+        """Independent stream per table, so e.g. changing --orders leaves the generated products alone"""
+        return random.Random(f'{self.seed}:{purpose}')
+
+    def insert(self, model, objects):
+        written = bulk_insert(model, objects, self.batch_size, progress=self.report_progress)
+        name = model._meta.verbose_name_plural
+        self.written[name] = self.written.get(name, 0) + written
+        return written
+
+    def report_progress(self, model, written):
+        if written % (self.batch_size * 50) == 0:
+            self.stdout.write(f'   {written} {model._meta.verbose_name_plural}')
+
+    # Catalog
+
+    def generate_catalog(self, count, brand_count):
+        rng = self.rng('products')
+        subcategories = self.ensure_categories()
+        brands = self.ensure_brands(brand_count, rng)
+        category_sampler = ZipfSampler(subcategories, rng, exponent=0.8)
+        brand_sampler = ZipfSampler(brands, rng, exponent=1.1)
+
+        # Popularity ranks are fixed up front, so the best sellers are the products orders favour
+        self.popularity = list(range(count))
+        rng.shuffle(self.popularity)
+        bestsellers = set(self.popularity[:max(1, count // 100)])
+
+        def products():
+            for index in range(count):
+                category, nouns = category_sampler()
+                brand = brand_sampler()
+                name = f'{brand.name} {rng.choice(ADJECTIVES)} {rng.choice(nouns)} {rng.randint(1, 9)}{rng.choice("0SXL")}'
+                sku = f'{self.tag}-{index:08d}'
+                price = self.price(rng)
+                original_price = None
+                if rng.random() < 0.3:
+                    original_price = (price * Decimal(1 + rng.choice([0.1, 0.2, 0.25, 0.4, 0.5]))).quantize(CENT)
+                created_at = past_datetime(rng, self.now, 730)
+                yield Product(
+                    name=name,
+                    slug=f'{slugify(name)}-{sku.lower()}',
+                    sku=sku,
+                    description=(
+                        f'The {name} from {brand.name}. Built for everyday use in {category.name.lower()}, '
+                        f'backed by a {rng.randint(1, 3)}-year warranty.'
+                    ),
+                    short_description=f'{brand.name} {category.name.lower()} essential',
+                    price=price,
+                    original_price=original_price,
+                    discount_percentage=(
+                        int((original_price - price) / original_price * 100) if original_price else 0
+                    ),
+                    stock_quantity=0 if rng.random() < 0.08 else int(rng.expovariate(1 / 60)) + 1,
+                    category=category,
+                    brand=brand,
+                    is_active=rng.random() >= 0.02,
+                    is_featured=rng.random() < 0.02,
+                    is_new_arrival=(self.now - created_at).days < 30,
+                    is_bestseller=index in bestsellers,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+
+        self.insert(Product, products())
+        rows = list(self.generated_products().values_list('id', 'name', 'sku', 'created_at'))
+        self.insert(ProductImage, (
+            ProductImage(
+                product_id=pk, image=f'https://picsum.photos/seed/{sku}/600/600', alt_text=name[:200],
+                is_primary=True, created_at=created_at, updated_at=created_at,
+            )
+            for pk, name, sku, created_at in rows
+        ))
+        color, warranty = SpecAttribute.for_name('Color'), SpecAttribute.for_name('Warranty')
+        self.insert(ProductSpecification, (
+            ProductSpecification(
+                product_id=pk, name=attribute.name, value=value, order=order, attribute=attribute,
+                value_key=spec_value_key(value), updated_at=created_at,
+            )
+            for pk, _, _, created_at in rows
+            for order, (attribute, value) in enumerate([
+                (color, rng.choice(COLORS)), (warranty, f'{rng.choice([1, 1, 2, 3])} years'),
+            ])
+        ))
+        self.generated_ids = [row[0] for row in rows]
+
+    def price(self, rng):
+        """Log-normal around $40, ending in .99"""
+        return Decimal(min(4999, max(1, int(rng.lognormvariate(3.7, 0.9))))) + Decimal('0.99')
+
+    def ensure_categories(self):
+        """The two-level category tree, reusing categories that already exist by name; [(subcategory, nouns)]"""
+        existing = {category.name: category for category in Category.objects.all()}
+        missing = [Category(name=name, slug=slugify(name)) for name in DEPARTMENTS if name not in existing]
+        Category.objects.bulk_create(missing)
+        existing = {category.name: category for category in Category.objects.all()}
+        missing = [
+            Category(name=name, slug=slugify(name), parent=existing[department])
+            for department, subcategories in DEPARTMENTS.items() for name in subcategories if name not in existing
+        ]
+        Category.objects.bulk_create(missing)
+        existing = {category.name: category for category in Category.objects.all()}
+        return [
+            (existing[name], nouns)
+            for subcategories in DEPARTMENTS.values() for name, nouns in subcategories.items()
+        ]
+
+    def ensure_brands(self, count, rng):
+        names = sorted({
+            f'{first}{second}'.capitalize()
+            for first in BRAND_SYLLABLES for second in BRAND_SYLLABLES if first != second
+        })
+        names = rng.sample(names, min(count, len(names)))
+        existing = set(Brand.objects.filter(name__in=names).values_list('name', flat=True))
+        Brand.objects.bulk_create([Brand(name=name, slug=slugify(name)) for name in names if name not in existing])
+        return list(Brand.objects.filter(name__in=names).order_by('name'))
+
+    def generated_products(self):
+        return Product.objects.filter(sku__startswith=f'{self.tag}-').order_by('sku')
+
+    # Users
+
+    def generate_users(self, count, password):
+        rng = self.rng('users')
+        # One PBKDF2 hash shared by every user; hashing a million passwords would take days
+        password_hash = make_password(password)
+        prefix = self.tag.lower()
+
+        def users():
+            for index in range(count):
+                first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                joined = past_datetime(rng, self.now, 1095)
+                yield User(
+                    username=f'{prefix}_user{index:08d}',
+                    email=f'{prefix}.user{index:08d}@example.com',
+                    first_name=first_name,
+                    last_name=last_name,
+                    password=password_hash,
+                    is_verified=rng.random() < 0.6,
+                    date_joined=joined,
+                    created_at=joined,
+                    updated_at=joined,
+                )
+
+        self.insert(User, users())
+
+    # Reviews and orders
+
+    def product_pool(self):
+        """Popularity-ranked generated products, or every active product when none were generated this run"""
+        rng = self.rng('popularity')
+        if getattr(self, 'generated_ids', None):
+            ids = self.generated_ids
+            sampler = ZipfSampler((ids[index] for index in self.popularity), rng, exponent=1.0, shuffle=False)
+        else:
+            ids = list(Product.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+            if not ids:
+                raise CommandError('There are no products to review or order; pass --products')
+            sampler = ZipfSampler(ids, rng, exponent=1.0)
+        # (name, sku, price) of each product, for the order lines
+        self.product_details = {}
+        for chunk in range(0, len(ids), 20000):
+            for pk, name, sku, price in Product.objects.filter(id__in=ids[chunk:chunk + 20000]).values_list(
+                'id', 'name', 'sku', 'price'
+            ):
+                self.product_details[pk] = (name, sku, price)
+        return sampler
+
+    def user_pool(self):
+        """Generated users, or every active user when none were generated this run; a few are very active"""
+        users = User.objects.filter(email__startswith=f'{self.tag.lower()}.')
+        ids = list(users.order_by('id').values_list('id', flat=True))
+        if not ids:
+            ids = list(User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+        if not ids:
+            raise CommandError('There are no users to write reviews or place orders; pass --users')
+        return ZipfSampler(ids, self.rng('activity'), exponent=0.8)
+
+    def generate_reviews(self, count, products, users):
+        rng = self.rng('reviews')
+        taken = set(Review.objects.values_list('product_id', 'user_id'))
+        count = min(count, len(products) * len(users) // 2)
+
+        def reviews():
+            for _ in range(count):
+                product_id, user_id = products(), users()
+                attempts = 0
+                while (product_id, user_id) in taken:
+                    # Popular pairs fill up first; spread the rest over any reviewer, then any product
+                    attempts += 1
+                    user_id = rng.choice(users.items)
+                    if attempts > 10:
+                        product_id = rng.choice(products.items)
+                taken.add((product_id, user_id))
+                # Each product has its own typical rating, from its SKU so reruns of a seed agree;
+                # individual ratings scatter around it
+                quality = 2.6 + 2.2 * zlib.crc32(self.product_details[product_id][1].encode()) / 2 ** 32
+                rating = min(5, max(1, round(rng.gauss(quality, 0.9))))
+                title, comment = REVIEW_TEXT[rating]
+                created_at = past_datetime(rng, self.now, 365)
+                yield Review(
+                    product_id=product_id,
+                    user_id=user_id,
+                    rating=rating,
+                    title=title,
+                    comment=comment,
+                    is_approved=rng.random() >= 0.03,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+
+        self.insert(Review, reviews())
+
+    def generate_orders(self, count, products, users):
+        rng = self.rng('orders')
+        for start in range(0, count, self.batch_size):
+            orders, baskets = [], []
+            for index in range(start, min(count, start + self.batch_size)):
+                basket = [
+                    (product_id, rng.choices((1, 2, 3), weights=(80, 15, 5))[0])
+                    for product_id in products.distinct(cart_size(rng))
+                ]
+                orders.append(self.order(rng, index, users(), basket))
+                baskets.append(basket)
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                if orders[0].pk is None:
+                    # Backends that cannot return ids from a bulk insert
+                    ids = dict(Order.objects.filter(
+                        order_number__in=[order.order_number for order in orders]
+                    ).values_list('order_number', 'id'))
+                    for order in orders:
+                        order.pk = ids[order.order_number]
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product_id=product_id,
+                        product_name=self.product_details[product_id][0],
+                        product_sku=self.product_details[product_id][1],
+                        quantity=quantity,
+                        unit_price=self.product_details[product_id][2],
+                        total_price=self.product_details[product_id][2] * quantity,
+                    )
+                    for order, basket in zip(orders, baskets) for product_id, quantity in basket
+                ], batch_size=self.batch_size)
+            reset_queries()
+            for model, written in ((Order, len(orders)), (OrderItem, sum(len(basket) for basket in baskets))):
+                name = model._meta.verbose_name_plural
+                self.written[name] = self.written.get(name, 0) + written
+            self.report_progress(Order, start + len(orders))
+
+    def order(self, rng, index, user_id, basket):
+        created_at = past_datetime(rng, self.now, 365)
+        age_days = (self.now - created_at).days
+        status = rng.choices(['cancelled', 'refunded', 'fulfilled'], weights=[4, 1, 95])[0]
+        if status == 'fulfilled':
+            status = 'delivered' if age_days >= 7 else 'shipped' if age_days >= 2 else rng.choice(
+                ['pending', 'confirmed', 'processing']
+            )
+        payment_status = {'pending': 'pending', 'cancelled': 'failed', 'refunded': 'refunded'}.get(status, 'paid')
+
+        subtotal = sum(self.product_details[product_id][2] * quantity for product_id, quantity in basket)
+        tax_amount = (subtotal * TAX_RATE).quantize(CENT)
+        shipping_amount = Decimal('0.00') if subtotal >= FREE_SHIPPING_OVER else SHIPPING_AMOUNT
+        paid = payment_status in ('paid', 'refunded')
+        return Order(
+            user_id=user_id,
+            order_number=f'{self.tag}-{index:09d}',
+            status=status,
+            payment_status=payment_status,
+            subtotal=subtotal,
+            tax_amount=tax_amount,
+            shipping_amount=shipping_amount,
+            total_amount=subtotal + tax_amount + shipping_amount,
+            payment_method=rng.choice(PAYMENT_METHODS),
+            transaction_id=f'txn_{rng.getrandbits(48):012x}' if paid else '',
+            created_at=created_at,
+            updated_at=created_at,
+            paid_at=created_at + timedelta(minutes=rng.randint(1, 30)) if paid else None,
+            shipped_at=created_at + timedelta(days=2) if status in ('shipped', 'delivered') else None,
+            delivered_at=created_at + timedelta(days=rng.randint(3, 7)) if status == 'delivered' else None,
+        )
+
+    # Read models
+
+    def refresh_read_models(self):
+        """Bulk inserts skip the signals; rebuild what they would have maintained, once for the whole load"""
+        self.stdout.write('Rebuilding read models...')
+        Category.rebuild_paths()
+        recount_active_products(Category)
+        recount_active_products(Brand)
+        ProductCard.refresh()
+        RatingSummary.rebuild()
+        CatalogStats.reconcile()
+        search.rebuild()
+        if os.path.exists(snapshot.current_path()):
+            snapshot.rebuild()
+        response_cache.invalidate('products', 'categories', 'brands')
+        suggest.invalidate()
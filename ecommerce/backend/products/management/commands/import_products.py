@@ -0,0 +1,56 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products import importer, renditions
+
+
+class Command(BaseCommand):
+    help = 'Upsert products by SKU from an XML, CSV or NDJSON feed (optionally .gz), streaming it in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file, - for stdin')
+        parser.add_argument('--format', choices=importer.FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=settings.PRODUCT_IMPORT_BATCH_SIZE)
+        parser.add_argument('--create-missing', action='store_true', help='Create unknown brands and categories')
+        parser.add_argument('--no-update', action='store_true', help='Skip SKUs that already exist')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-' and not options['format']:
+            raise CommandError('Pass --format when reading from stdin')
+        try:
+            fmt = options['format'] or importer.detect_format(path)
+            stream = sys.stdin.buffer if path == '-' else importer.open_feed(path)
+        except (importer.FeedError, OSError) as error:
+            raise CommandError(error)
+
+        products = importer.ProductImporter(
+            batch_size=options['batch_size'],
+            create_missing=options['create_missing'],
+            update_existing=not options['no_update'],
+            progress=self.report_progress,
+        )
+        try:
+            result = products.run(importer.read_feed(stream, fmt))
+        except importer.FeedError as error:
+            raise CommandError(f'{error} (batches before it were imported)')
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        # The imported images render in a background thread, which must finish before the command exits
+        renditions.wait()
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(f'   line {error["line"]}: {error["error"]}'))
+        if result.error_count > len(result.errors):
+            self.stdout.write(self.style.WARNING(f'   ... and {result.error_count - len(result.errors)} more errors'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.rows} rows in {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/s): '
+            f'{result.created} created, {result.updated} updated, {result.unchanged} unchanged, '
+            f'{result.skipped} skipped, {result.error_count} errors'
+        ))
+
+    def report_progress(self, result):
+        self.stdout.write(f'   {result.rows} rows, {result.rows_per_second:.0f} rows/s')
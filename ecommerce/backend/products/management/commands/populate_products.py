@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from products.models import Product, Brand, Category, ProductImage
+from products.importer import ProductImporter
+from products.models import Product, Brand, Category
 from decimal import Decimal
 import random
 
@@ -829,37 +830,27 @@ class Command(BaseCommand):
 
     def create_products(self, products_data, category):
         """Helper method to create products"""
+        brands = {brand.name: brand for brand in Brand.objects.all()}
+        existing = set(Product.objects.filter(
+            slug__in=[product_data['slug'] for product_data in products_data]
+        ).values_list('slug', flat=True))
+
+        records = []
         for product_data in products_data:
-            # Get or create brand
-            brand_name = product_data.pop('brand')
-            brand = Brand.objects.get(name=brand_name)
-            
-            # Extract image URL
-            image_url = product_data.pop('image', None)
-            
-            # Check if product already exists
-            if not Product.objects.filter(slug=product_data['slug']).exists():
-                # Generate unique SKU
-                sku = f"{brand.slug.upper()}-{product_data['slug'].upper()}"[:50]
-                
-                product = Product.objects.create(
-                    category=category,
-                    brand=brand,
-                    sku=sku,
-                    stock_quantity=50,  # Set default stock
-                    **product_data
-                )
-                
-                # Create ProductImage if image URL provided
-                if image_url:
-                    ProductImage.objects.create(
-                        product=product,
-                        image=image_url,
-                        alt_text=product.name,
-                        is_primary=True,
-                        order=0
-                    )
-                
-                self.stdout.write(f'Created product: {product.name}')
-            else:
+            if product_data['slug'] in existing:
                 self.stdout.write(f'Product already exists: {product_data["name"]}')
+                continue
+            brand = brands[product_data['brand']]
+            records.append({
+                **product_data,
+                # Generate unique SKU
+                'sku': f"{brand.slug.upper()}-{product_data['slug'].upper()}"[:50],
+                'brand': brand.slug,
+                'category': category.slug,
+                'stock_quantity': 50,  # Set default stock
+            })
+
+        result = ProductImporter(update_existing=False).run(enumerate(records, 1))
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(f'Skipped {records[error["line"] - 1]["name"]}: {error["error"]}'))
+        self.stdout.write(f'Created {result.created} {category.name} products')
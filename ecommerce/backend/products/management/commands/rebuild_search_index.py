@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products import search
+
+
+class Command(BaseCommand):
+    help = 'Drop and rebuild the SQLite FTS5 product search index and its typo-correction trigrams'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING('Full-text index requires SQLite; search falls back to icontains'))
+            return
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} products'))
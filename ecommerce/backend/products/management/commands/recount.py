@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from products.models import Category, Brand, CatalogStats, RatingSummary, recount_active_products
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute denormalized catalog counters (active products per category/brand, category paths, '
+        'rating summaries, catalog statistics); run it periodically to reconcile drift'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-ratings', action='store_true', help='Only recount category and brand products')
+
+    def handle(self, *args, **options):
+        before = self.snapshot()
+        recount_active_products(Category)
+        recount_active_products(Brand)
+        after = self.snapshot()
+
+        drifted = [key for key, count in after.items() if before.get(key) != count]
+        for key in drifted:
+            self.stdout.write(f'   {key[0]} "{key[1]}": {before.get(key)} -> {after[key]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {len(after)} categories and brands ({len(drifted)} drifted)'
+        ))
+
+        repathed = Category.rebuild_paths()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {repathed} category paths'))
+
+        if not options['skip_ratings']:
+            rebuilt = RatingSummary.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} rating summaries'))
+
+        stats = CatalogStats.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled catalog statistics: {stats}'))
+
+    def snapshot(self):
+        counts = {}
+        for model in (Category, Brand):
+            for name, count in model.objects.values_list('name', 'active_product_count'):
+                counts[(model._meta.verbose_name, name)] = count
+        return counts
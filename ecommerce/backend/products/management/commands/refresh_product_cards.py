@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products.models import ProductCard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized product cards used by the catalog list endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products upserted per batch')
+
+    def handle(self, *args, **options):
+        refreshed = ProductCard.refresh(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} product cards'))
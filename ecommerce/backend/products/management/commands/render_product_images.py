@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products import renditions
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the WebP/JPEG size renditions of locally stored product images in a process pool; '
+        'remote image URLs are skipped'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Render processes (default: PRODUCT_IMAGE_WORKERS, one per CPU)')
+        parser.add_argument(
+            '--rerender', action='store_true',
+            help='Also images that already have renditions, e.g. after changing PRODUCT_IMAGE_RENDITIONS',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rendition keys saved per transaction')
+
+    def handle(self, *args, **options):
+        sizes = ', '.join(f'{name} {edge}px' for name, edge in settings.PRODUCT_IMAGE_RENDITIONS.items())
+        self.stdout.write(f'Rendering {sizes} as {", ".join(renditions.FORMATS)} into {renditions.root()}')
+        self.started = time.monotonic()
+        rendered, failed = renditions.process(
+            renditions.pending(rerender=options['rerender']),
+            max_workers=options['workers'],
+            batch_size=options['batch_size'],
+            progress=self.report_progress,
+        )
+        seconds = time.monotonic() - self.started
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Rendered {rendered} images in {seconds:.1f}s ({rendered / seconds if seconds else 0:.1f} images/s), '
+            f'{failed} failed'
+        ))
+
+    def report_progress(self, rendered, failed, total):
+        seconds = time.monotonic() - self.started
+        self.stdout.write(f'   {rendered + failed}/{total} images, {rendered / seconds if seconds else 0:.1f} images/s')
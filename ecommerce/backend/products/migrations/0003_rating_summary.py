@@ -0,0 +1,54 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_rating_summaries(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    RatingSummary = apps.get_model('products', 'RatingSummary')
+
+    summaries = {pk: RatingSummary(product_id=pk) for pk in Product.objects.values_list('id', flat=True)}
+    rows = Review.objects.filter(is_approved=True).values('product_id', 'rating').annotate(total=Count('id'))
+    for row in rows:
+        summary = summaries.get(row['product_id'])
+        if summary is None or not 1 <= row['rating'] <= 5:
+            continue
+        summary.review_count += row['total']
+        summary.rating_sum += row['rating'] * row['total']
+        setattr(summary, f"stars_{row['rating']}", row['total'])
+    for summary in summaries.values():
+        if summary.review_count:
+            summary.average_rating = summary.rating_sum / summary.review_count
+    RatingSummary.objects.bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_alter_review_is_approved'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='products.product')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('average_rating', models.FloatField(db_index=True, default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Rating summaries',
+            },
+        ),
+        migrations.RunPython(build_rating_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_product_cards(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    RatingSummary = apps.get_model('products', 'RatingSummary')
+    ProductCard = apps.get_model('products', 'ProductCard')
+
+    summaries = {summary.product_id: summary for summary in RatingSummary.objects.all()}
+    cards = []
+    products = Product.objects.select_related('category', 'brand').prefetch_related('images')
+    for product in products.iterator(chunk_size=500):
+        images = list(product.images.all())
+        primary = next((image for image in images if image.is_primary), None) or (images[0] if images else None)
+        summary = summaries.get(product.id)
+        cards.append(ProductCard(
+            product_id=product.id,
+            name=product.name,
+            slug=product.slug,
+            short_description=product.short_description,
+            price=product.price,
+            original_price=product.original_price,
+            discount_percentage=product.discount_percentage,
+            image=primary.image.name if primary and primary.image else '',
+            category_id=product.category_id,
+            category_name=product.category.name,
+            category_slug=product.category.slug,
+            brand_id=product.brand_id,
+            brand_name=product.brand.name,
+            brand_slug=product.brand.slug,
+            is_active=product.is_active,
+            is_featured=product.is_featured,
+            is_new_arrival=product.is_new_arrival,
+            is_bestseller=product.is_bestseller,
+            stock_quantity=product.stock_quantity,
+            is_in_stock=product.stock_quantity > 0,
+            average_rating=summary.average_rating if summary else 0,
+            review_count=summary.review_count if summary else 0,
+            created_at=product.created_at,
+        ))
+    ProductCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_rating_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='products.product')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200)),
+                ('short_description', models.CharField(blank=True, max_length=300)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('original_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('discount_percentage', models.PositiveIntegerField(default=0)),
+                ('image', models.CharField(blank=True, max_length=500)),
+                ('category_name', models.CharField(max_length=100)),
+                ('category_slug', models.SlugField(max_length=100)),
+                ('brand_name', models.CharField(max_length=100)),
+                ('brand_slug', models.SlugField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('is_new_arrival', models.BooleanField(default=False)),
+                ('is_bestseller', models.BooleanField(default=False)),
+                ('stock_quantity', models.PositiveIntegerField(default=0)),
+                ('is_in_stock', models.BooleanField(default=False)),
+                ('average_rating', models.FloatField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.brand')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.category')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['is_active', '-created_at'], name='card_active_created_idx'), models.Index(fields=['is_active', 'is_featured', '-created_at'], name='card_featured_idx'), models.Index(fields=['is_active', 'is_new_arrival', '-created_at'], name='card_new_arrival_idx'), models.Index(fields=['is_active', 'is_bestseller', '-created_at'], name='card_bestseller_idx'), models.Index(fields=['is_active', 'category_slug', '-created_at'], name='card_category_idx'), models.Index(fields=['is_active', 'brand_slug', '-created_at'], name='card_brand_idx'), models.Index(fields=['is_active', 'price'], name='card_price_idx'), models.Index(fields=['is_active', '-average_rating'], name='card_rating_idx')],
+            },
+        ),
+        migrations.RunPython(build_product_cards, migrations.RunPython.noop),
+    ]
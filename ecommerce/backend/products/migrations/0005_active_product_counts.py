@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:13
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_active_products(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    for model_name in ('category', 'brand'):
+        model = apps.get_model('products', model_name)
+        counts = dict(
+            Product.objects.filter(is_active=True).order_by().values_list(model_name).annotate(total=Count('id'))
+        )
+        rows = [model(pk=pk, active_product_count=counts.get(pk, 0)) for pk in model.objects.values_list('pk', flat=True)]
+        model.objects.bulk_update(rows, ['active_product_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_active_products, migrations.RunPython.noop),
+    ]
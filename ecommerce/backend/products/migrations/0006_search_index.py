@@ -0,0 +1,41 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'products_search_index'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        "name, short_description, description, brand, category, specifications, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, name, short_description, description, brand, category, specifications)
+        SELECT p.id, p.name, p.short_description, p.description, b.name, c.name,
+               COALESCE((
+                   SELECT group_concat(s.name || ' ' || s.value, ' ')
+                   FROM products_productspecification s
+                   WHERE s.product_id = p.id
+               ), '')
+        FROM products_product p
+        INNER JOIN products_brand b ON b.id = p.brand_id
+        INNER JOIN products_category c ON c.id = p.category_id
+    """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_active_product_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['brand', 'category', 'is_active', 'price', 'average_rating', 'is_in_stock'], name='card_facet_idx'),
+        ),
+    ]
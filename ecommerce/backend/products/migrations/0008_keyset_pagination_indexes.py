@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_productcard_facet_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-product'], name='card_keyset_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'product'], name='card_keyset_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-average_rating', '-review_count', '-product'], name='card_keyset_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-is_featured', '-is_bestseller', '-created_at', '-product'], name='card_keyset_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name', 'product'], name='card_keyset_name_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='productspecification',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
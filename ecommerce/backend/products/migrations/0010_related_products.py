@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_child_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='products.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'ordering': ['product_id', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedproduct',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='related_product_rank_unique'),
+        ),
+    ]
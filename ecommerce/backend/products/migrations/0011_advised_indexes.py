@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_related_products'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category_slug', '-created_at'], name='card_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['brand_slug', '-created_at'], name='card_brand_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category_slug', '-is_featured', '-is_bestseller', '-created_at'], name='card_category_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['product', '-created_at'], name='review_product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-created_at'], name='review_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:53
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def build_catalog_stats(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Brand = apps.get_model('products', 'Brand')
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    CatalogStats = apps.get_model('products', 'CatalogStats')
+
+    totals = {
+        row['product__category']: row
+        for row in Review.objects.filter(is_approved=True).order_by().values('product__category').annotate(
+            count=Count('id'), rating=Sum('rating'),
+        )
+    }
+    rows = [
+        Category(pk=pk, review_count=totals.get(pk, {}).get('count', 0), rating_sum=totals.get(pk, {}).get('rating', 0))
+        for pk in Category.objects.values_list('pk', flat=True)
+    ]
+    Category.objects.bulk_update(rows, ['review_count', 'rating_sum'], batch_size=500)
+
+    CatalogStats.objects.update_or_create(pk=1, defaults={
+        'total_products': Product.objects.filter(is_active=True).count(),
+        'total_categories': Category.objects.filter(is_active=True).count(),
+        'total_brands': Brand.objects.filter(is_active=True).count(),
+        'reconciled_at': timezone.now(),
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_advised_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_products', models.PositiveIntegerField(default=0)),
+                ('total_categories', models.PositiveIntegerField(default=0)),
+                ('total_brands', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Catalog stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(build_catalog_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:57
+
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def path_of(pk):
+        if pk not in paths:
+            parent = parents[pk]
+            paths[pk] = (path_of(parent) if parent in parents else '') + f'{pk}/'
+        return paths[pk]
+
+    Category.objects.bulk_update([Category(pk=pk, path=path_of(pk)) for pk in parents], ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_catalog_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-17 01:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def build_spec_attributes(apps, schema_editor):
+    SpecAttribute = apps.get_model('products', 'SpecAttribute')
+    ProductSpecification = apps.get_model('products', 'ProductSpecification')
+
+    attributes = {}
+    specifications = list(ProductSpecification.objects.all())
+    for specification in specifications:
+        key = slugify(specification.name) or ' '.join(specification.name.casefold().split())
+        if key not in attributes:
+            attributes[key], _ = SpecAttribute.objects.get_or_create(key=key, defaults={'name': specification.name.strip()})
+        specification.attribute = attributes[key]
+        specification.value_key = ' '.join(specification.value.casefold().split())
+    ProductSpecification.objects.bulk_update(specifications, ['attribute', 'value_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_category_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpecAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='productspecification',
+            name='value_key',
+            field=models.CharField(default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='productspecification',
+            name='attribute',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='products.specattribute'),
+        ),
+        migrations.RunPython(build_spec_attributes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productspecification',
+            name='attribute',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='products.specattribute'),
+        ),
+        migrations.AddIndex(
+            model_name='productspecification',
+            index=models.Index(fields=['attribute', 'value_key', 'product'], name='spec_posting_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_spec_attributes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcard',
+            name='image_rendition_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='rendition_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('searches', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTermRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('term', models.CharField(max_length=100)),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('error', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket', '-searches'], name='search_rollup_top_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchtermrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'bucket', 'term'), name='search_rollup_term_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchvolume',
+            constraint=models.UniqueConstraint(fields=('period', 'bucket'), name='search_volume_bucket_unique'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+import unicodedata
+
+from django.db import migrations
+
+SEARCH_TABLE = 'products_search_index'
+TRIGRAM_TABLE = 'products_search_trigrams'
+VOCAB_TABLE = 'products_search_vocab'
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    characters = [
+        character if character.isalnum() else ' '
+        for character in decomposed.casefold() if not unicodedata.combining(character)
+    ]
+    return ''.join(characters).split()
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {VOCAB_TABLE} USING fts5vocab({SEARCH_TABLE}, 'col')"
+    )
+    schema_editor.execute(
+        f"CREATE TABLE IF NOT EXISTS {TRIGRAM_TABLE} (trigram TEXT NOT NULL, length INTEGER NOT NULL, "
+        "word TEXT NOT NULL, PRIMARY KEY (trigram, length, word)) WITHOUT ROWID"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT p.name, b.name, c.name
+            FROM products_product p
+            INNER JOIN products_brand b ON b.id = p.brand_id
+            INNER JOIN products_category c ON c.id = p.category_id
+        """)
+        words = {
+            word for row in cursor.fetchall() for text in row for word in normalize(text)
+            if len(word) >= 3 and not word.isdigit()
+        }
+        cursor.executemany(
+            f'INSERT OR IGNORE INTO {TRIGRAM_TABLE} (trigram, length, word) VALUES (%s, %s, %s)',
+            sorted((trigram, len(word), word) for word in words for trigram in trigrams(word)),
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TRIGRAM_TABLE}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {VOCAB_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_search_analytics'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
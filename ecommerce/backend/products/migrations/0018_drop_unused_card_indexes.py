@@ -0,0 +1,45 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_search_trigrams'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_active_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_featured_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_new_arrival_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_bestseller_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_category_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_brand_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_rating_idx',
+        ),
+    ]
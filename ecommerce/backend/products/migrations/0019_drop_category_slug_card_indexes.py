@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_drop_unused_card_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_category_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_category_featured_idx',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_drop_category_slug_card_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-created_at'], name='card_category_created_idx'),
+        ),
+    ]
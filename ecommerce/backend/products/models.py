@@ -1,9 +1,28 @@
 from django.db import models
+from django.db.models import Count, F, FloatField, ExpressionWrapper, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Concat, NullIf, Substr
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
 
 
+def recount_active_products(model, ids=None):
+    """Recompute active_product_count on Category or Brand with one correlated UPDATE"""
+    active = Product.objects.filter(**{model._meta.model_name: OuterRef('pk')}, is_active=True)
+    counts = active.order_by().values(model._meta.model_name).annotate(total=Count('id')).values('total')
+    rows = model.objects.all() if ids is None else model.objects.filter(id__in=ids)
+    return rows.update(active_product_count=Coalesce(Subquery(counts[:1]), 0), updated_at=timezone.now())
+
+
+def adjust_active_product_count(model, pk, delta):
+    # updated_at moves too: the count is part of the category/brand representation
+    model.objects.filter(pk=pk).update(
+        active_product_count=F('active_product_count') + delta, updated_at=timezone.now()
+    )
+
+
 class Category(models.Model):
     """Product category model"""
     name = models.CharField(max_length=100, unique=True)
@@ -13,6 +32,12 @@ class Category(models.Model):
     icon = models.CharField(max_length=50, blank=True)
     is_active = models.BooleanField(default=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # Materialized path: the ids from the root down to this category, each followed by PATH_SEPARATOR
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
+    # Approved reviews of the category's products, for the catalog statistics
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -23,14 +48,76 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    PATH_SEPARATOR = '/'
+    # Sorts after every character a path holds, so [path, path + PATH_END) is the subtree
+    PATH_END = '~'
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'parent' not in update_fields:
+            return super().save(*args, **kwargs)
+        if self._state.adding:
+            # The path ends with the category's own id, known only after the insert
+            super().save(*args, **kwargs)
+            self.path = self.build_path()
+            Category.objects.filter(pk=self.pk).update(path=self.path)
+            return
+
+        old_path = Category.objects.filter(pk=self.pk).values_list('path', flat=True).first() or ''
+        self.path = self.build_path()
+        if old_path and self.path != old_path and self.path.startswith(old_path):
+            raise ValueError(f'Category "{self}" cannot be moved under its own subtree')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'path'}
         super().save(*args, **kwargs)
+        if old_path and self.path != old_path:
+            # Reparented: rewrite the prefix of the whole subtree in one UPDATE
+            Category.objects.filter(path__gt=old_path, path__lt=old_path + self.PATH_END).update(
+                path=Concat(models.Value(self.path), Substr('path', len(old_path) + 1))
+            )
+
+    def clean(self):
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if f'{self.PATH_SEPARATOR}{self.pk}{self.PATH_SEPARATOR}' in f'{self.PATH_SEPARATOR}{parent_path}':
+                raise ValidationError({'parent': 'A category cannot be moved under itself or its subcategories.'})
+
+    def build_path(self):
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+        return f'{parent_path}{self.pk}{self.PATH_SEPARATOR}'
 
     def get_absolute_url(self):
         return reverse('products:category-detail', kwargs={'slug': self.slug})
 
+    @classmethod
+    def subtree(cls, slug):
+        """The category with ``slug`` and all its descendants, as one range scan of the path index"""
+        root = Subquery(cls.objects.filter(slug=slug).order_by().values('path')[:1])
+        return cls.objects.filter(
+            path__gte=root, path__lt=Concat(root, models.Value(cls.PATH_END), output_field=models.CharField())
+        )
+
+    @classmethod
+    def rebuild_paths(cls):
+        """Recompute every path from the parent links, e.g. after bulk_create; returns the categories changed"""
+        parents = dict(cls.objects.values_list('pk', 'parent_id'))
+        stored = dict(cls.objects.values_list('pk', 'path'))
+        paths = {}
+
+        def path_of(pk):
+            if pk not in paths:
+                parent = parents[pk]
+                paths[pk] = (path_of(parent) if parent in parents else '') + f'{pk}{cls.PATH_SEPARATOR}'
+            return paths[pk]
+
+        changed = [cls(pk=pk, path=path_of(pk)) for pk in parents if path_of(pk) != stored[pk]]
+        cls.objects.bulk_update(changed, ['path'], batch_size=500)
+        return len(changed)
+
 
 class Brand(models.Model):
     """Product brand model"""
@@ -40,6 +127,7 @@ class Brand(models.Model):
     logo = models.ImageField(upload_to='brands/', blank=True, null=True)
     website = models.URLField(blank=True)
     is_active = models.BooleanField(default=True)
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -122,16 +210,22 @@ class Product(models.Model):
     def is_low_stock(self):
         return self.stock_quantity <= self.low_stock_threshold
 
+    def get_rating_summary(self):
+        """Return the persisted rating summary, or None if it has not been built yet"""
+        try:
+            return self.rating_summary
+        except RatingSummary.DoesNotExist:
+            return None
+
     @property
     def average_rating(self):
-        reviews = self.reviews.filter(is_approved=True)
-        if reviews.exists():
-            return sum(review.rating for review in reviews) / reviews.count()
-        return 0
+        summary = self.get_rating_summary()
+        return summary.average_rating if summary else 0
 
     @property
     def review_count(self):
-        return self.reviews.filter(is_approved=True).count()
+        summary = self.get_rating_summary()
+        return summary.review_count if summary else 0
 
 
 class ProductImage(models.Model):
@@ -141,7 +235,10 @@ class ProductImage(models.Model):
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
+    # Content-addressed key of the rendered sizes (products.renditions); empty until rendered
+    rendition_key = models.CharField(max_length=64, blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', 'created_at']
@@ -156,20 +253,63 @@ class ProductImage(models.Model):
         super().save(*args, **kwargs)
 
 
+def spec_value_key(value):
+    """Case- and whitespace-insensitive form of a specification value"""
+    return ' '.join((value or '').casefold().split())
+
+
+class SpecAttribute(models.Model):
+    """Dictionary of specification names; ``key`` is what ``spec.<key>=`` filters use"""
+    name = models.CharField(max_length=100)
+    key = models.SlugField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def key_for(name):
+        return slugify(name) or spec_value_key(name)
+
+    @classmethod
+    def for_name(cls, name):
+        attribute, _ = cls.objects.get_or_create(key=cls.key_for(name), defaults={'name': name.strip()})
+        return attribute
+
+
 class ProductSpecification(models.Model):
-    """Product specification model"""
+    """Product specification model; each row is also a posting of its (attribute, value) in the inverted index"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='specifications')
     name = models.CharField(max_length=100)
     value = models.CharField(max_length=500)
     order = models.PositiveIntegerField(default=0)
+    attribute = models.ForeignKey(SpecAttribute, on_delete=models.PROTECT, related_name='+', editable=False)
+    value_key = models.CharField(max_length=500, editable=False, default='')
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', 'name']
         unique_together = ['product', 'name']
+        indexes = [
+            # Posting lists: the products having an attribute value, in product order
+            models.Index(fields=['attribute', 'value_key', 'product'], name='spec_posting_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.name}: {self.value}"
 
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+    def normalize(self):
+        """Fill attribute and value_key from name and value; call it before bulk_create"""
+        if self.attribute_id is None or self.attribute.key != SpecAttribute.key_for(self.name):
+            self.attribute = SpecAttribute.for_name(self.name)
+        self.value_key = spec_value_key(self.value)
+
 
 class Review(models.Model):
     """Product review model"""
@@ -193,6 +333,452 @@ class Review(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['product', 'user']
+        indexes = [
+            models.Index(
+                fields=['product', '-created_at'], condition=Q(is_approved=True), name='review_product_created_idx',
+            ),
+            models.Index(fields=['user', '-created_at'], name='review_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name() or self.user.email} - {self.product.name} - {self.rating} stars"
+
+
+class RatingSummary(models.Model):
+    """Approved-review totals for a product, kept current by the review signals"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(default=0, db_index=True)
+
+    # Star histogram
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Rating summaries'
+
+    def __str__(self):
+        return f"{self.product_id} - {self.average_rating:.2f} ({self.review_count} reviews)"
+
+    @property
+    def histogram(self):
+        return {star: getattr(self, f'stars_{star}') for star in range(1, 6)}
+
+    @classmethod
+    def apply_review(cls, product_id, rating, delta, create_missing=True):
+        """Add (delta=1) or remove (delta=-1) one approved review with a single UPDATE"""
+        new_count = F('review_count') + delta
+        new_sum = F('rating_sum') + rating * delta
+        updated = cls.objects.filter(product_id=product_id).update(
+            review_count=new_count,
+            rating_sum=new_sum,
+            average_rating=Coalesce(
+                ExpressionWrapper(new_sum * 1.0 / NullIf(new_count, 0), output_field=FloatField()),
+                0.0,
+            ),
+            **{f'stars_{rating}': F(f'stars_{rating}') + delta},
+            updated_at=timezone.now(),
+        )
+        if not updated and create_missing:
+            # The summary row is missing, so rebuild it from the reviews table
+            cls.rebuild(product_ids=[product_id])
+        elif updated:
+            ProductCard.sync_ratings(product_ids=[product_id])
+
+    @classmethod
+    def rebuild(cls, product_ids=None):
+        """Recompute summaries from the reviews table with one grouped query"""
+        products = Product.objects.all()
+        reviews = Review.objects.filter(is_approved=True)
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+            reviews = reviews.filter(product_id__in=product_ids)
+
+        summaries = {pk: cls(product_id=pk) for pk in products.values_list('id', flat=True)}
+        for row in reviews.values('product_id', 'rating').annotate(total=Count('id')):
+            summary = summaries.get(row['product_id'])
+            if summary is None or not 1 <= row['rating'] <= 5:
+                continue
+            summary.review_count += row['total']
+            summary.rating_sum += row['rating'] * row['total']
+            setattr(summary, f"stars_{row['rating']}", row['total'])
+
+        for summary in summaries.values():
+            if summary.review_count:
+                summary.average_rating = summary.rating_sum / summary.review_count
+
+        cls.objects.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=[
+                'review_count', 'rating_sum', 'average_rating',
+                'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5', 'updated_at',
+            ],
+            batch_size=500,
+        )
+        ProductCard.sync_ratings(product_ids=product_ids)
+        return len(summaries)
+
+
+class ProductCard(models.Model):
+    """Flat, denormalized projection of a product used by the catalog list endpoints"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200)
+    short_description = models.CharField(max_length=300, blank=True)
+
+    # Pricing
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount_percentage = models.PositiveIntegerField(default=0)
+
+    # Primary image, stored exactly as ProductImage.image.name, and its rendition key
+    image = models.CharField(max_length=500, blank=True)
+    image_rendition_key = models.CharField(max_length=64, blank=True, default='')
+
+    # Categorization
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    category_name = models.CharField(max_length=100)
+    category_slug = models.SlugField(max_length=100)
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='+')
+    brand_name = models.CharField(max_length=100)
+    brand_slug = models.SlugField(max_length=100)
+
+    # Features
+    is_active = models.BooleanField(default=True)
+    is_featured = models.BooleanField(default=False)
+    is_new_arrival = models.BooleanField(default=False)
+    is_bestseller = models.BooleanField(default=False)
+
+    # Stock and rating
+    stock_quantity = models.PositiveIntegerField(default=0)
+    is_in_stock = models.BooleanField(default=False)
+    average_rating = models.FloatField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Covering index for the search facet query
+            models.Index(
+                fields=['brand', 'category', 'is_active', 'price', 'average_rating', 'is_in_stock'],
+                name='card_facet_idx',
+            ),
+            # Keyset pagination: one partial index per sort order, ending in the pk tie-breaker
+            models.Index(
+                fields=['-created_at', '-product'], condition=Q(is_active=True), name='card_keyset_created_idx',
+            ),
+            models.Index(fields=['price', 'product'], condition=Q(is_active=True), name='card_keyset_price_idx'),
+            models.Index(
+                fields=['-average_rating', '-review_count', '-product'],
+                condition=Q(is_active=True),
+                name='card_keyset_rating_idx',
+            ),
+            models.Index(
+                fields=['-is_featured', '-is_bestseller', '-created_at', '-product'],
+                condition=Q(is_active=True),
+                name='card_keyset_featured_idx',
+            ),
+            models.Index(fields=['name', 'product'], condition=Q(is_active=True), name='card_keyset_name_idx'),
+            # Proposed by manage.py advise_indexes for the brand list filter and for the category fill of a
+            # product's related products. Category filters cover a whole subtree (category_id IN ...), which no
+            # index returns in list order; the category_id column index and the keyset indexes serve them
+            models.Index(fields=['brand_slug', '-created_at'], condition=Q(is_active=True), name='card_brand_created_idx'),
+            models.Index(fields=['category', '-created_at'], condition=Q(is_active=True), name='card_category_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def primary_image(images):
+        """Pick the primary image (or the first one) from images already in display order"""
+        images = list(images)
+        primary = next((image for image in images if image.is_primary), None) or (images[0] if images else None)
+        return primary if primary is not None and primary.image else None
+
+    @classmethod
+    def primary_image_name(cls, images):
+        primary = cls.primary_image(images)
+        if primary is None:
+            return ''
+        return primary.image.name if hasattr(primary.image, 'name') else str(primary.image)
+
+    @classmethod
+    def from_product(cls, product):
+        summary = product.get_rating_summary()
+        primary = cls.primary_image(product.images.all())
+        return cls(
+            product_id=product.id,
+            name=product.name,
+            slug=product.slug,
+            short_description=product.short_description,
+            price=product.price,
+            original_price=product.original_price,
+            discount_percentage=product.discount_percentage,
+            image=cls.primary_image_name(product.images.all()),
+            image_rendition_key=primary.rendition_key if primary else '',
+            category_id=product.category_id,
+            category_name=product.category.name,
+            category_slug=product.category.slug,
+            brand_id=product.brand_id,
+            brand_name=product.brand.name,
+            brand_slug=product.brand.slug,
+            is_active=product.is_active,
+            is_featured=product.is_featured,
+            is_new_arrival=product.is_new_arrival,
+            is_bestseller=product.is_bestseller,
+            stock_quantity=product.stock_quantity,
+            is_in_stock=product.is_in_stock,
+            average_rating=summary.average_rating if summary else 0,
+            review_count=summary.review_count if summary else 0,
+            created_at=product.created_at,
+        )
+
+    @classmethod
+    def refresh(cls, product_ids=None, batch_size=500):
+        """Rebuild cards for the given products (or the whole catalog) in batches"""
+        products = Product.objects.select_related('category', 'brand', 'rating_summary').prefetch_related('images')
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+
+        update_fields = [field.name for field in cls._meta.concrete_fields if not field.primary_key]
+        refreshed = 0
+        batch = []
+        for product in products.order_by('id').iterator(chunk_size=batch_size):
+            batch.append(cls.from_product(product))
+            if len(batch) >= batch_size:
+                refreshed += cls._upsert(batch, update_fields)
+                batch = []
+        if batch:
+            refreshed += cls._upsert(batch, update_fields)
+        return refreshed
+
+    @classmethod
+    def _upsert(cls, cards, update_fields):
+        cls.objects.bulk_create(cards, update_conflicts=True, unique_fields=['product'], update_fields=update_fields)
+        return len(cards)
+
+    @classmethod
+    def sync_ratings(cls, product_ids=None):
+        """Copy rating totals from RatingSummary with one correlated UPDATE"""
+        summary = RatingSummary.objects.filter(product_id=OuterRef('product_id'))
+        cards = cls.objects.all()
+        if product_ids is not None:
+            cards = cards.filter(product_id__in=product_ids)
+        cards.update(
+            average_rating=Coalesce(Subquery(summary.values('average_rating')[:1]), 0.0),
+            review_count=Coalesce(Subquery(summary.values('review_count')[:1]), 0),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def refresh_image(cls, product_id):
+        """Re-resolve the primary image without inserting (safe during cascade deletes)"""
+        primary = cls.primary_image(ProductImage.objects.filter(product_id=product_id))
+        cls.objects.filter(product_id=product_id).update(
+            image=cls.primary_image_name([primary] if primary else []),
+            image_rendition_key=primary.rendition_key if primary else '',
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def sync_images(cls, product_ids):
+        """Copy the primary images' rendition keys with one correlated UPDATE"""
+        primary = ProductImage.objects.filter(product_id=OuterRef('product_id')).exclude(image='').order_by(
+            '-is_primary', 'order', 'created_at'
+        )
+        cls.objects.filter(product_id__in=product_ids).update(
+            image_rendition_key=Coalesce(Subquery(primary.values('rendition_key')[:1]), models.Value('')),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def refresh_category(cls, category):
+        cls.objects.filter(category_id=category.id).update(
+            category_name=category.name,
+            category_slug=category.slug,
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def refresh_brand(cls, brand):
+        cls.objects.filter(brand_id=brand.id).update(
+            brand_name=brand.name,
+            brand_slug=brand.slug,
+            updated_at=timezone.now(),
+        )
+
+
+class RelatedProduct(models.Model):
+    """Precomputed content-based neighbour of a product, written by compute_related_products"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    # Related products shown on a product page
+    DISPLAYED = 4
+
+    class Meta:
+        ordering = ['product_id', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='related_product_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score:.3f})"
+
+    @classmethod
+    def cards_for(cls, product_id, category_id, limit=DISPLAYED):
+        """
+        Active cards of a product's related products by rank, filled up from its
+        category when there are fewer than ``limit`` links (or none computed yet)
+        """
+        links = cls.objects.filter(
+            product_id=product_id, related__card__is_active=True
+        ).select_related('related__card').order_by('rank')[:limit]
+        cards = [link.related.card for link in links]
+        if len(cards) < limit:
+            cards += ProductCard.objects.filter(category_id=category_id, is_active=True).exclude(
+                pk__in=[product_id, *(card.pk for card in cards)]
+            )[:limit - len(cards)]
+        return cards
+
+
+class CatalogStats(models.Model):
+    """
+    Single-row catalog totals for the stats endpoint, kept current by the catalog
+    signals; per-category review totals live on Category. ``reconcile()``
+    recomputes everything from the source tables.
+    """
+    total_products = models.PositiveIntegerField(default=0)
+    total_categories = models.PositiveIntegerField(default=0)
+    total_brands = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Catalog stats'
+
+    def __str__(self):
+        return f"{self.total_products} products, {self.total_categories} categories, {self.total_brands} brands"
+
+    @classmethod
+    def load(cls, max_age=None):
+        """The stats row; reconciled first when missing or last reconciled more than ``max_age`` seconds ago"""
+        stats = cls.objects.filter(pk=1).first()
+        if stats is None or stats.reconciled_at is None:
+            return cls.reconcile()
+        if max_age is not None and (timezone.now() - stats.reconciled_at).total_seconds() > max_age:
+            return cls.reconcile()
+        return stats
+
+    @classmethod
+    def adjust(cls, **deltas):
+        """Move totals by the given deltas with a single UPDATE"""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updated = cls.objects.filter(pk=1).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.reconcile()
+
+    @staticmethod
+    def apply_review(product_id, rating, delta):
+        """Add (delta=1) or remove (delta=-1) one approved review on its product's category"""
+        category = Product.objects.filter(pk=product_id).values('category_id')[:1]
+        Category.objects.filter(pk=Subquery(category)).update(
+            review_count=F('review_count') + delta, rating_sum=F('rating_sum') + rating * delta
+        )
+
+    @staticmethod
+    def move_product_reviews(product_id, old_category_id, new_category_id):
+        """Carry a product's approved review totals over when it changes category"""
+        summary = RatingSummary.objects.filter(product_id=product_id).values('review_count', 'rating_sum').first()
+        if not summary or not summary['review_count']:
+            return
+        for category_id, sign in ((old_category_id, -1), (new_category_id, 1)):
+            Category.objects.filter(pk=category_id).update(
+                review_count=F('review_count') + sign * summary['review_count'],
+                rating_sum=F('rating_sum') + sign * summary['rating_sum'],
+            )
+
+    @staticmethod
+    def recount_category_reviews(category_ids=None):
+        """Recompute the per-category review totals with one correlated UPDATE"""
+        reviews = Review.objects.filter(product__category=OuterRef('pk'), is_approved=True).order_by()
+        reviews = reviews.values('product__category')
+        categories = Category.objects.all() if category_ids is None else Category.objects.filter(id__in=category_ids)
+        return categories.update(
+            review_count=Coalesce(Subquery(reviews.annotate(total=Count('id')).values('total')[:1]), 0),
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')[:1]), 0),
+        )
+
+    @classmethod
+    def reconcile(cls):
+        """Recompute the totals and the per-category review totals from the source tables"""
+        cls.recount_category_reviews()
+        now = timezone.now()
+        stats, _ = cls.objects.update_or_create(pk=1, defaults={
+            'total_products': Product.objects.filter(is_active=True).count(),
+            'total_categories': Category.objects.filter(is_active=True).count(),
+            'total_brands': Brand.objects.filter(is_active=True).count(),
+            'reconciled_at': now,
+        })
+        return stats
+
+
+class SearchTermRollup(models.Model):
+    """
+    Searches for one normalized term in an hourly or daily bucket, flushed from
+    the per-worker heavy-hitters sketches (products.search_analytics). ``searches``
+    may overcount by at most ``error``.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+    term = models.CharField(max_length=100)
+    searches = models.PositiveIntegerField(default=0)
+    error = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket', 'term'], name='search_rollup_term_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'bucket', '-searches'], name='search_rollup_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} ({self.period} {self.bucket:%Y-%m-%d %H:%M}: {self.searches})"
+
+
+class SearchVolume(models.Model):
+    """All searches recorded in an hourly or daily bucket, including terms the rollup dropped"""
+    period = models.CharField(max_length=4, choices=SearchTermRollup.PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+    searches = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket'], name='search_volume_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M}: {self.searches}"
@@ -0,0 +1,155 @@
+"""
+Content-based related products.
+
+Every active product becomes a TF-IDF vector over its name, description and
+specification values (name and specifications weighted higher). Rows are L2
+normalized, so a sparse matrix product gives cosine similarities, and the top-k
+neighbours of each row are picked with one vectorized sort per block of rows.
+Products of the same category rank ahead through a score boost; pairs below
+``MIN_SCORE`` (``MIN_CROSS_CATEGORY_SCORE`` across categories) are not linked. The results replace the RelatedProduct table.
+
+Requires NumPy and SciPy; only the batch command imports this module.
+"""
+import re
+
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+
+from .models import Product, ProductSpecification, RelatedProduct
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+
+STOP_WORDS = frozenset('''
+    an and are as at be by for from has have in is it its of on or that the this to was with
+    your you our we will can all not but more new into over per
+'''.split())
+
+# Term weight of each source field
+FIELD_WEIGHTS = (('name', 3.0), ('specifications', 2.0), ('description', 1.0))
+
+DEFAULT_TOP_K = 4
+
+# Terms in more than this share of the catalog say little about similarity and
+# make the similarity matrix dense
+MAX_DOCUMENT_FREQUENCY = 0.05
+
+# Below this many products the cap above would drop most shared terms (a brand
+# or a product type easily spans 5% of a small catalog), and density is no issue
+MIN_DOCUMENTS_FOR_FREQUENCY_CAP = 1000
+
+# Cosine similarity a pair needs to be linked at all, and across categories
+MIN_SCORE = 0.1
+MIN_CROSS_CATEGORY_SCORE = 0.5
+
+# Ranking multiplier for neighbours in the product's own category
+CATEGORY_BOOST = 2.0
+
+BLOCK_SIZE = 512
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def load_documents():
+    """Return ``(product_ids, category_ids, [{field: text}, ...])`` for every active product"""
+    specifications = {}
+    rows = ProductSpecification.objects.filter(product__is_active=True).values_list('product_id', 'value')
+    for product_id, value in rows.iterator(chunk_size=2000):
+        specifications.setdefault(product_id, []).append(value)
+
+    product_ids, category_ids, documents = [], [], []
+    products = Product.objects.filter(is_active=True).order_by('pk').values_list(
+        'pk', 'category_id', 'name', 'description'
+    )
+    for pk, category_id, name, description in products.iterator(chunk_size=2000):
+        product_ids.append(pk)
+        category_ids.append(category_id)
+        documents.append({
+            'name': name,
+            'description': description,
+            'specifications': ' '.join(specifications.get(pk, ())),
+        })
+    return np.array(product_ids, dtype=np.int64), np.array(category_ids, dtype=np.int64), documents
+
+
+def tfidf_matrix(documents, max_document_frequency=MAX_DOCUMENT_FREQUENCY):
+    """L2-normalized TF-IDF rows (CSR, float32) with sublinear term frequency"""
+    vocabulary = {}
+    rows, columns, weights = [], [], []
+    for row, document in enumerate(documents):
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(document[field]):
+                rows.append(row)
+                columns.append(vocabulary.setdefault(token, len(vocabulary)))
+                weights.append(weight)
+
+    shape = (len(documents), len(vocabulary))
+    counts = sparse.csr_matrix(
+        (np.array(weights, dtype=np.float32), (np.array(rows), np.array(columns))), shape=shape
+    )
+    counts.sum_duplicates()
+
+    document_frequency = np.bincount(counts.indices, minlength=shape[1])
+    # Terms seen once cannot link two products; in a large catalog very common terms link everything
+    useful = document_frequency > 1
+    if shape[0] >= MIN_DOCUMENTS_FOR_FREQUENCY_CAP:
+        useful &= document_frequency <= max_document_frequency * shape[0]
+    idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+    idf[~useful] = 0
+
+    matrix = counts.copy()
+    matrix.data = np.log1p(matrix.data) * idf[matrix.indices].astype(np.float32)
+    matrix.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags((1 / norms).astype(np.float32)) @ matrix
+
+
+def nearest_neighbours(matrix, categories, top_k=DEFAULT_TOP_K, block_size=BLOCK_SIZE, min_score=MIN_SCORE):
+    """
+    Yield ``(rows, neighbours, scores, ranks)`` arrays per block: the ``top_k`` best
+    other rows of each row, ranked from 1. Rows of the same entry in ``categories``
+    need ``min_score`` and rank first in line; others need ``MIN_CROSS_CATEGORY_SCORE``.
+    """
+    transposed = matrix.T.tocsr()
+    for start in range(0, matrix.shape[0], block_size):
+        similarities = (matrix[start:start + block_size] @ transposed).tocsr()
+        rows = np.repeat(np.arange(similarities.shape[0]), np.diff(similarities.indptr)) + start
+        columns, scores = similarities.indices, similarities.data
+
+        same_category = categories[rows] == categories[columns]
+        keep = (rows != columns) & (scores >= np.where(same_category, min_score, MIN_CROSS_CATEGORY_SCORE))
+        rows, columns, scores, same_category = rows[keep], columns[keep], scores[keep], same_category[keep]
+
+        boosted = np.where(same_category, scores * CATEGORY_BOOST, scores)
+        order = np.lexsort((-boosted, rows))
+        rows, columns, scores = rows[order], columns[order], scores[order]
+        within = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+        keep = within < top_k
+        yield rows[keep], columns[keep], scores[keep], within[keep] + 1
+
+
+@transaction.atomic
+def rebuild(top_k=DEFAULT_TOP_K, block_size=BLOCK_SIZE):
+    """Recompute every product's neighbours; returns the number of stored links"""
+    product_ids, category_ids, documents = load_documents()
+    RelatedProduct.objects.all().delete()
+    if not len(product_ids):
+        return 0
+
+    matrix = tfidf_matrix(documents)
+    stored = 0
+    for rows, columns, scores, ranks in nearest_neighbours(matrix, category_ids, top_k, block_size):
+        links = [
+            RelatedProduct(product_id=product_id, related_id=related_id, rank=rank, score=score)
+            for product_id, related_id, rank, score in zip(
+                product_ids[rows].tolist(), product_ids[columns].tolist(), ranks.tolist(), scores.tolist()
+            )
+        ]
+        RelatedProduct.objects.bulk_create(links, batch_size=1000)
+        stored += len(links)
+    return stored
@@ -0,0 +1,213 @@
+"""
+Fixed-size WebP and JPEG renditions of locally stored product images.
+
+Every ProductImage whose file lives under MEDIA_ROOT is rendered into
+``PRODUCT_IMAGE_RENDITIONS`` sizes (list thumbnail, detail, zoom). The
+rendering itself is shopfluence.imaging, run in a ``spawn`` process pool. Files
+are content-addressed under ``MEDIA_ROOT/renditions/`` and the image row keeps
+only their key (``rendition_key``), so the URLs follow from the key and never
+change their content. ``serve`` sends them with a one-year ``immutable``
+Cache-Control. Remote (http/https) images are left pointing at their origin.
+
+Uploads and imported images are rendered in the background once their
+transaction commits (see signals and products.importer), never in the request
+that wrote them; ``manage.py render_product_images`` backfills the rest. Until
+an image has a key the serializers fall back to the original file.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, reset_queries, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.views.static import serve as serve_static
+
+from shopfluence import imaging
+
+from . import response_cache
+from .models import ProductCard, ProductImage
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = 'renditions'
+
+SIZES = getattr(settings, 'PRODUCT_IMAGE_RENDITIONS', {'thumbnail': 320, 'detail': 960, 'zoom': 1920})
+
+FORMATS = tuple(imaging.FORMATS)
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def root():
+    return os.path.join(settings.MEDIA_ROOT, DIRECTORY)
+
+
+def source_path(image):
+    """Filesystem path of a locally stored image file, None for remote URLs and missing files"""
+    name = str(image.image or '')
+    if not name or name.startswith('http://') or name.startswith('https://'):
+        return None
+    try:
+        path = image.image.path
+    except NotImplementedError:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def rendition_urls(key, absolute=None, sizes=None):
+    """``{size: {format: url}}`` for a rendition key; ``absolute`` turns storage URLs into absolute ones"""
+    if not key:
+        return None
+    absolute = absolute or (lambda url: url)
+    return {
+        name: {fmt: absolute(rendition_url(key, name, fmt)) for fmt in FORMATS}
+        for name in (sizes or SIZES)
+    }
+
+
+def rendition_url(key, name, fmt):
+    return default_storage.url(f'{DIRECTORY}/{imaging.rendition_name(key, name, fmt)}')
+
+
+def pending(queryset=None, rerender=False):
+    """Locally stored images still without renditions (all of them with ``rerender``)"""
+    images = ProductImage.objects.all() if queryset is None else queryset
+    images = images.exclude(image__startswith='http://').exclude(image__startswith='https://').exclude(image='')
+    return images if rerender else images.filter(rendition_key='')
+
+
+def workers():
+    return getattr(settings, 'PRODUCT_IMAGE_WORKERS', None) or os.cpu_count() or 1
+
+
+def render_all(tasks, max_workers=None):
+    """Yield ``(pk, key or None)`` for ``(pk, path)`` tasks, rendered in a process pool when there are several"""
+    max_workers = min(max_workers or workers(), len(tasks))
+    arguments = (root(), SIZES, FORMATS)
+    if max_workers <= 1:
+        for pk, path in tasks:
+            yield pk, render_one(path, *arguments)
+        return
+    # spawn: forking a threaded web process can deadlock; imaging needs no Django setup
+    with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [(pk, pool.submit(imaging.render, path, *arguments)) for pk, path in tasks]
+        for pk, future in futures:
+            try:
+                yield pk, future.result()[0]
+            except Exception:
+                logger.warning('Could not render product image %s', pk, exc_info=True)
+                yield pk, None
+
+
+def render_one(path, *arguments):
+    try:
+        return imaging.render(path, *arguments)[0]
+    except Exception:
+        logger.warning('Could not render %s', path, exc_info=True)
+        return None
+
+
+def process(images, max_workers=None, batch_size=500, progress=None):
+    """Render ``images`` (a queryset or instances) and store their keys; returns ``(rendered, failed)``"""
+    if isinstance(images, QuerySet):
+        images = images.only('pk', 'image').iterator(chunk_size=batch_size)
+    tasks = []
+    for image in images:
+        path = source_path(image)
+        if path:
+            tasks.append((image.pk, path))
+    rendered = failed = 0
+    keys = {}
+    for pk, key in render_all(tasks, max_workers):
+        if key is None:
+            failed += 1
+            continue
+        keys[pk] = key
+        if len(keys) >= batch_size:
+            rendered += store(keys)
+            keys = {}
+            if progress:
+                progress(rendered, failed, len(tasks))
+    rendered += store(keys)
+    if progress:
+        progress(rendered, failed, len(tasks))
+    return rendered, failed
+
+
+def store(keys):
+    """Save rendition keys and bring the product cards' thumbnails along"""
+    if not keys:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        # bulk_update skips auto_now; updated_at feeds the product detail ETag (products.conditional)
+        changed = [
+            ProductImage(pk=pk, rendition_key=keys[pk], updated_at=now)
+            for pk, stored in ProductImage.objects.filter(pk__in=keys).values_list('pk', 'rendition_key')
+            if stored != keys[pk]
+        ]
+        ProductImage.objects.bulk_update(changed, ['rendition_key', 'updated_at'])
+        product_ids = set(ProductImage.objects.filter(pk__in=keys).values_list('product_id', flat=True))
+        ProductCard.sync_images(product_ids)
+    if changed:
+        response_cache.invalidate('products')
+    reset_queries()
+    return len(keys)
+
+
+_queue = []
+_lock = threading.Lock()
+_running = threading.Event()
+
+
+def schedule(image_ids):
+    """Render these images in a background thread (feeding the process pool) after the current transaction"""
+    image_ids = list(image_ids)
+    if image_ids:
+        transaction.on_commit(lambda: enqueue(image_ids))
+
+
+def enqueue(image_ids):
+    def run():
+        try:
+            while True:
+                with _lock:
+                    batch = _queue[:]
+                    _queue.clear()
+                    if not batch:
+                        _running.clear()
+                        return
+                process(ProductImage.objects.filter(pk__in=batch))
+        except Exception:
+            logger.exception('Rendering product images failed')
+            _running.clear()
+        finally:
+            connection.close()
+
+    with _lock:
+        _queue.extend(image_ids)
+        if _running.is_set():
+            return
+        _running.set()
+    threading.Thread(target=run, name='product-image-renditions', daemon=True).start()
+
+
+def wait(timeout=None):
+    """Block until background rendering has drained (for scripts and tests)"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _running.is_set() and (deadline is None or time.monotonic() < deadline):
+        time.sleep(0.05)
+    return not _running.is_set()
+
+
+def serve(request, path):
+    """Serve a rendition file; the content behind a path never changes, so caches may keep it for a year"""
+    response = serve_static(request, path, document_root=root())
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -0,0 +1,170 @@
+"""
+Response cache for the public catalog endpoints.
+
+Cached views belong to one or more groups (``products``, ``categories``,
+``brands``, ``stats``). Every group has a generation stored in the cache and
+baked into the cache keys of its views, so invalidating a group is a single
+write of a new generation: entries from older generations are simply never
+read again and age out through the TTL. The catalog signals bump the groups a
+write can affect.
+
+Responses are cached in each worker's own default cache, but the generations
+live in ``CATALOG_GENERATION_CACHE``, which every worker and management command
+must share (the file cache under ``var/`` on one host, Redis or Memcached across
+hosts): a write handled anywhere then reaches every worker on its next request.
+A generation is a random token rather than a counter, so concurrent bumps never
+collapse into one, and a generation missing from the shared cache (evicted or
+cleared) is replaced by a fresh token instead of restarting from an old value.
+The suggest index and search analytics reuse these generations.
+
+Hit and miss counters are kept per view and reported by ``cache_stats``.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = 'catalog-cache'
+CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600)
+GENERATION_CACHE = getattr(settings, 'CATALOG_GENERATION_CACHE', 'default')
+
+# Names of the cached views, in registration order, for the stats report
+registered_views = []
+
+
+def generation_key(group):
+    return f'{KEY_PREFIX}:generation:{group}'
+
+
+def generation_cache():
+    return caches[GENERATION_CACHE]
+
+
+def new_generation():
+    return uuid.uuid4().hex[:16]
+
+
+def current_generations(groups):
+    """The shared generation of every group, starting a fresh one for groups that have none"""
+    shared = generation_cache()
+    keys = [generation_key(group) for group in groups]
+    generations = shared.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            shared.add(key, new_generation(), timeout=None)
+            generations[key] = shared.get(key)
+    return [generations[key] for key in keys]
+
+
+def current_generation(group):
+    return current_generations([group])[0]
+
+
+def counter_key(name, outcome):
+    return f'{KEY_PREFIX}:{outcome}:{name}'
+
+
+def normalized_query(request):
+    """Query params sorted by name, blank values dropped, repeated values kept in order"""
+    items = []
+    for name, values in sorted(request.query_params.lists()):
+        values = [value for value in values if value != '']
+        if values:
+            items.append((name, values))
+    return items
+
+
+def response_key(request, name, groups):
+    parts = [
+        name,
+        request.get_host(),
+        request.path,
+        repr(normalized_query(request)),
+        repr(current_generations(groups)),
+    ]
+    digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:response:{name}:{digest}'
+
+
+def increment(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The key was evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def cached_response(request, name, groups, build):
+    """Serve ``build()``'s response from the cache when possible"""
+    if request.method != 'GET':
+        return build()
+    key = response_key(request, name, groups)
+    data = cache.get(key)
+    if data is not None:
+        increment(counter_key(name, 'hits'))
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    increment(counter_key(name, 'misses'))
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data, CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_response(*groups):
+    """Decorator for ``@api_view`` functions; place it below ``@api_view``"""
+    def decorator(view):
+        name = view.__name__
+        registered_views.append(name)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cached_response(request, name, groups, lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class CachedResponseMixin:
+    """Cache GET responses of a generic view; subclasses set ``cache_groups``"""
+    cache_groups = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        registered_views.append(cls.__name__)
+
+    def get(self, request, *args, **kwargs):
+        return cached_response(
+            request, type(self).__name__, self.cache_groups,
+            lambda: super(CachedResponseMixin, self).get(request, *args, **kwargs),
+        )
+
+
+def invalidate(*groups):
+    """Drop every cached response of the groups once the current transaction commits"""
+    def bump():
+        generation_cache().set_many({generation_key(group): new_generation() for group in groups}, timeout=None)
+    transaction.on_commit(bump)
+
+
+def cache_stats():
+    counters = cache.get_many(
+        [counter_key(name, outcome) for name in registered_views for outcome in ('hits', 'misses')]
+    )
+    stats = {}
+    for name in registered_views:
+        hits = counters.get(counter_key(name, 'hits'), 0)
+        misses = counters.get(counter_key(name, 'misses'), 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
@@ -0,0 +1,359 @@
+"""
+SQLite FTS5 full-text index over the catalog.
+
+Each product is one row in the ``products_search_index`` virtual table (rowid =
+product id) holding its name, descriptions, brand, category and specification
+values. The index is kept in sync by the product signals and can be rebuilt with
+``manage.py rebuild_search_index``. On other database engines the helpers report
+the index as unavailable and callers fall back to ``icontains`` filtering.
+
+Typo tolerance: the words of product, brand and category names are split into
+padded character trigrams in ``products_search_trigrams`` (trigram, word
+length, word), maintained alongside the index rows. When a query's exact match
+finds fewer than ``SEARCH_FUZZY_MIN_HITS`` products, every query word the index
+does not know is looked up by shared trigrams among words of a similar length.
+The candidates are ranked by edit distance and trigram similarity, and the best
+few are ORed into the match expression next to the original word. Words no
+longer used by any name stay in the trigram table until the next rebuild. They
+are filtered out through the ``fts5vocab`` view of the index.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .suggest import normalize
+
+SEARCH_TABLE = 'products_search_index'
+
+# Relative BM25 weight of each indexed column, in table column order
+COLUMN_WEIGHTS = (
+    ('name', 10.0),
+    ('short_description', 4.0),
+    ('description', 1.0),
+    ('brand', 6.0),
+    ('category', 3.0),
+    ('specifications', 2.0),
+)
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    + ', '.join(column for column, _ in COLUMN_WEIGHTS)
+    + ", tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+DROP_TABLE_SQL = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+
+# Builds index rows straight from the catalog tables; {where} narrows the products
+INDEX_ROWS_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, name, short_description, description, brand, category, specifications)
+    SELECT p.id, p.name, p.short_description, p.description, b.name, c.name,
+           COALESCE((
+               SELECT group_concat(s.name || ' ' || s.value, ' ')
+               FROM products_productspecification s
+               WHERE s.product_id = p.id
+           ), '')
+    FROM products_product p
+    INNER JOIN products_brand b ON b.id = p.brand_id
+    INNER JOIN products_category c ON c.id = p.category_id
+    {{where}}
+"""
+
+TRIGRAM_TABLE = 'products_search_trigrams'
+VOCAB_TABLE = 'products_search_vocab'
+
+# Keyed by trigram and word length, so a lookup only reads words of a plausible length
+CREATE_TRIGRAM_TABLE_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {TRIGRAM_TABLE} (trigram TEXT NOT NULL, length INTEGER NOT NULL, "
+    "word TEXT NOT NULL, PRIMARY KEY (trigram, length, word)) WITHOUT ROWID"
+)
+
+DROP_TRIGRAM_TABLE_SQL = f"DROP TABLE IF EXISTS {TRIGRAM_TABLE}"
+
+# Per-column term statistics of the index, always current
+CREATE_VOCAB_TABLE_SQL = f"CREATE VIRTUAL TABLE IF NOT EXISTS {VOCAB_TABLE} USING fts5vocab({SEARCH_TABLE}, 'col')"
+
+# Index columns whose words can be suggested as corrections
+NAME_COLUMNS = ('name', 'brand', 'category')
+
+# Product, brand and category names of the products selected by {where}
+NAMES_SQL = """
+    SELECT p.name, b.name, c.name
+    FROM products_product p
+    INNER JOIN products_brand b ON b.id = p.brand_id
+    INNER JOIN products_category c ON c.id = p.category_id
+    {where}
+"""
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_TOKENS = 8
+
+# Exact matches below which the query also tries typo corrections
+FUZZY_MIN_HITS = getattr(settings, 'SEARCH_FUZZY_MIN_HITS', 3)
+
+# Words shorter than this are neither indexed by trigram nor corrected
+MIN_FUZZY_LENGTH = 3
+
+# Jaccard similarity of the trigram sets a correction needs at least
+MIN_SIMILARITY = 0.3
+
+# Words sharing the most trigrams with a query word that are scored
+TRIGRAM_CANDIDATES = 50
+
+# Corrections ORed in per query word
+MAX_CORRECTIONS = 3
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """
+    Turn free text into a safe FTS5 expression: every word must match, and the
+    last word is matched as a prefix so partially typed queries still hit.
+    Returns an empty string when the query contains no searchable words.
+    """
+    tokens = TOKEN_RE.findall(query.lower())[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' AND '.join(terms)
+
+
+def bm25_expression():
+    weights = ', '.join(str(weight) for _, weight in COLUMN_WEIGHTS)
+    return f'bm25({SEARCH_TABLE}, {weights})'
+
+
+def match_ids(match_expression):
+    """Subquery of product ids matching the expression, usable as ``pk__in``"""
+    return RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', (match_expression,))
+
+
+def rank(match_expression, id_column):
+    """
+    Correlated BM25 score for the row whose product id is ``id_column``.
+    FTS5 scores are negative, so ascending order puts the best match first.
+    """
+    return RawSQL(
+        f'SELECT {bm25_expression()} FROM {SEARCH_TABLE} '
+        f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = {id_column}',
+        (match_expression,),
+    )
+
+
+def search(queryset, query, id_field='pk', match_expression=None):
+    """
+    Restrict ``queryset`` to rows matching ``query`` (or a prepared
+    ``match_expression``) and annotate them with ``search_rank``. Other filters
+    on the queryset combine with the match in SQL.
+    """
+    if match_expression is None:
+        match_expression = build_match_expression(query)
+    if not match_expression:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    opts = queryset.model._meta
+    field = opts.pk if id_field == 'pk' else opts.get_field(id_field)
+    quote = connection.ops.quote_name
+    id_column = f'{quote(opts.db_table)}.{quote(field.column)}'
+    return queryset.filter(**{f'{id_field}__in': match_ids(match_expression)}).annotate(
+        search_rank=rank(match_expression, id_column)
+    )
+
+
+def index_products(product_ids):
+    """Replace the index rows of the given products (deleted products are just removed)"""
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids or not is_available():
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+        cursor.execute(INDEX_ROWS_SQL.format(where=f'WHERE p.id IN ({placeholders})'), product_ids)
+    index_words(f'WHERE p.id IN ({placeholders})', product_ids)
+
+
+def index_products_where(column, value):
+    """Reindex every product whose ``column`` (e.g. brand_id) equals ``value``"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM products_product WHERE {column} = %s)',
+            [value],
+        )
+        cursor.execute(INDEX_ROWS_SQL.format(where=f'WHERE p.{column} = %s'), [value])
+    index_words(f'WHERE p.{column} = %s', [value])
+
+
+def remove_products(product_ids):
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids or not is_available():
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+
+
+def rebuild():
+    """Drop and repopulate the whole index; returns the number of indexed products"""
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_TABLE_SQL)
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute(INDEX_ROWS_SQL.format(where=''))
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(CREATE_VOCAB_TABLE_SQL)
+        cursor.execute(DROP_TRIGRAM_TABLE_SQL)
+        cursor.execute(CREATE_TRIGRAM_TABLE_SQL)
+        cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+        indexed = cursor.fetchone()[0]
+    index_words()
+    return indexed
+
+
+def trigrams(word):
+    """Distinct trigrams of a word padded like pg_trgm, so its start weighs more than its end"""
+    padded = f'  {word} '
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+def name_words(texts):
+    """Words of the given names worth correcting towards: normalized, long enough, not plain numbers"""
+    words = set()
+    for text in texts:
+        words.update(word for word in normalize(text).split() if len(word) >= MIN_FUZZY_LENGTH and not word.isdigit())
+    return words
+
+
+def index_words(where='', params=()):
+    """Add the trigrams of the words in the names of the products selected by ``where``"""
+    # One transaction, in key order: executemany would otherwise commit row by row
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(NAMES_SQL.format(where=where), params)
+        words = set()
+        for row in cursor.fetchall():
+            words.update(name_words(row))
+        cursor.executemany(
+            f'INSERT OR IGNORE INTO {TRIGRAM_TABLE} (trigram, length, word) VALUES (%s, %s, %s)',
+            sorted((trigram, len(word), word) for word in words for trigram in trigrams(word)),
+        )
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (a swap of neighbours costs 1); ``limit + 1`` once it exceeds ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def max_edits(word):
+    return 1 if len(word) <= 4 else 2
+
+
+def is_known(cursor, word, prefix=False):
+    """Whether the index holds ``word`` in any column (or, with ``prefix``, a word starting with it)"""
+    if prefix:
+        cursor.execute(
+            f'SELECT 1 FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s LIMIT 1', [word, word + '\U0010ffff']
+        )
+    else:
+        cursor.execute(f'SELECT 1 FROM {VOCAB_TABLE} WHERE term = %s LIMIT 1', [word])
+    return cursor.fetchone() is not None
+
+
+def corrections(cursor, word):
+    """
+    Name words close to ``word`` as ``(word, similarity, distance)``: those needing
+    the fewest edits, most similar (then most used) first
+    """
+    grams = trigrams(word)
+    # The first-letter trigram is shared by a large slice of the vocabulary; it
+    # counts towards similarity but would mostly add noise to the lookup
+    lookup = sorted(grams - {f'  {word[0]}'})
+    limit = max_edits(word)
+    cursor.execute(
+        f'SELECT word FROM {TRIGRAM_TABLE} '
+        f'WHERE trigram IN ({", ".join(["%s"] * len(lookup))}) AND length BETWEEN %s AND %s '
+        f'GROUP BY word ORDER BY count(*) DESC LIMIT {TRIGRAM_CANDIDATES}',
+        [*lookup, len(word) - limit, len(word) + limit],
+    )
+    scored = {}
+    for (candidate,) in cursor.fetchall():
+        candidate_grams = trigrams(candidate)
+        shared = len(grams & candidate_grams)
+        similarity = shared / (len(grams) + len(candidate_grams) - shared)
+        if similarity < MIN_SIMILARITY or candidate == word:
+            continue
+        distance = edit_distance(word, candidate, limit)
+        if distance <= limit:
+            scored[candidate] = (similarity, distance)
+    if not scored:
+        return []
+    # Words that left every name since the last rebuild have no documents any more
+    cursor.execute(
+        f'SELECT term, sum(doc) FROM {VOCAB_TABLE} WHERE term IN ({", ".join(["%s"] * len(scored))}) '
+        f'AND col IN ({", ".join(["%s"] * len(NAME_COLUMNS))}) GROUP BY term',
+        [*scored, *NAME_COLUMNS],
+    )
+    documents = {term: count for term, count in cursor.fetchall() if count}
+    ranked = sorted(documents, key=lambda term: (scored[term][1], -scored[term][0], -documents[term], term))
+    # Only the words needing the fewest edits
+    ranked = [term for term in ranked if scored[term][1] == scored[ranked[0]][1]] if ranked else []
+    return [(term, *scored[term]) for term in ranked[:MAX_CORRECTIONS]]
+
+
+def count_matches(match_expression, limit):
+    """Products matching the expression, counted up to ``limit``"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT count(*) FROM (SELECT 1 FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT %s)',
+            [match_expression, limit],
+        )
+        return cursor.fetchone()[0]
+
+
+def resolve_query(query):
+    """
+    ``(match_expression, corrected_query)`` for free text. When the exact match
+    finds fewer than ``FUZZY_MIN_HITS`` products, unknown words also match their
+    closest name words and ``corrected_query`` spells the query with the best of
+    them; otherwise it is None.
+    """
+    match_expression = build_match_expression(query)
+    if not match_expression or count_matches(match_expression, FUZZY_MIN_HITS) >= FUZZY_MIN_HITS:
+        return match_expression, None
+    words = normalize(query).split()[:MAX_QUERY_TOKENS]
+    if not words:
+        return match_expression, None
+    groups, corrected, changed = [], [], False
+    with connection.cursor() as cursor:
+        for position, word in enumerate(words):
+            last = position == len(words) - 1
+            alternatives = []
+            if len(word) >= MIN_FUZZY_LENGTH and not word.isdigit() and not is_known(cursor, word, prefix=last):
+                alternatives = [term for term, _, _ in corrections(cursor, word)]
+            groups.append([f'"{word}"' + ('*' if last else '')] + [f'"{term}"' for term in alternatives])
+            corrected.append(alternatives[0] if alternatives else word)
+            changed = changed or bool(alternatives)
+    if not changed:
+        return match_expression, None
+    fuzzy_expression = ' AND '.join(
+        group[0] if len(group) == 1 else '(' + ' OR '.join(group) + ')' for group in groups
+    )
+    return fuzzy_expression, ' '.join(corrected)
@@ -0,0 +1,261 @@
+"""
+Popular search terms in fixed memory.
+
+``record`` normalizes a term (suggest.normalize) and counts it in the worker's
+Space-Saving sketch: at most ``SEARCH_ANALYTICS_CAPACITY`` terms are tracked, and
+a new term replaces the least counted one, inheriting its count as the bound on
+its own overcount. A min-heap with lazily discarded entries finds that term in
+logarithmic time. Every ``SEARCH_ANALYTICS_FLUSH_INTERVAL`` seconds, and when the
+hour changes, the sketch is swapped for an empty one and a background thread
+adds its counts into the hourly and daily ``SearchTermRollup`` buckets with one
+upsert per row. Each bucket is then trimmed back to the capacity, and buckets
+older than ``SEARCH_ANALYTICS_RETENTION`` are deleted.
+
+``popular`` answers the hour / day / week / month windows from the rollups:
+one grouped query over at most ``capacity`` rows per bucket, cached until the
+next flush. Counts may overcount a term by at most its ``error``; terms still
+in an unflushed sketch show up after the next flush.
+"""
+import atexit
+import heapq
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Subquery, Sum
+from django.utils import timezone
+
+from . import response_cache
+from .models import SearchTermRollup, SearchVolume
+from .suggest import normalize
+
+logger = logging.getLogger(__name__)
+
+CAPACITY = getattr(settings, 'SEARCH_ANALYTICS_CAPACITY', 1000)
+FLUSH_INTERVAL = getattr(settings, 'SEARCH_ANALYTICS_FLUSH_INTERVAL', 60)
+RETENTION = getattr(settings, 'SEARCH_ANALYTICS_RETENTION', {'hour': 2, 'day': 90})
+
+GENERATION_GROUP = 'search-analytics'
+
+MAX_TERM_LENGTH = SearchTermRollup._meta.get_field('term').max_length
+
+# Most terms a popular list holds
+TOP_K = 50
+
+# Window -> (rollup period, buckets summed)
+WINDOWS = {
+    'hour': (SearchTermRollup.HOUR, 1),
+    'day': (SearchTermRollup.HOUR, 24),
+    'week': (SearchTermRollup.DAY, 7),
+    'month': (SearchTermRollup.DAY, 30),
+}
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: approximate counts of the ``capacity`` most frequent terms"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        # term -> [count, error]; the true count lies in [count - error, count]
+        self.counts = {}
+        # (count, term) pairs; an entry whose count no longer matches is stale
+        self.heap = []
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, term, weight=1):
+        self.total += weight
+        entry = self.counts.get(term)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.capacity:
+            entry = self.counts[term] = [weight, 0]
+        else:
+            floor = self.evict()
+            entry = self.counts[term] = [floor + weight, floor]
+        heapq.heappush(self.heap, (entry[0], term))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, term) for term, (count, _) in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def evict(self):
+        """Drop the least counted term; returns its count"""
+        while True:
+            count, term = heapq.heappop(self.heap)
+            entry = self.counts.get(term)
+            if entry is not None and entry[0] == count:
+                del self.counts[term]
+                return count
+
+    def top(self, count=None):
+        """``(term, count, error)`` most counted first"""
+        items = sorted(self.counts.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(term, searches, error) for term, (searches, error) in items[:count]]
+
+
+def normalize_term(text):
+    return normalize(text)[:MAX_TERM_LENGTH].rstrip()
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def day_of(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+_sketch = SpaceSaving()
+_bucket = None
+_started = time.monotonic()
+# Drained (hour, sketch) pairs waiting to be written
+_pending = []
+_lock = threading.Lock()
+_flushing = threading.Event()
+
+
+def record(text):
+    """Count one search; returns the normalized term, '' when nothing is left to count"""
+    global _sketch, _bucket, _started
+    term = normalize_term(text)
+    if not term:
+        return term
+    hour = hour_of(timezone.now())
+    with _lock:
+        due = bool(_sketch.total) and (hour != _bucket or time.monotonic() - _started >= FLUSH_INTERVAL)
+        if due:
+            _pending.append((_bucket, _sketch))
+            _sketch = SpaceSaving()
+        if due or not _sketch.total:
+            _bucket, _started = hour, time.monotonic()
+        _sketch.add(term)
+    if due:
+        flush_in_background()
+    return term
+
+
+def drain():
+    global _sketch
+    with _lock:
+        if _sketch.total:
+            _pending.append((_bucket, _sketch))
+            _sketch = SpaceSaving()
+        batches = _pending[:]
+        _pending.clear()
+    return batches
+
+
+def flush():
+    """Write every counted search to the rollups now; returns the searches written"""
+    written = 0
+    for hour, sketch in drain():
+        write(hour, sketch)
+        written += sketch.total
+    return written
+
+
+def flush_in_background():
+    def run():
+        try:
+            flush()
+        except Exception:
+            logger.exception('Flushing search analytics failed')
+        finally:
+            connection.close()
+            _flushing.clear()
+
+    with _lock:
+        if _flushing.is_set():
+            return
+        _flushing.set()
+    threading.Thread(target=run, name='search-analytics', daemon=True).start()
+
+
+def upsert_sql(model, key_fields, value_fields):
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = [*key_fields, *value_fields]
+    additions = ', '.join(f'{field} = {table}.{field} + excluded.{field}' for field in value_fields)
+    return (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({", ".join(key_fields)}) DO UPDATE SET {additions}'
+    )
+
+
+def write(hour, sketch):
+    """Add a drained sketch's counts to its hourly and daily buckets"""
+    buckets = [(SearchTermRollup.HOUR, hour), (SearchTermRollup.DAY, day_of(hour))]
+    top = sketch.top()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for period, bucket in buckets:
+            stored = connection.ops.adapt_datetimefield_value(bucket)
+            cursor.executemany(
+                upsert_sql(SearchTermRollup, ['period', 'bucket', 'term'], ['searches', 'error']),
+                [(period, stored, term, searches, error) for term, searches, error in top],
+            )
+            cursor.execute(
+                upsert_sql(SearchVolume, ['period', 'bucket'], ['searches']), [period, stored, sketch.total]
+            )
+            trim(period, bucket)
+        prune()
+        response_cache.invalidate(GENERATION_GROUP)
+
+
+def trim(period, bucket):
+    """Keep the ``CAPACITY`` most searched terms of a bucket"""
+    rows = SearchTermRollup.objects.filter(period=period, bucket=bucket)
+    kept = rows.order_by('-searches', 'term').values('pk')[:CAPACITY]
+    rows.exclude(pk__in=Subquery(kept)).delete()
+
+
+def prune():
+    now = timezone.now()
+    for period, days in RETENTION.items():
+        cutoff = now - timedelta(days=days)
+        SearchTermRollup.objects.filter(period=period, bucket__lt=cutoff).delete()
+        SearchVolume.objects.filter(period=period, bucket__lt=cutoff).delete()
+
+
+def window_start(window, now=None):
+    period, buckets = WINDOWS[window]
+    now = now or timezone.now()
+    if period == SearchTermRollup.HOUR:
+        return hour_of(now) - timedelta(hours=buckets - 1)
+    return day_of(now) - timedelta(days=buckets - 1)
+
+
+def popular(window='day', limit=10):
+    """``{'terms': [{term, searches, error}], 'total': searches}`` for a window, at most ``TOP_K`` terms"""
+    start = window_start(window)
+    generation = response_cache.current_generation(GENERATION_GROUP)
+    key = f'{GENERATION_GROUP}:{window}:{start.isoformat()}:{generation}'
+    result = cache.get(key)
+    if result is None:
+        result = load_popular(window, start)
+        cache.set(key, result, FLUSH_INTERVAL)
+    return {'terms': result['terms'][:max(0, min(limit, TOP_K))], 'total': result['total']}
+
+
+def load_popular(window, start):
+    period, _ = WINDOWS[window]
+    rows = SearchTermRollup.objects.filter(period=period, bucket__gte=start).values('term').annotate(
+        total=Sum('searches'), overcount=Sum('error')
+    ).order_by('-total', 'term')[:TOP_K]
+    volume = SearchVolume.objects.filter(period=period, bucket__gte=start).aggregate(total=Sum('searches'))
+    return {
+        'terms': [{'term': row['term'], 'searches': row['total'], 'error': row['overcount']} for row in rows],
+        'total': volume['total'] or 0,
+    }
+
+
+@atexit.register
+def flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        logger.warning('Could not flush search analytics on exit', exc_info=True)
@@ -1,38 +1,79 @@
 from rest_framework import serializers
-from .models import Category, Brand, Product, ProductImage, ProductSpecification, Review
+from shopfluence.fast_serializers import CompiledListSerializer
+from shopfluence.sparse_fields import SparseFieldsMixin
+from . import renditions
+from .models import Category, Brand, Product, ProductImage, ProductSpecification, Review, ProductCard, RelatedProduct
 
 
-class CategorySerializer(serializers.ModelSerializer):
+def primary_image(product):
+    """The primary image, else the first one; reads prefetched images without a query"""
+    images = list(product.images.all())
+    return next((image for image in images if image.is_primary), images[0] if images else None)
+
+
+def absolute_url(context):
+    """
+    Function making media URLs absolute. The request origin is resolved once per
+    response and kept in the serializer context, instead of one
+    ``build_absolute_uri`` per image.
+    """
+    builder = context.get('_absolute_url')
+    if builder is None:
+        request = context.get('request')
+        origin = request.build_absolute_uri('/')[:-1] if request else None
+
+        def builder(url):
+            if origin is None or '://' in url:
+                return url
+            return origin + url if url.startswith('/') else request.build_absolute_uri(url)
+
+        context['_absolute_url'] = builder
+    return builder
+
+
+def thumbnail_urls(rendition_key, context):
+    """``{format: url}`` of the list thumbnail, None until the image is rendered"""
+    urls = renditions.rendition_urls(rendition_key, absolute_url(context), sizes=['thumbnail'])
+    return urls['thumbnail'] if urls else None
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Category model"""
-    product_count = serializers.SerializerMethodField()
+    product_count = serializers.IntegerField(source='active_product_count', read_only=True)
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'image', 'icon', 'is_active', 'product_count']
-    
-    def get_product_count(self, obj):
-        return obj.products.filter(is_active=True).count()
 
 
-class BrandSerializer(serializers.ModelSerializer):
+class CategoryTreeSerializer(CategorySerializer):
+    """Category with its active subcategories nested under ``children``"""
+    children = serializers.SerializerMethodField()
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['parent', 'children']
+
+    def get_children(self, obj):
+        return CategoryTreeSerializer(obj.subcategories, many=True, context=self.context).data
+
+
+class BrandSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Brand model"""
-    product_count = serializers.SerializerMethodField()
+    product_count = serializers.IntegerField(source='active_product_count', read_only=True)
     
     class Meta:
         model = Brand
         fields = ['id', 'name', 'slug', 'description', 'logo', 'website', 'is_active', 'product_count']
-    
-    def get_product_count(self, obj):
-        return obj.products.filter(is_active=True).count()
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for ProductImage model"""
     image = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_primary', 'order']
+        fields = ['id', 'image', 'alt_text', 'is_primary', 'order', 'renditions']
 
     def get_image(self, obj):
         # If image is a remote URL, return as is
@@ -40,15 +81,16 @@ class ProductImageSerializer(serializers.ModelSerializer):
         if image_url.startswith('http://') or image_url.startswith('https://'):
             return image_url
         # Otherwise, build absolute URI for local files
-        request = self.context.get('request')
-        if obj.image and request:
-            return request.build_absolute_uri(obj.image.url)
-        elif obj.image:
-            return obj.image.url
+        if obj.image:
+            return absolute_url(self.context)(obj.image.url)
         return None
 
+    def get_renditions(self, obj):
+        """``{size: {format: url}}`` once rendered, else None (use ``image``)"""
+        return renditions.rendition_urls(obj.rendition_key, absolute_url(self.context))
+
 
-class ProductSpecificationSerializer(serializers.ModelSerializer):
+class ProductSpecificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for ProductSpecification model"""
     
     class Meta:
@@ -80,7 +122,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         return False
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Product model"""
     images = ProductImageSerializer(many=True, read_only=True)
     image = serializers.SerializerMethodField()
@@ -95,23 +137,20 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
 
     def get_image(self, obj):
-        request = self.context.get('request')
-        if obj.images.exists():
-            primary = obj.images.filter(is_primary=True).first() or obj.images.first()
-            if primary and primary.image and request:
-                return request.build_absolute_uri(primary.image.url)
-            elif primary and primary.image:
-                return primary.image.url
+        primary = primary_image(obj)
+        if primary and primary.image:
+            return absolute_url(self.context)(primary.image.url)
         return None
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Simplified serializer for product listing"""
     category = CategorySerializer(read_only=True)
     brand = BrandSerializer(read_only=True)
     price = serializers.SerializerMethodField()
     original_price = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
     discount_percentage = serializers.IntegerField(read_only=True)
     average_rating = serializers.FloatField(read_only=True)
     review_count = serializers.IntegerField(read_only=True)
@@ -121,9 +160,10 @@ class ProductListSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'name', 'slug', 'short_description', 'price', 'original_price',
-            'discount_percentage', 'category', 'brand', 'image', 'is_featured', 'is_new_arrival',
+            'discount_percentage', 'category', 'brand', 'image', 'thumbnail', 'is_featured', 'is_new_arrival',
             'is_bestseller', 'average_rating', 'review_count', 'is_in_stock'
         ]
+        list_serializer_class = CompiledListSerializer
     
     def get_price(self, obj):
         """Ensure price is returned as a number"""
@@ -135,22 +175,64 @@ class ProductListSerializer(serializers.ModelSerializer):
     
     def get_image(self, obj):
         """Get primary image URL"""
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return primary_image.image.name if hasattr(primary_image.image, 'name') else str(primary_image.image)
-        # Fallback to first image if no primary
-        first_image = obj.images.first()
-        if first_image:
-            return first_image.image.name if hasattr(first_image.image, 'name') else str(first_image.image)
+        image = primary_image(obj)
+        if image:
+            return image.image.name if hasattr(image.image, 'name') else str(image.image)
         return None
+
+    def get_thumbnail(self, obj):
+        image = primary_image(obj)
+        return thumbnail_urls(image.rendition_key, self.context) if image else None
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return ProductImageSerializer(primary_image).data
-        # Fallback to first image if no primary
-        first_image = obj.images.first()
-        return ProductImageSerializer(first_image).data if first_image else None
+        image = primary_image(obj)
+        return ProductImageSerializer(image).data if image else None
+
+
+class ProductCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Product listing serializer backed by the denormalized ProductCard table"""
+    id = serializers.IntegerField(source='product_id', read_only=True)
+    category = serializers.SerializerMethodField()
+    brand = serializers.SerializerMethodField()
+    price = serializers.SerializerMethodField()
+    original_price = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductCard
+        fields = [
+            'id', 'name', 'slug', 'short_description', 'price', 'original_price',
+            'discount_percentage', 'category', 'brand', 'image', 'thumbnail', 'is_featured', 'is_new_arrival',
+            'is_bestseller', 'average_rating', 'review_count', 'is_in_stock'
+        ]
+        read_only_fields = fields
+        list_serializer_class = CompiledListSerializer
+
+    def get_category(self, obj):
+        return self.nested('category', {'id': obj.category_id, 'name': obj.category_name, 'slug': obj.category_slug})
+
+    def get_brand(self, obj):
+        return self.nested('brand', {'id': obj.brand_id, 'name': obj.brand_name, 'slug': obj.brand_slug})
+
+    def get_price(self, obj):
+        """Ensure price is returned as a number"""
+        return float(obj.price) if obj.price else 0.0
+
+    def get_original_price(self, obj):
+        """Ensure original_price is returned as a number"""
+        return float(obj.original_price) if obj.original_price else 0.0
+
+    def get_image(self, obj):
+        return obj.image or None
+
+    def get_thumbnail(self, obj):
+        return thumbnail_urls(obj.image_rendition_key, self.context)
+
+    def nested(self, name, values):
+        """Trim a flattened category/brand like ?fields=/?omit= trim a nested serializer"""
+        spec = self.sparse_child(name)
+        return {key: value for key, value in values.items() if spec.has(key)} if spec else values
 
 
 class ProductDetailSerializer(ProductSerializer):
@@ -161,11 +243,10 @@ class ProductDetailSerializer(ProductSerializer):
         fields = ProductSerializer.Meta.fields + ['related_products']
     
     def get_related_products(self, obj):
-        related = Product.objects.filter(
-            category=obj.category,
-            is_active=True
-        ).exclude(id=obj.id)[:4]
-        return ProductListSerializer(related, many=True).data
+        cards = RelatedProduct.cards_for(obj.pk, obj.category_id)
+        return ProductCardSerializer(
+            cards, many=True, context=self.context, sparse_fields=self.sparse_child('related_products')
+        ).data
 
 
 class ReviewCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,233 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from . import renditions, response_cache, search, snapshot, suggest
+from .models import (
+    Category, Brand, Product, ProductImage, ProductSpecification, Review, RatingSummary, ProductCard,
+    CatalogStats, adjust_active_product_count,
+)
+
+
+# Product fields the suggestion index is built from
+SUGGEST_FIELDS = ('name', 'slug', 'is_featured', 'is_bestseller')
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, raw=False, **kwargs):
+    """Snapshot the stored categorization so post_save can move the active counters"""
+    instance._previous_counter_state = None
+    if instance.pk and not raw:
+        instance._previous_counter_state = Product.objects.filter(pk=instance.pk).values(
+            'category_id', 'brand_id', 'is_active', *SUGGEST_FIELDS
+        ).first()
+
+
+@receiver(post_save, sender=Product)
+def sync_product_read_models(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # Every product starts with an empty rating summary
+        RatingSummary.objects.get_or_create(product=instance)
+    previous = getattr(instance, '_previous_counter_state', None)
+    update_active_product_counts(previous, instance)
+    if previous and previous['category_id'] != instance.category_id:
+        CatalogStats.move_product_reviews(instance.pk, previous['category_id'], instance.category_id)
+    ProductCard.refresh(product_ids=[instance.pk])
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def release_product_read_models(sender, instance, **kwargs):
+    if instance.is_active:
+        adjust_active_product_count(Category, instance.category_id, -1)
+        adjust_active_product_count(Brand, instance.brand_id, -1)
+        CatalogStats.adjust(total_products=-1)
+    search.remove_products([instance.pk])
+
+
+def update_active_product_counts(previous, product):
+    was_active = bool(previous and previous['is_active'])
+    CatalogStats.adjust(total_products=int(product.is_active) - int(was_active))
+    for model, field in ((Category, 'category_id'), (Brand, 'brand_id')):
+        old_pk = previous[field] if previous and previous['is_active'] else None
+        new_pk = getattr(product, field) if product.is_active else None
+        if old_pk == new_pk:
+            continue
+        if old_pk is not None:
+            adjust_active_product_count(model, old_pk, -1)
+        if new_pk is not None:
+            adjust_active_product_count(model, new_pk, 1)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def sync_product_card_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ProductCard.refresh_image(instance.product_id)
+
+
+@receiver(pre_save, sender=ProductImage)
+def forget_stale_renditions(sender, instance, raw=False, **kwargs):
+    """A replaced file invalidates the renditions of the old one"""
+    if instance.pk and not raw and instance.rendition_key:
+        stored = ProductImage.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+        if stored is not None and stored != instance.image.name:
+            instance.rendition_key = ''
+
+
+@receiver(post_save, sender=ProductImage)
+def render_uploaded_image(sender, instance, raw=False, **kwargs):
+    """Locally stored uploads get their renditions in the background once committed"""
+    if not raw and not instance.rendition_key and renditions.source_path(instance):
+        renditions.schedule([instance.pk])
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def sync_search_index_specifications(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_products([instance.product_id])
+
+
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=ProductSpecification)
+def touch_product_on_child_delete(sender, instance, **kwargs):
+    """A deleted child leaves no updated_at behind, so move the product's instead"""
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+def sync_product_card_category(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        ProductCard.refresh_category(instance)
+        search.index_products_where('category_id', instance.pk)
+
+
+@receiver(post_save, sender=Brand)
+def sync_product_card_brand(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        ProductCard.refresh_brand(instance)
+        search.index_products_where('brand_id', instance.pk)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, raw=False, **kwargs):
+    """Snapshot the stored review so post_save can undo its old contribution"""
+    instance._previous_rating_state = None
+    if instance.pk and not raw:
+        instance._previous_rating_state = Review.objects.filter(pk=instance.pk).values(
+            'product_id', 'rating', 'is_approved'
+        ).first()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_summary_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating_state', None)
+    current = {'product_id': instance.product_id, 'rating': instance.rating, 'is_approved': instance.is_approved}
+    if previous == current:
+        return
+    if previous and previous['is_approved']:
+        RatingSummary.apply_review(previous['product_id'], previous['rating'], -1)
+        CatalogStats.apply_review(previous['product_id'], previous['rating'], -1)
+    if instance.is_approved:
+        RatingSummary.apply_review(instance.product_id, instance.rating, 1)
+        CatalogStats.apply_review(instance.product_id, instance.rating, 1)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    # Never recreate here: the product itself may be part of the same cascade delete
+    if instance.is_approved:
+        RatingSummary.apply_review(instance.product_id, instance.rating, -1, create_missing=False)
+        CatalogStats.apply_review(instance.product_id, instance.rating, -1)
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Brand)
+def remember_active_state(sender, instance, raw=False, **kwargs):
+    """Remember whether the stored row was active so post_save can move the catalog totals"""
+    instance._was_active = None
+    if instance.pk and not raw:
+        instance._was_active = sender.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+
+
+# CatalogStats field counting the active rows of each model
+CATALOG_TOTALS = {Category: 'total_categories', Brand: 'total_brands'}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def update_catalog_totals_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        was_active = bool(getattr(instance, '_was_active', None))
+        CatalogStats.adjust(**{CATALOG_TOTALS[sender]: int(instance.is_active) - int(was_active)})
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Brand)
+def update_catalog_totals_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        CatalogStats.adjust(**{CATALOG_TOTALS[sender]: -1})
+
+
+# Response cache groups that a write to each model can make stale
+RESPONSE_CACHE_GROUPS = {
+    Product: ('products', 'categories', 'brands'),
+    ProductImage: ('products',),
+    Category: ('products', 'categories'),
+    Brand: ('products', 'brands'),
+    Review: ('products',),
+}
+
+
+def invalidate_response_cache(sender, raw=False, **kwargs):
+    if not raw:
+        response_cache.invalidate(*RESPONSE_CACHE_GROUPS[sender])
+
+
+for model in RESPONSE_CACHE_GROUPS:
+    post_save.connect(invalidate_response_cache, sender=model, dispatch_uid=f'invalidate_response_cache_{model.__name__}')
+    post_delete.connect(invalidate_response_cache, sender=model, dispatch_uid=f'invalidate_response_cache_{model.__name__}')
+
+
+def update_catalog_snapshot(product_id):
+    transaction.on_commit(lambda: snapshot.update_products([product_id]))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def sync_catalog_snapshot_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_catalog_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def sync_catalog_snapshot_rating(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_catalog_snapshot(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+def sync_suggest_index_product(sender, instance, created, raw=False, **kwargs):
+    """Stock and price updates leave suggestions alone; only name, flag and status changes rebuild"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_counter_state', None)
+    fields = ('is_active', *SUGGEST_FIELDS)
+    if created or previous is None or any(previous[field] != getattr(instance, field) for field in fields):
+        suggest.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def sync_suggest_index(sender, raw=False, **kwargs):
+    if not raw:
+        suggest.invalidate()
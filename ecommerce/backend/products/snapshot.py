@@ -0,0 +1,327 @@
+"""
+Memory-mapped columnar snapshot of the catalog.
+
+The snapshot holds one ``.npy`` file per column (id, price in cents, rating,
+review count, stock, category id, brand id, flag bits, created_at), sorted by
+product id, in a generation directory under ``CATALOG_SNAPSHOT_DIR``. The
+``CURRENT`` file names the live generation; every worker process memory-maps it
+read-only and remaps when ``CURRENT`` changes.
+
+Product writes patch their rows in place (the maps are shared, so other
+processes see the change immediately). Only new products force a new generation,
+and that generation is built from the old arrays, not from the database.
+``manage.py build_catalog_snapshot`` rebuilds from scratch and drops rows of
+deleted products.
+
+The list views filter, sort and page over the arrays (see SnapshotResults) and
+then load only the ProductCard rows of the requested page.
+"""
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+COLUMNS = {
+    'id': np.int64,
+    'price_cents': np.int64,
+    'average_rating': np.float64,
+    'review_count': np.int32,
+    'stock_quantity': np.int32,
+    'category_id': np.int32,
+    'brand_id': np.int32,
+    'flags': np.uint8,
+    'created_at': np.int64,  # microseconds since the epoch
+}
+
+ACTIVE = 1
+IN_STOCK = 2
+FEATURED = 4
+NEW_ARRIVAL = 8
+BESTSELLER = 16
+
+FLAG_FIELDS = (
+    ('is_active', ACTIVE),
+    ('is_in_stock', IN_STOCK),
+    ('is_featured', FEATURED),
+    ('is_new_arrival', NEW_ARRIVAL),
+    ('is_bestseller', BESTSELLER),
+)
+
+CARD_FIELDS = (
+    'product_id', 'price', 'average_rating', 'review_count', 'stock_quantity',
+    'category_id', 'brand_id', 'created_at',
+) + tuple(field for field, _ in FLAG_FIELDS)
+
+# Sort orders understood by Snapshot.ordered_ids(): name -> [(column, descending), ...]
+ORDERINGS = {
+    'newest': [('created_at', True)],
+    'oldest': [('created_at', False)],
+    'price-low': [('price_cents', False)],
+    'price-high': [('price_cents', True)],
+    'rating': [('average_rating', True), ('review_count', True)],
+    'rating-high': [('average_rating', True)],
+    'rating-low': [('average_rating', False)],
+    'featured': [('featured_rank', True), ('created_at', True)],
+}
+
+
+def snapshot_dir():
+    return str(getattr(settings, 'CATALOG_SNAPSHOT_DIR', os.path.join(settings.BASE_DIR, 'var', 'catalog_snapshot')))
+
+
+def current_path(directory=None):
+    return os.path.join(directory or snapshot_dir(), 'CURRENT')
+
+
+def to_microseconds(value):
+    return int(value.timestamp() * 1_000_000) if value else 0
+
+
+def to_cents(value):
+    """Whole cents, rounded half-even like the ORM rounds values for a 2-place DecimalField"""
+    return int((Decimal(value) * 100).quantize(Decimal(1)))
+
+
+def rows_to_columns(rows):
+    """Column arrays for ``ProductCard.values_list(*CARD_FIELDS)`` rows"""
+    columns = {name: np.empty(len(rows), dtype=dtype) for name, dtype in COLUMNS.items()}
+    if not rows:
+        return columns
+    (ids, prices, ratings, review_counts, stock, category_ids, brand_ids, created, *flags) = zip(*rows)
+    columns['id'][:] = ids
+    columns['price_cents'][:] = [to_cents(price) for price in prices]
+    columns['average_rating'][:] = ratings
+    columns['review_count'][:] = review_counts
+    columns['stock_quantity'][:] = stock
+    columns['category_id'][:] = category_ids
+    columns['brand_id'][:] = brand_ids
+    columns['created_at'][:] = [to_microseconds(value) for value in created]
+    columns['flags'][:] = 0
+    for values, (_, bit) in zip(flags, FLAG_FIELDS):
+        columns['flags'][np.array(values, dtype=bool)] |= bit
+    return columns
+
+
+def load_columns(product_ids=None, using=None, chunk_size=50000):
+    """Read ProductCard rows (all, or just ``product_ids``) into column arrays sorted by id"""
+    from .models import ProductCard
+
+    cards = ProductCard.objects.using(using) if using else ProductCard.objects
+    if product_ids is not None:
+        cards = cards.filter(product_id__in=product_ids)
+    chunks, rows = [], []
+    for row in cards.order_by('product_id').values_list(*CARD_FIELDS).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            chunks.append(rows_to_columns(rows))
+            rows = []
+    chunks.append(rows_to_columns(rows))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMNS}
+
+
+class Snapshot:
+    """One mapped generation: a dict of read-only column arrays"""
+
+    def __init__(self, directory, generation, mode='r'):
+        self.generation = generation
+        path = os.path.join(directory, generation)
+        self.columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode) for name in COLUMNS}
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, name):
+        if name == 'featured_rank':
+            flags = self.columns['flags']
+            return ((flags & FEATURED) > 0).astype(np.int8) * 2 + ((flags & BESTSELLER) > 0)
+        return self.columns[name]
+
+    def filter(self, category_ids=None, brand_ids=None, min_price=None, max_price=None, min_rating=None,
+               require_flags=0, exclude_flags=0):
+        """
+        Positions of the active products matching every filter. Prices are in the
+        catalog currency; ``require_flags``/``exclude_flags`` are bit masks.
+        """
+        required = ACTIVE | require_flags
+        mask = (self.columns['flags'] & (required | exclude_flags)) == required
+        if category_ids is not None:
+            mask &= np.isin(self.columns['category_id'], category_ids)
+        if brand_ids is not None:
+            mask &= np.isin(self.columns['brand_id'], brand_ids)
+        if min_price is not None:
+            mask &= self.columns['price_cents'] >= to_cents(min_price)
+        if max_price is not None:
+            mask &= self.columns['price_cents'] <= to_cents(max_price)
+        if min_rating is not None:
+            mask &= self.columns['average_rating'] >= float(min_rating)
+        return np.flatnonzero(mask)
+
+    def ordered_ids(self, positions, ordering, end):
+        """Ids of the first ``end`` rows of ``positions`` in ``ordering``"""
+        # Ties fall back to the id in the direction of the last key, like the keyset pagination
+        keys = ORDERINGS[ordering]
+        ids = self.columns['id'][positions]
+        sort_keys = [-ids if keys[-1][1] else ids]
+        for name, descending in reversed(keys):
+            values = self[name][positions]
+            sort_keys.append(-values if descending else values)
+
+        if len(keys) == 1 and end < len(positions):
+            # Only the first ``end`` rows are needed: partition before sorting
+            primary = sort_keys[-1]
+            cutoff = primary[np.argpartition(primary, end - 1)[:end]].max()
+            candidates = np.flatnonzero(primary <= cutoff)
+            order = candidates[np.lexsort([key[candidates] for key in sort_keys])]
+        else:
+            order = np.lexsort(sort_keys)
+        return ids[order[:end]]
+
+
+class SnapshotResults:
+    """
+    Sequence over the matches of a snapshot filter, usable as a paginator's object
+    list: ``count()`` is free, and slicing sorts just far enough and then loads
+    the page with ``hydrate(ids)``.
+    """
+
+    def __init__(self, snapshot, positions, ordering, hydrate):
+        self.snapshot = snapshot
+        self.positions = positions
+        self.ordering = ordering
+        self.hydrate = hydrate
+
+    def count(self):
+        return len(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self.positions))
+        if start >= stop:
+            return []
+        ids = self.snapshot.ordered_ids(self.positions, self.ordering, stop)[start:stop].tolist()
+        return self.hydrate(ids)
+
+
+_state = threading.local()
+
+
+def get_snapshot():
+    """The live snapshot for this thread, remapped when a new generation is published; None if absent"""
+    directory = snapshot_dir()
+    try:
+        stat = os.stat(current_path(directory))
+    except FileNotFoundError:
+        return None
+    stamp = (directory, stat.st_ino, stat.st_mtime_ns)
+    cached = getattr(_state, 'snapshot', None)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(current_path(directory)) as handle:
+        generation = handle.read().strip()
+    try:
+        snapshot = Snapshot(directory, generation)
+    except FileNotFoundError:
+        # A writer swapped generations between our stat() and open(); retry next request
+        return None
+    _state.snapshot = (stamp, snapshot)
+    return snapshot
+
+
+@contextmanager
+def writer_lock(directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'lock'), 'w') as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def publish(directory, columns):
+    """Write a new generation and make it current; older generations are removed"""
+    generation = f'{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}'
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+    for name, dtype in COLUMNS.items():
+        np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(columns[name], dtype=dtype))
+
+    pointer = current_path(directory) + '.tmp'
+    with open(pointer, 'w') as handle:
+        handle.write(generation)
+    os.replace(pointer, current_path(directory))
+
+    # Processes still mapping an old generation keep their (unlinked) files until they remap
+    for entry in os.listdir(directory):
+        if entry != generation and os.path.isdir(os.path.join(directory, entry)):
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    return generation
+
+
+def rebuild(directory=None, using=None):
+    """Build a fresh generation from ProductCard; returns the number of rows"""
+    directory = directory or snapshot_dir()
+    columns = load_columns(using=using)
+    with writer_lock(directory):
+        publish(directory, columns)
+    return len(columns['id'])
+
+
+def locate(ids, wanted):
+    """Positions of ``wanted`` in the sorted ``ids`` and a mask of those actually present"""
+    positions = np.searchsorted(ids, wanted)
+    if not len(ids):
+        return positions, np.zeros(len(wanted), dtype=bool)
+    return positions, (positions < len(ids)) & (ids[np.minimum(positions, len(ids) - 1)] == wanted)
+
+
+def update_products(product_ids, directory=None):
+    """
+    Bring the rows of ``product_ids`` up to date. Known products are patched in
+    place; deleted ones just lose the ACTIVE bit; new ones trigger a new generation.
+    Does nothing until a snapshot has been built.
+    """
+    directory = directory or snapshot_dir()
+    if not product_ids or not os.path.exists(current_path(directory)):
+        return
+    fresh = load_columns(product_ids)
+    with writer_lock(directory):
+        with open(current_path(directory)) as handle:
+            generation = handle.read().strip()
+        snapshot = Snapshot(directory, generation, mode='r+')
+        ids = snapshot.columns['id']
+
+        positions, known = locate(ids, fresh['id'])
+        for name in COLUMNS:
+            snapshot.columns[name][positions[known]] = fresh[name][known]
+
+        deleted = np.setdiff1d(np.asarray(product_ids, dtype=np.int64), fresh['id'])
+        deleted_positions, found = locate(ids, deleted)
+        snapshot.columns['flags'][deleted_positions[found]] &= np.uint8(~ACTIVE & 0xFF)
+
+        for column in snapshot.columns.values():
+            column.flush()
+
+        if not known.all():
+            added = ~known
+            merged = {name: np.concatenate([snapshot.columns[name], fresh[name][added]]) for name in COLUMNS}
+            order = np.argsort(merged['id'], kind='stable')
+            publish(directory, {name: values[order] for name, values in merged.items()})
+
@@ -0,0 +1,214 @@
+"""
+In-memory prefix index for search-box suggestions.
+
+Every active product, brand and category contributes one key per word of its
+normalized name: the name from that word on ("apple iphone 15", "iphone 15",
+"15"), so a query matches the start of any word and can span several words.
+Keys live in one sorted list and a query is two binary searches; the matches of
+a prefix form a contiguous range, and the most popular entries of the range are
+picked with ``argpartition`` over a parallel weight array. Prefixes matching
+more than ``MAX_SCAN`` keys get their best entries precomputed at build time, so
+a lookup never touches more than ``MAX_SCAN`` weights.
+
+Each worker builds its index on startup (see wsgi.py) and rebuilds it in a
+background thread when the catalog signals bump the ``suggest`` generation;
+requests keep using the previous index meanwhile. ``SUGGEST_MAX_ENTRIES`` caps
+the number of indexed entries, most popular first.
+"""
+import threading
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import response_cache
+
+GENERATION_GROUP = 'suggest'
+
+MAX_ENTRIES = getattr(settings, 'SUGGEST_MAX_ENTRIES', 200000)
+
+# Keys per entry: a name is matchable from each of its first MAX_WORDS words
+MAX_WORDS = 6
+
+MAX_LIMIT = 20
+
+# Prefixes matching more keys than this are answered from precomputed lists
+MAX_SCAN = 2048
+
+# Candidates kept per precomputed prefix; an entry can match one prefix through
+# several of its words, so keep more than MAX_LIMIT to survive deduplication
+STORED_CANDIDATES = MAX_LIMIT * 3
+
+# Popularity boosts on top of a product's review count
+BESTSELLER_BOOST = 20
+FEATURED_BOOST = 10
+
+KEY_END = chr(0x10FFFF)
+
+
+def normalize(text):
+    """Lower-case, accent-free words separated by single spaces"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    characters = [
+        character if character.isalnum() else ' '
+        for character in decomposed.casefold() if not unicodedata.combining(character)
+    ]
+    return ' '.join(''.join(characters).split())
+
+
+class SuggestIndex:
+    """Immutable prefix index over ``(type, id, label, slug, weight)`` entries"""
+
+    def __init__(self, entries, generation=0):
+        self.generation = generation
+        self.entries = entries
+        keys, owners = [], []
+        for position, entry in enumerate(entries):
+            words = normalize(entry[2]).split(' ')
+            for start in range(min(len(words), MAX_WORDS)):
+                if words[start]:
+                    keys.append(' '.join(words[start:]))
+                    owners.append(position)
+
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[position] for position in order]
+        self.owners = np.array(owners, dtype=np.int32)[order] if keys else np.empty(0, dtype=np.int32)
+        self.weights = np.array([entry[4] for entry in entries], dtype=np.float64)[self.owners]
+        self.top = {}
+        self.precompute()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def best(self, start, stop, count):
+        """Owners of the ``count`` heaviest keys in ``keys[start:stop]``, heaviest first"""
+        weights = self.weights[start:stop]
+        if count < len(weights):
+            picked = np.argpartition(-weights, count - 1)[:count]
+        else:
+            picked = np.arange(len(weights))
+        picked = picked[np.argsort(-weights[picked], kind='stable')]
+        return self.owners[start + picked].tolist()
+
+    def precompute(self):
+        """Store candidates for every prefix whose key range is larger than MAX_SCAN"""
+        pending = [('', 0, len(self.keys))]
+        while pending:
+            prefix, start, stop = pending.pop()
+            if stop - start <= MAX_SCAN:
+                continue
+            if prefix:
+                self.top[prefix] = self.best(start, stop, STORED_CANDIDATES)
+            depth = len(prefix)
+            position = start
+            # Keys equal to the prefix sort first and have no next character
+            while position < stop and len(self.keys[position]) == depth:
+                position += 1
+            while position < stop:
+                child = prefix + self.keys[position][depth]
+                end = bisect_left(self.keys, child + KEY_END, position, stop)
+                pending.append((child, position, end))
+                position = end
+
+    def search(self, query, limit=8):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        stop = bisect_left(self.keys, prefix + KEY_END, start)
+        if stop - start > MAX_SCAN:
+            candidates = self.top[prefix]
+        else:
+            candidates = self.best(start, stop, min(stop - start, STORED_CANDIDATES))
+
+        seen, results = set(), []
+        for owner in candidates:
+            if owner in seen:
+                continue
+            seen.add(owner)
+            kind, pk, label, slug, _ = self.entries[owner]
+            results.append({'type': kind, 'id': pk, 'label': label, 'slug': slug})
+            if len(results) == limit:
+                break
+        return results
+
+
+def load_entries():
+    """The most popular MAX_ENTRIES active products, brands and categories"""
+    from .models import Brand, Category, ProductCard
+
+    entries = []
+    for kind, model in (('category', Category), ('brand', Brand)):
+        rows = model.objects.filter(is_active=True).values_list('pk', 'name', 'slug', 'active_product_count')
+        entries.extend((kind, pk, name, slug, count) for pk, name, slug, count in rows)
+
+    popularity = F('review_count') + Case(
+        When(is_bestseller=True, then=Value(BESTSELLER_BOOST)), default=Value(0), output_field=IntegerField()
+    ) + Case(
+        When(is_featured=True, then=Value(FEATURED_BOOST)), default=Value(0), output_field=IntegerField()
+    )
+    products = ProductCard.objects.filter(is_active=True).annotate(popularity=popularity).order_by(
+        '-popularity', 'product_id'
+    ).values_list('product_id', 'name', 'slug', 'popularity')[:max(0, MAX_ENTRIES - len(entries))]
+    entries.extend(('product', pk, name, slug, weight) for pk, name, slug, weight in products.iterator(chunk_size=5000))
+    return entries[:MAX_ENTRIES]
+
+
+def current_generation():
+    return response_cache.current_generation(GENERATION_GROUP)
+
+
+def invalidate():
+    """Make every worker rebuild its index once the current transaction commits"""
+    response_cache.invalidate(GENERATION_GROUP)
+
+
+_index = None
+_lock = threading.Lock()
+_rebuilding = threading.Event()
+
+
+def build():
+    global _index
+    generation = current_generation()
+    _index = SuggestIndex(load_entries(), generation)
+    return _index
+
+
+def rebuild_in_background():
+    def run():
+        try:
+            build()
+        finally:
+            connection.close()
+            _rebuilding.clear()
+
+    with _lock:
+        if _rebuilding.is_set():
+            return
+        _rebuilding.set()
+    threading.Thread(target=run, name='suggest-index', daemon=True).start()
+
+
+def warm():
+    """Start building the index without blocking worker startup"""
+    if _index is None:
+        rebuild_in_background()
+
+
+def get_index():
+    """This worker's index; built on the spot the first time, refreshed in the background after writes"""
+    index = _index
+    if index is None:
+        with _lock:
+            index = _index if _index is not None else build()
+    elif index.generation != current_generation():
+        rebuild_in_background()
+    return index
+
+
+def suggest(query, limit=8):
+    return get_index().search(query, max(1, min(limit, MAX_LIMIT)))
@@ -0,0 +1,1541 @@
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from threading import current_thread
+from unittest import mock
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.models import User
+from orders.models import Order
+from shopfluence import fast_serializers, imaging, query_advisor, renderers
+from . import (
+    conditional, export, facets, importer, renditions, response_cache, search, search_analytics, snapshot, suggest,
+    views,
+)
+from .models import (
+    Brand, CatalogStats, Category, Product, ProductCard, ProductImage, ProductSpecification, RatingSummary,
+    RelatedProduct, Review, SearchTermRollup, SearchVolume, recount_active_products,
+)
+from .serializers import ProductCardSerializer, ProductListSerializer
+
+
+def compiled_and_plain(serializer_class, instances, **params):
+    """Rendered output of a many=True serializer through the compiled path and through DRF's own"""
+    request = Request(APIRequestFactory().get('/', params))
+    compiled = serializer_class(instances, many=True, context={'request': request}).data
+    with override_settings(COMPILED_SERIALIZERS=False):
+        plain = serializer_class(instances, many=True, context={'request': request}).data
+    return JSONRenderer().render(compiled), JSONRenderer().render(plain)
+
+
+def table_rows(queryset, exclude=('updated_at',)):
+    """Every row of a read model as tuples, ignoring the columns a rebuild rewrites anyway"""
+    fields = [field.attname for field in queryset.model._meta.concrete_fields if field.name not in exclude]
+    return list(queryset.order_by('pk').values_list(*fields))
+
+
+class ScratchTestCase(TestCase):
+    """Snapshots, renditions and the shared cache go to a throwaway directory, never the project's own"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.temp_dir, ignore_errors=True)
+        shared = {**settings.CACHES[response_cache.GENERATION_CACHE], 'LOCATION': f'{cls.temp_dir}/cache'}
+        cls.enterClassContext(override_settings(
+            CATALOG_SNAPSHOT_DIR=f'{cls.temp_dir}/snapshot', MEDIA_ROOT=f'{cls.temp_dir}/media',
+            CACHES={**settings.CACHES, response_cache.GENERATION_CACHE: shared},
+        ))
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        response_cache.generation_cache().clear()
+
+
+class CatalogTestCase(ScratchTestCase):
+    """A small catalog: nested categories, two brands, an inactive product and a few reviews"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'shopper{index}', email=f'shopper{index}@example.com', password='secret',
+                first_name='Shopper', last_name=str(index),
+            )
+            for index in range(3)
+        ]
+        cls.electronics = Category.objects.create(name='Electronics')
+        cls.phones = Category.objects.create(name='Phones', parent=cls.electronics)
+        cls.garden = Category.objects.create(name='Garden')
+        cls.acme = Brand.objects.create(name='Acme')
+        cls.globex = Brand.objects.create(name='Globex')
+
+        cls.phone = cls.create_product(
+            'Acme Smartphone X', cls.phones, cls.acme, '499.00', original_price='599.00', is_featured=True,
+        )
+        cls.laptop = cls.create_product('Acme Laptop Pro', cls.electronics, cls.acme, '1299.00', is_bestseller=True)
+        cls.hose = cls.create_product('Globex Garden Hose', cls.garden, cls.globex, '24.50', stock_quantity=0)
+        cls.retired = cls.create_product('Globex Old Phone', cls.phones, cls.globex, '99.00', is_active=False)
+
+        cls.review(cls.phone, cls.users[0], 5)
+        cls.review(cls.phone, cls.users[1], 3)
+        cls.review(cls.laptop, cls.users[0], 4)
+        cls.review(cls.hose, cls.users[2], 2, is_approved=False)
+
+    @staticmethod
+    def create_product(name, category, brand, price, stock_quantity=10, **fields):
+        return Product.objects.create(
+            name=name, description=f'{name} description', category=category, brand=brand,
+            sku=name.upper().replace(' ', '-'), price=Decimal(price), stock_quantity=stock_quantity,
+            **{key: Decimal(value) if key == 'original_price' else value for key, value in fields.items()},
+        )
+
+    @staticmethod
+    def review(product, user, rating, is_approved=True):
+        return Review.objects.create(
+            product=product, user=user, rating=rating, comment='A review long enough to keep', is_approved=is_approved,
+        )
+
+
+class RatingSummaryTests(CatalogTestCase):
+    """The review signals keep RatingSummary equal to a rebuild from the reviews table"""
+
+    def assertMatchesRebuild(self):
+        maintained = table_rows(RatingSummary.objects.all())
+        RatingSummary.objects.all().delete()
+        RatingSummary.rebuild()
+        self.assertEqual(table_rows(RatingSummary.objects.all()), maintained)
+
+    def test_fixture(self):
+        summary = RatingSummary.objects.get(product=self.phone)
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.average_rating), (2, 8, 4.0))
+        self.assertEqual(summary.histogram, {1: 0, 2: 0, 3: 1, 4: 0, 5: 1})
+        self.assertMatchesRebuild()
+
+    def test_create_review(self):
+        self.review(self.laptop, self.users[1], 1)
+        self.review(self.retired, self.users[2], 5)
+        self.assertMatchesRebuild()
+
+    def test_update_review(self):
+        review = Review.objects.get(product=self.phone, user=self.users[1])
+        review.rating = 1
+        review.save()
+        self.assertMatchesRebuild()
+
+        # Approval changes and moves to another product undo the old contribution
+        review.is_approved = False
+        review.save()
+        self.assertMatchesRebuild()
+        pending = Review.objects.get(product=self.hose)
+        pending.is_approved = True
+        pending.product = self.laptop
+        pending.save()
+        self.assertMatchesRebuild()
+
+    def test_delete_review(self):
+        Review.objects.filter(product=self.phone, user=self.users[0]).delete()
+        Review.objects.get(product=self.hose).delete()
+        self.assertMatchesRebuild()
+
+    def test_delete_product(self):
+        self.phone.delete()
+        self.assertMatchesRebuild()
+
+
+class ProductCardTests(CatalogTestCase):
+    """The catalog signals keep ProductCard equal to ProductCard.refresh() over the whole catalog"""
+
+    def assertMatchesRebuild(self):
+        maintained = table_rows(ProductCard.objects.all())
+        ProductCard.objects.all().delete()
+        ProductCard.refresh()
+        self.assertEqual(table_rows(ProductCard.objects.all()), maintained)
+
+    def test_fixture(self):
+        card = ProductCard.objects.get(product=self.phone)
+        self.assertEqual((card.category_slug, card.brand_name, card.review_count), ('phones', 'Acme', 2))
+        self.assertMatchesRebuild()
+
+    def test_create_product(self):
+        product = self.create_product('Globex Rake', self.garden, self.globex, '15.00', original_price='20.00')
+        ProductImage.objects.create(product=product, image='products/rake.jpg')
+        self.assertMatchesRebuild()
+
+    def test_update_product(self):
+        self.phone.price = Decimal('449.00')
+        self.phone.stock_quantity = 0
+        self.phone.is_featured = False
+        self.phone.category = self.electronics
+        self.phone.save()
+        self.retired.is_active = True
+        self.retired.save()
+        self.assertMatchesRebuild()
+
+    def test_rename_category_and_brand(self):
+        self.phones.name = 'Mobile Phones'
+        self.phones.slug = 'mobile-phones'
+        self.phones.save()
+        self.globex.name = 'Globex Corp'
+        self.globex.save()
+        self.assertMatchesRebuild()
+
+    def test_images(self):
+        first = ProductImage.objects.create(product=self.phone, image='products/front.jpg', order=1)
+        primary = ProductImage.objects.create(product=self.phone, image='products/back.jpg', order=2, is_primary=True)
+        self.assertEqual(ProductCard.objects.get(product=self.phone).image, 'products/back.jpg')
+        self.assertMatchesRebuild()
+        primary.delete()
+        self.assertEqual(ProductCard.objects.get(product=self.phone).image, first.image.name)
+        self.assertMatchesRebuild()
+        first.delete()
+        self.assertMatchesRebuild()
+
+    def test_reviews(self):
+        self.review(self.hose, self.users[0], 1)
+        Review.objects.filter(product=self.phone, user=self.users[0]).delete()
+        self.assertMatchesRebuild()
+
+    def test_delete_product(self):
+        pk = self.laptop.pk
+        self.laptop.delete()
+        self.assertFalse(ProductCard.objects.filter(pk=pk).exists())
+        self.assertMatchesRebuild()
+
+
+class ActiveProductCountTests(CatalogTestCase):
+    """The product signals keep active_product_count equal to a recount on Category and Brand"""
+
+    def assertMatchesRecount(self):
+        for model in (Category, Brand):
+            maintained = list(model.objects.order_by('pk').values_list('pk', 'active_product_count'))
+            model.objects.update(active_product_count=0)
+            recount_active_products(model)
+            self.assertEqual(list(model.objects.order_by('pk').values_list('pk', 'active_product_count')), maintained)
+
+    def test_fixture(self):
+        self.assertEqual(Category.objects.get(pk=self.phones.pk).active_product_count, 1)
+        self.assertEqual(Brand.objects.get(pk=self.globex.pk).active_product_count, 1)
+        self.assertMatchesRecount()
+
+    def test_create_product(self):
+        self.create_product('Acme Phone Mini', self.phones, self.acme, '299.00')
+        self.create_product('Acme Phone Max', self.phones, self.acme, '999.00', is_active=False)
+        self.assertMatchesRecount()
+
+    def test_update_product(self):
+        self.phone.category = self.garden
+        self.phone.brand = self.globex
+        self.phone.save()
+        self.laptop.is_active = False
+        self.laptop.save()
+        self.retired.is_active = True
+        self.retired.brand = self.acme
+        self.retired.save()
+        self.assertMatchesRecount()
+
+    def test_delete(self):
+        self.hose.delete()
+        self.retired.delete()
+        self.assertMatchesRecount()
+        self.acme.delete()
+        self.assertMatchesRecount()
+
+
+class CategoryTreeTests(CatalogTestCase):
+    """Materialized category paths: the tree endpoint, subtree filters and reparenting"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.smartphones = Category.objects.create(name='Smartphones', parent=cls.phones)
+        cls.archive = Category.objects.create(name='Archive', parent=cls.garden, is_active=False)
+        Category.objects.create(name='Archived Tools', parent=cls.archive)
+        cls.flagship = cls.create_product('Acme Flagship', cls.smartphones, cls.acme, '999.00')
+
+    @staticmethod
+    def outline(nodes):
+        return [(node['name'], CategoryTreeTests.outline(node['children'])) for node in nodes]
+
+    def listed(self, url, **params):
+        return {row['slug'] for row in self.client.get(url, params).json()['results']}
+
+    def assertPaths(self):
+        """Stored paths and depths equal the ones rebuilt from the parent links"""
+        self.assertEqual(Category.rebuild_paths(), 0)
+        paths = Category.objects.values_list('pk', 'path')
+        return {pk: (path, path.count(Category.PATH_SEPARATOR)) for pk, path in paths}
+
+    def test_tree(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/categories/tree/')
+        self.assertEqual(self.outline(response.json()), [
+            ('Electronics', [('Phones', [('Smartphones', [])])]),
+            # The inactive category hides its subcategories too
+            ('Garden', []),
+        ])
+
+    def test_subtree_filters(self):
+        everything = {self.phone.slug, self.laptop.slug, self.flagship.slug}
+        self.assertEqual(self.listed('/api/products/', category__slug='electronics'), everything)
+        self.assertEqual(self.listed('/api/products/', category__slug='phones'), {self.phone.slug, self.flagship.slug})
+        self.assertEqual(self.listed('/api/products/', category__slug='smartphones'), {self.flagship.slug})
+        self.assertEqual(self.listed('/api/products/search/', category='electronics'), everything)
+        self.assertEqual(
+            self.listed('/api/products/search/', category='phones', q='acme'), {self.phone.slug, self.flagship.slug}
+        )
+        self.assertEqual(self.listed('/api/products/search/', category='missing'), set())
+
+    def test_reparent_rewrites_the_subtree(self):
+        before = self.assertPaths()
+        self.assertEqual(before[self.smartphones.pk][1], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phones.parent = self.garden
+            self.phones.save()
+        after = self.assertPaths()
+        for category in (self.phones, self.smartphones):
+            self.assertTrue(after[category.pk][0].startswith(self.garden.path))
+            self.assertEqual(after[category.pk][1], before[category.pk][1])
+        # Moved to the top, the subtree is one level shallower
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phones.parent = None
+            self.phones.save()
+        self.assertEqual(self.assertPaths()[self.smartphones.pk][1], 2)
+
+        self.assertEqual(self.listed('/api/products/', category__slug='electronics'), {self.laptop.slug})
+        self.assertEqual(self.listed('/api/products/', category__slug='phones'), {self.phone.slug, self.flagship.slug})
+        self.assertEqual(
+            self.outline(self.client.get('/api/categories/tree/').json()),
+            [('Electronics', []), ('Garden', []), ('Phones', [('Smartphones', [])])],
+        )
+
+    def test_cannot_move_under_own_subtree(self):
+        self.electronics.parent = self.smartphones
+        with self.assertRaises(ValueError):
+            self.electronics.save()
+        with self.assertRaises(ValidationError):
+            self.electronics.clean()
+        self.assertPaths()
+
+
+class SearchIndexTests(CatalogTestCase):
+    """The catalog signals keep the FTS5 index equal to search.rebuild()"""
+
+    def index_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid, * FROM {search.SEARCH_TABLE} ORDER BY rowid')
+            return cursor.fetchall()
+
+    def assertMatchesRebuild(self):
+        maintained = self.index_rows()
+        search.rebuild()
+        self.assertEqual(self.index_rows(), maintained)
+
+    def matching(self, query):
+        return set(search.search(Product.objects.all(), query).values_list('pk', flat=True))
+
+    def test_fixture(self):
+        self.assertEqual(len(self.index_rows()), Product.objects.count())
+        self.assertEqual(self.matching('acme'), {self.phone.pk, self.laptop.pk})
+        self.assertMatchesRebuild()
+
+    def test_create_product(self):
+        product = self.create_product('Globex Sprinkler', self.garden, self.globex, '35.00')
+        ProductSpecification.objects.create(product=product, name='Coverage', value='120 square metres')
+        self.assertEqual(self.matching('sprink'), {product.pk})
+        self.assertEqual(self.matching('metres'), {product.pk})
+        self.assertMatchesRebuild()
+
+    def test_update(self):
+        self.phone.name = 'Acme Pocketphone X'
+        self.phone.save()
+        specification = ProductSpecification.objects.create(product=self.laptop, name='Screen', value='OLED')
+        self.acme.name = 'Acme Industries'
+        self.acme.save()
+        self.garden.name = 'Outdoor'
+        self.garden.save()
+        self.assertEqual(self.matching('pocketphone'), {self.phone.pk})
+        self.assertEqual(self.matching('industries'), {self.phone.pk, self.laptop.pk})
+        self.assertEqual(self.matching('outdoor'), {self.hose.pk})
+        self.assertMatchesRebuild()
+        specification.delete()
+        self.assertEqual(self.matching('oled'), set())
+        self.assertMatchesRebuild()
+
+    def test_delete_product(self):
+        self.hose.delete()
+        self.assertEqual(self.matching('hose'), set())
+        self.assertMatchesRebuild()
+
+
+class TypoCorrectionTests(CatalogTestCase):
+    """Unknown query words match their closest name words, and the search response spells the correction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.iphone = cls.create_product('Apple iPhone 15', cls.phones, cls.acme, '899.00')
+        cls.galaxy = cls.create_product('Samsung Galaxy S24', cls.phones, cls.globex, '799.00')
+
+    def search(self, query):
+        return self.client.get('/api/products/search/', {'q': query}).json()
+
+    def trigram_words(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT DISTINCT word FROM {search.TRIGRAM_TABLE}')
+            return {word for (word,) in cursor.fetchall()}
+
+    def test_resolve_query(self):
+        self.assertEqual(search.resolve_query('ipone')[1], 'iphone')
+        self.assertEqual(search.resolve_query('samsng galaxy')[1], 'samsung galaxy')
+        # Known words, and the prefix of one being typed, are left alone
+        self.assertEqual(search.resolve_query('acme'), (search.build_match_expression('acme'), None))
+        self.assertIsNone(search.resolve_query('galax')[1])
+        self.assertIsNone(search.resolve_query('xyzzy')[1])
+
+    def test_corrected_query(self):
+        for query, corrected, product in (('ipone', 'iphone', self.iphone), ('samsng', 'samsung', self.galaxy)):
+            with self.subTest(query=query):
+                response = self.search(query)
+                self.assertEqual(response['corrected_query'], corrected)
+                self.assertEqual([card['id'] for card in response['results']], [product.pk])
+        response = self.search('iphone')
+        self.assertNotIn('corrected_query', response)
+        self.assertEqual([card['id'] for card in response['results']], [self.iphone.pk])
+
+    def test_trigrams_follow_renames_and_deletes(self):
+        self.galaxy.name = 'Samsung Foldable 6'
+        self.galaxy.save()
+        self.assertEqual(search.resolve_query('foldabel')[1], 'foldable')
+        # The word the rename dropped is no correction any more
+        self.assertIsNone(search.resolve_query('galaxi')[1])
+
+        self.iphone.delete()
+        self.assertIsNone(search.resolve_query('ipone')[1])
+        self.assertEqual(self.search('ipone')['results'], [])
+        # Maintained words are a rebuild's plus the ones that left every name
+        maintained = self.trigram_words()
+        search.rebuild()
+        self.assertEqual(maintained - self.trigram_words(), {'galaxy', 's24', 'apple', 'iphone'})
+        self.assertLessEqual(self.trigram_words(), maintained)
+
+
+class FacetTests(CatalogTestCase):
+    """Facet counts of the search results, the time budget, and price filter validation"""
+
+    # A subquery slow enough to outlast any budget: SQLite counts to ten million
+    SLOW_IDS = RawSQL(
+        'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 10000000) SELECT i FROM n', ()
+    )
+
+    def test_counts(self):
+        counts = facets.compute_facets(
+            ProductCard.objects.filter(is_active=True), ['brand', 'category', 'price', 'rating', 'stock']
+        )
+        self.assertEqual([(bucket['key'], bucket['count']) for bucket in counts['brand']], [('acme', 2), ('globex', 1)])
+        self.assertEqual(
+            sorted((bucket['key'], bucket['count']) for bucket in counts['category']),
+            [('electronics', 1), ('garden', 1), ('phones', 1)],
+        )
+        self.assertEqual(
+            {bucket['key']: bucket['count'] for bucket in counts['price'] if bucket['count']},
+            {'0-25': 1, '250-500': 1, '1000+': 1},
+        )
+        self.assertEqual([bucket['count'] for bucket in counts['rating']], [2, 2, 2, 2])
+        self.assertEqual(counts['stock'], [{'key': 'in_stock', 'count': 2}, {'key': 'out_of_stock', 'count': 1}])
+
+    def test_search_response(self):
+        response = self.client.get('/api/products/search/', {'q': 'acme', 'facets': 'brand,stock'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['facets']['brand'], [{'key': 'acme', 'label': 'Acme', 'count': 2}])
+        self.assertNotIn('facets_timed_out', response.json())
+
+    def test_time_budget_interrupts_slow_queries(self):
+        with self.assertRaises(OperationalError), facets.time_budget(10):
+            list(ProductCard.objects.filter(pk__in=self.SLOW_IDS))
+
+    def test_time_out(self):
+        self.assertIsNone(facets.compute_facets(ProductCard.objects.filter(pk__in=self.SLOW_IDS), ['brand'], 10))
+        with mock.patch.object(facets, 'compute_facets', return_value=None):
+            response = self.client.get('/api/products/search/', {'q': 'acme', 'facets': 'brand'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['facets'])
+        self.assertTrue(response.json()['facets_timed_out'])
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_non_finite_price_filters(self):
+        for url in ('/api/products/', '/api/products/search/'):
+            for value in ('NaN', 'Infinity', '-inf', 'cheap'):
+                response = self.client.get(url, {'min_price': value})
+                self.assertEqual(response.status_code, 400, (url, value))
+                self.assertIn('min_price', response.json())
+            response = self.client.get(url, {'min_price': '20', 'max_price': '500'})
+            slugs = {row['slug'] for row in response.json()['results']}
+            self.assertEqual(slugs, {'acme-smartphone-x', 'globex-garden-hose'})
+
+
+class SpecFilterTests(CatalogTestCase):
+    """``spec.<name>=`` filters combine with the other search filters, and the spec facet counts what they leave"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budget_phone = cls.create_product('Globex Phone Lite', cls.phones, cls.globex, '199.00')
+        specs = {
+            cls.phone: {'RAM': '8 GB', 'Color': 'Black'},
+            cls.budget_phone: {'RAM': '4 GB', 'Color': 'White'},
+            cls.laptop: {'RAM': '16 GB', 'Color': 'Black'},
+            cls.hose: {'Color': 'Green'},
+        }
+        for product, values in specs.items():
+            for order, (name, value) in enumerate(values.items()):
+                ProductSpecification.objects.create(product=product, name=name, value=value, order=order)
+
+    def search(self, **params):
+        return self.client.get('/api/products/search/', params).json()
+
+    def found(self, **params):
+        return {card['id'] for card in self.search(**params)['results']}
+
+    def test_values_of_one_attribute_are_ored(self):
+        self.assertEqual(self.found(**{'spec.ram': ['8 gb', '16 GB']}), {self.phone.pk, self.laptop.pk})
+        # Within the category subtree, and with every attribute required
+        every_ram = {'spec.ram': ['8 GB', '16 GB', '4 GB']}
+        self.assertEqual(self.found(category='phones', **every_ram), {self.phone.pk, self.budget_phone.pk})
+        self.assertEqual(
+            self.found(category='electronics', **every_ram), {self.phone.pk, self.budget_phone.pk, self.laptop.pk}
+        )
+        self.assertEqual(
+            self.found(category='electronics', brands='acme', **{'spec.ram': ['8 GB', '4 GB'], 'spec.color': 'black'}),
+            {self.phone.pk},
+        )
+        self.assertEqual(self.found(category='garden', **{'spec.ram': '8 GB'}), set())
+        self.assertEqual(self.found(**{'spec.weight': '1 kg'}), set())
+
+    def test_spec_facet_follows_the_filters(self):
+        def counts(**params):
+            facet = self.search(facets='spec', **params)['facets']['spec']
+            return {
+                attribute['key']: {value['label']: value['count'] for value in attribute['values']}
+                for attribute in facet
+            }
+
+        self.assertEqual(counts(), {
+            'color': {'Black': 2, 'White': 1, 'Green': 1}, 'ram': {'8 GB': 1, '4 GB': 1, '16 GB': 1},
+        })
+        self.assertEqual(counts(category='phones'), {'color': {'Black': 1, 'White': 1}, 'ram': {'8 GB': 1, '4 GB': 1}})
+        self.assertEqual(counts(**{'spec.color': 'black'}), {'color': {'Black': 2}, 'ram': {'8 GB': 1, '16 GB': 1}})
+        self.assertEqual(
+            counts(category='electronics', max_price='500', **{'spec.color': ['black', 'white']}),
+            {'color': {'Black': 1, 'White': 1}, 'ram': {'8 GB': 1, '4 GB': 1}},
+        )
+        self.assertEqual(counts(q='hose'), {'color': {'Green': 1}})
+
+
+class CursorPaginationTests(CatalogTestCase):
+    """Walking a listing by cursor visits every row once, even while rows are added"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for index in range(24):
+            # Few distinct prices, so the primary key has to break the ties
+            cls.create_product(f'Acme Cable {index}', cls.electronics, cls.acme, f'{5 + index % 3}.00')
+
+    def walk(self, params, during=None):
+        """Slugs of every page reached through the next links, and the pages themselves"""
+        pages = []
+        response = self.client.get('/api/products/', {'paginate': 'cursor', 'page_size': 7, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['slug'] for row in response.json()['results']])
+            if during and len(pages) == 2:
+                during()
+            if not response.json()['next']:
+                return pages
+            response = self.client.get(response.json()['next'])
+
+    def expected(self, *ordering):
+        return list(Product.objects.filter(is_active=True).order_by(*ordering).values_list('slug', flat=True))
+
+    def test_walks_every_row_once(self):
+        for ordering, keys in (('-created_at', ('-created_at', '-pk')), ('price', ('price', 'pk'))):
+            pages = self.walk({'ordering': ordering})
+            self.assertTrue(all(len(page) == 7 for page in pages[:-1]))
+            self.assertEqual(sum(pages, []), self.expected(*keys))
+
+    def test_stable_under_inserts_and_deletes(self):
+        expected = self.expected('price', 'pk')
+
+        def write():
+            # A row sorting before the cursor, one sorting after it, and a deleted unseen row
+            self.create_product('Acme Cable Cheap', self.electronics, self.acme, '1.00')
+            self.create_product('Acme Cable Dear', self.electronics, self.acme, '99.00')
+            Product.objects.get(slug=expected[-1]).delete()
+
+        pages = self.walk({'ordering': 'price'}, during=write)
+        # The cheap row sorts before pages already served; everything else shows up exactly once
+        current = [slug for slug in self.expected('price', 'pk') if slug != 'acme-cable-cheap']
+        self.assertEqual(sum(pages, []), current)
+        self.assertNotIn(expected[-1], current)
+
+    def test_previous_links(self):
+        first = self.client.get('/api/products/', {'paginate': 'cursor', 'page_size': 7, 'ordering': 'price'}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+        self.assertIsNone(first['previous'])
+
+    def test_page_size_is_cursor_only(self):
+        response = self.client.get('/api/products/', {'page_size': 3})
+        self.assertEqual(len(response.json()['results']), 20)
+        response = self.client.get('/api/products/', {'paginate': 'cursor', 'page_size': 3})
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/products/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class CatalogSnapshotTests(CatalogTestCase):
+    """Signal-patched snapshot rows equal a fresh build, and listings match the ORM path"""
+
+    def setUp(self):
+        super().setUp()
+        snapshot.rebuild()
+
+    def snapshot_rows(self, directory=None):
+        directory = directory or snapshot.snapshot_dir()
+        with open(snapshot.current_path(directory)) as handle:
+            catalog = snapshot.Snapshot(directory, handle.read().strip())
+        columns = [catalog.columns[name].tolist() for name in snapshot.COLUMNS]
+        return {row[0]: row for row in zip(*columns)}
+
+    def assertMatchesRebuild(self):
+        maintained = self.snapshot_rows()
+        fresh_directory = f'{self.temp_dir}/fresh-snapshot'
+        snapshot.rebuild(directory=fresh_directory)
+        fresh = self.snapshot_rows(fresh_directory)
+        self.assertEqual({pk: maintained[pk] for pk in fresh}, fresh)
+        # Deleted products stay behind until the next build, without their ACTIVE bit
+        for pk in set(maintained) - set(fresh):
+            self.assertFalse(maintained[pk][list(snapshot.COLUMNS).index('flags')] & snapshot.ACTIVE)
+
+    def test_create_and_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product('Globex Sprinkler', self.garden, self.globex, '35.00', is_featured=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.price = Decimal('429.99')
+            self.phone.stock_quantity = 0
+            self.phone.is_bestseller = True
+            self.phone.save()
+            self.review(product, self.users[0], 4)
+        self.assertIn(product.pk, self.snapshot_rows())
+        self.assertMatchesRebuild()
+
+    def test_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.filter(product=self.phone).delete()
+            self.hose.delete()
+        self.assertMatchesRebuild()
+
+    def test_listing_matches_orm(self):
+        # Without a tie on the rating, so both paths agree on the order
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(self.laptop, self.users[1], 5)
+        queries = [
+            {}, {'ordering': 'price'}, {'ordering': '-average_rating'}, {'min_price': '50'},
+            {'category__slug': 'electronics'}, {'is_featured': 'false'}, {'in_stock_only': 'true'},
+        ]
+        with mock.patch.object(snapshot.SnapshotResults, 'count', autospec=True, side_effect=len) as served:
+            from_snapshot = [self.client.get('/api/products/', query).json() for query in queries]
+        self.assertEqual(served.call_count, len(queries))
+        shutil.rmtree(snapshot.snapshot_dir())
+        from_orm = [self.client.get('/api/products/', query).json() for query in queries]
+        self.assertEqual(from_snapshot, from_orm)
+
+
+class SuggestIndexTests(CatalogTestCase):
+    """Every write that changes what a fresh suggest index would hold moves the suggest generation"""
+
+    def setUp(self):
+        super().setUp()
+        self.index = suggest.build()
+
+    @staticmethod
+    def entries(index):
+        # Weights follow review counts and are refreshed with the next rebuild, not per review
+        return {entry[:4] for entry in index.entries}
+
+    def assertRebuiltWhenStale(self, write, stale=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        fresh = suggest.SuggestIndex(suggest.load_entries())
+        self.assertEqual(self.entries(fresh) != self.entries(self.index), stale)
+        self.assertEqual(suggest.current_generation() != self.index.generation, stale)
+        self.index = suggest.build()
+        self.assertEqual(self.entries(self.index), self.entries(fresh))
+
+    def labels(self, query):
+        return [result['label'] for result in suggest.suggest(query)]
+
+    def test_fixture(self):
+        # Bestseller (+20) and featured (+10) boosts outweigh the brand's two products
+        self.assertEqual(self.labels('acme'), ['Acme Laptop Pro', 'Acme Smartphone X', 'Acme'])
+        self.assertEqual(self.labels('phone'), ['Phones'])
+        self.assertEqual(self.labels('old'), [])
+
+    def test_product_writes(self):
+        self.assertRebuiltWhenStale(lambda: self.create_product('Acme Phone Mini', self.phones, self.acme, '299.00'))
+        self.assertIn('Acme Phone Mini', self.labels('phone'))
+
+        def rename():
+            self.laptop.name = 'Acme Notebook Pro'
+            self.laptop.save()
+        self.assertRebuiltWhenStale(rename)
+        self.assertEqual(self.labels('note'), ['Acme Notebook Pro'])
+
+        def deactivate():
+            self.phone.is_active = False
+            self.phone.save()
+        self.assertRebuiltWhenStale(deactivate)
+        self.assertNotIn('Acme Smartphone X', self.labels('acme'))
+
+        self.assertRebuiltWhenStale(self.hose.delete)
+        self.assertEqual(self.labels('hose'), [])
+
+    def test_brand_and_category_writes(self):
+        def rename():
+            self.globex.name = 'Globex Corp'
+            self.globex.save()
+            self.garden.name = 'Outdoor'
+            self.garden.save()
+        self.assertRebuiltWhenStale(rename)
+        self.assertEqual(self.labels('outd'), ['Outdoor'])
+        self.assertRebuiltWhenStale(self.acme.delete)
+        self.assertEqual(self.labels('acme'), [])
+
+    def test_price_and_stock_leave_the_index_alone(self):
+        def restock():
+            self.hose.price = Decimal('19.99')
+            self.hose.stock_quantity = 40
+            self.hose.save()
+        self.assertRebuiltWhenStale(restock, stale=False)
+
+    def test_endpoint(self):
+        response = self.client.get('/api/products/suggest/', {'q': 'Acme sm'})
+        self.assertEqual(response.json()['suggestions'], [
+            {'type': 'product', 'id': self.phone.pk, 'label': 'Acme Smartphone X', 'slug': 'acme-smartphone-x'},
+        ])
+        self.assertEqual(self.client.get('/api/products/suggest/', {'q': 'a', 'limit': 'x'}).status_code, 400)
+
+
+class CatalogStatsTests(CatalogTestCase):
+    """The catalog signals keep CatalogStats and the category review totals equal to reconcile()"""
+
+    def totals(self):
+        stats = CatalogStats.objects.values('total_products', 'total_categories', 'total_brands').get(pk=1)
+        return stats, list(Category.objects.order_by('pk').values_list('pk', 'review_count', 'rating_sum'))
+
+    def assertMatchesReconcile(self):
+        maintained = self.totals()
+        CatalogStats.objects.all().delete()
+        Category.objects.update(review_count=0, rating_sum=0)
+        CatalogStats.reconcile()
+        self.assertEqual(self.totals(), maintained)
+
+    def test_fixture(self):
+        self.assertEqual(self.totals()[0], {'total_products': 3, 'total_categories': 3, 'total_brands': 2})
+        self.assertMatchesReconcile()
+
+    def test_product_writes(self):
+        self.create_product('Globex Rake', self.garden, self.globex, '15.00')
+        self.retired.is_active = True
+        self.retired.save()
+        self.phone.category = self.garden
+        self.phone.save()
+        self.assertMatchesReconcile()
+        self.laptop.delete()
+        self.assertMatchesReconcile()
+
+    def test_review_writes(self):
+        self.review(self.hose, self.users[0], 5)
+        pending = Review.objects.get(product=self.hose, user=self.users[2])
+        pending.is_approved = True
+        pending.save()
+        Review.objects.filter(product=self.phone, user=self.users[1]).delete()
+        self.assertMatchesReconcile()
+
+    def test_category_and_brand_writes(self):
+        Category.objects.create(name='Toys')
+        Brand.objects.create(name='Initech', is_active=False)
+        self.globex.is_active = False
+        self.globex.save()
+        self.assertMatchesReconcile()
+        self.phones.delete()
+        self.assertMatchesReconcile()
+
+    def test_endpoint(self):
+        self.review(self.hose, self.users[0], 4)
+        response = self.client.get('/api/stats/').json()
+        self.assertEqual(
+            (response['total_products'], response['total_categories'], response['total_brands']), (3, 3, 2)
+        )
+        self.assertIn({'name': 'Phones', 'product_count': 1}, response['category_stats'])
+        self.assertEqual(
+            {row['name']: row['avg_rating'] for row in response['rating_stats']},
+            {'Electronics': 4.0, 'Garden': 4.0, 'Phones': 4.0},
+        )
+
+
+class SparseFieldsTests(CatalogTestCase):
+    """?fields= and ?omit= shape list and detail responses and prune the queries of omitted fields"""
+
+    def detail(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/products/{self.phone.slug}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_list_fields(self):
+        rows = self.client.get('/api/products/', {'fields': 'id,name,price,category.name'}).json()['results']
+        self.assertEqual(len(rows), 3)
+        for row in rows:
+            self.assertEqual(set(row), {'id', 'name', 'price', 'category'})
+            self.assertEqual(set(row['category']), {'name'})
+
+    def test_list_omit(self):
+        full = self.client.get('/api/products/search/', {'q': 'acme'}).json()['results']
+        sparse = self.client.get('/api/products/search/', {'q': 'acme', 'omit': 'brand,image,category.id'}).json()
+        for row, sparse_row in zip(full, sparse['results']):
+            self.assertEqual(set(row) - set(sparse_row), {'brand', 'image'})
+            self.assertEqual(sparse_row['category'], {key: row['category'][key] for key in ('name', 'slug')})
+
+    def test_detail_fields(self):
+        RelatedProduct.objects.create(product=self.phone, related=self.laptop, rank=0, score=0.5)
+        full, full_queries = self.detail()
+        self.assertEqual(len(full['related_products']), 1)
+        sparse, sparse_queries = self.detail(fields='name,price,related_products.brand.slug,bogus')
+        self.assertEqual(set(sparse), {'name', 'price', 'related_products'})
+        self.assertEqual(
+            sparse['related_products'], [{'brand': {'slug': row['brand']['slug']}} for row in full['related_products']]
+        )
+        self.assertEqual((sparse['name'], sparse['price']), (full['name'], full['price']))
+        # No rating summary join and no image prefetch when neither is shown
+        self.assertLess(sparse_queries, full_queries)
+
+    def test_detail_omit(self):
+        full, _ = self.detail()
+        sparse, _ = self.detail(omit='images,related_products,description')
+        self.assertEqual(set(full) - set(sparse), {'images', 'related_products', 'description'})
+        self.assertEqual(sparse, {key: value for key, value in full.items() if key in sparse})
+
+
+class ProductBulkTests(CatalogTestCase):
+    """/products/bulk/ returns products in request order with a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for product in (cls.phone, cls.laptop, cls.hose):
+            ProductImage.objects.create(product=product, image=f'products/{product.slug}.jpg', is_primary=True)
+
+    def bulk(self, **params):
+        return self.client.get('/api/products/bulk/', params)
+
+    def test_request_order_and_missing(self):
+        ids = [self.hose.pk, self.retired.pk, self.phone.pk, 9999, self.laptop.pk, self.hose.pk]
+        response = self.bulk(ids=','.join(map(str, ids)))
+        self.assertEqual(response.status_code, 200)
+        served = [row['id'] for row in response.json()['results']]
+        self.assertEqual(served, [self.hose.pk, self.phone.pk, self.laptop.pk])
+        # Inactive and unknown ids are missing; repeated ones are served once
+        self.assertEqual(response.json()['missing'], [self.retired.pk, 9999])
+
+        response = self.bulk(slugs=f'{self.laptop.slug}, nothing-here,{self.phone.slug}')
+        self.assertEqual([row['slug'] for row in response.json()['results']], [self.laptop.slug, self.phone.slug])
+        self.assertEqual(response.json()['missing'], ['nothing-here'])
+
+    def test_query_count_does_not_grow(self):
+        for products in ([self.phone], [self.phone, self.laptop, self.hose]):
+            with self.subTest(count=len(products)), self.assertNumQueries(2):
+                response = self.bulk(ids=','.join(str(product.pk) for product in products))
+            self.assertEqual(len(response.json()['results']), len(products))
+        with self.assertNumQueries(1):
+            self.bulk(ids=self.phone.pk, fields='id,name,average_rating')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.bulk(ids='').json(), {'results': [], 'missing': []})
+
+    def test_limits_and_errors(self):
+        limit = settings.PRODUCT_BULK_MAX_ITEMS
+        self.assertEqual(self.bulk(ids=','.join(map(str, range(1, limit + 1)))).status_code, 200)
+        response = self.bulk(ids=','.join(map(str, range(1, limit + 2))))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(limit), response.json()['error'])
+        # Repeats count once towards the limit
+        self.assertEqual(self.bulk(ids=','.join(['1'] * (limit + 1))).status_code, 200)
+        for params in ({}, {'ids': '1', 'slugs': 'a'}, {'ids': '1,x'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.bulk(**params).status_code, 400)
+
+
+class CompiledSerializerTests(CatalogTestCase):
+    """CompiledListSerializer renders exactly what DRF's ListSerializer renders, edge cases included"""
+
+    SPARSE_QUERIES = ({'fields': 'id,name,price,category.name,thumbnail'}, {'omit': 'brand,image,category.slug'})
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # A rendered primary image, an unrendered one, no image at all (the hose) and no rating summary
+        rendered = ProductImage.objects.create(product=cls.phone, image='products/phone.jpg', is_primary=True)
+        ProductImage.objects.filter(pk=rendered.pk).update(rendition_key='0123456789abcdef')
+        ProductCard.sync_images([cls.phone.pk])
+        ProductImage.objects.create(product=cls.laptop, image='products/laptop.jpg')
+        RatingSummary.objects.filter(product=cls.retired).delete()
+
+    def assertSameOutput(self, serializer_class, instances):
+        self.assertTrue(fast_serializers.is_enabled())
+        for params in ({}, *self.SPARSE_QUERIES):
+            compiled, plain = compiled_and_plain(serializer_class, instances, **params)
+            self.assertEqual(compiled, plain, params)
+
+    def test_fixture_edge_cases(self):
+        self.assertIsNone(Product.objects.get(pk=self.hose.pk).original_price)
+        self.assertFalse(RatingSummary.objects.filter(product=self.retired).exists())
+        self.assertEqual(
+            dict(ProductCard.objects.values_list('slug', 'image_rendition_key').filter(image__gt='')),
+            {'acme-smartphone-x': '0123456789abcdef', 'acme-laptop-pro': ''},
+        )
+
+    def test_product_list_serializer(self):
+        products = Product.objects.select_related('category', 'brand', 'rating_summary').prefetch_related('images')
+        self.assertSameOutput(ProductListSerializer, products.order_by('pk'))
+
+    def test_product_card_serializer(self):
+        self.assertSameOutput(ProductCardSerializer, ProductCard.objects.order_by('pk'))
+        compiled, _ = compiled_and_plain(ProductCardSerializer, ProductCard.objects.filter(pk=self.phone.pk))
+        self.assertIn(b'0123456789abcdef', compiled)
+
+
+class RendererTests(CatalogTestCase):
+    """FastJSONRenderer writes JSONRenderer's bytes, and streamed lists the bytes of buffered ones"""
+
+    def assertSameBytes(self, data):
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_floats(self):
+        plain = [0.0, -0.0, 1.5, -2.25, 0.1, 1 / 3, 1e-4, 9.999e15, 4.0, 123456789.125]
+        exponents = [1e16, -1e16, 1e-5, 2.5e-7, 1.7976931348623157e308, 5e-324]
+        self.assertTrue(renderers.plain_floats({'values': plain, 'nested': [{'x': value} for value in plain]}))
+        for value in exponents:
+            with self.subTest(value=value):
+                self.assertFalse(renderers.plain_floats({'rows': [{'value': value}]}))
+                self.assertSameBytes({'rows': [{'value': value}], 'plain': plain})
+        self.assertSameBytes(plain)
+        self.assertSameBytes({'value': 4.5, 'nested': (1.25, [1e-300])})
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                # JSONRenderer refuses them; orjson would have written null
+                renderers.FastJSONRenderer().render({'results': [{'rating': 4.0}, {'rating': value}]})
+
+    def test_decimals_and_datetimes(self):
+        moment = datetime(2024, 5, 17, 9, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        self.assertSameBytes({
+            'prices': [Decimal('499.00'), Decimal('0.10'), Decimal('-1E+3'), Decimal('12345678901234567890.5')],
+            'aware': moment,
+            'naive': moment.replace(tzinfo=None, microsecond=0),
+            'offset': moment.astimezone(dt_timezone(timedelta(hours=5, minutes=30))),
+            'date': moment.date(),
+            'time': moment.time(),
+            'elapsed': timedelta(days=1, seconds=5),
+            'text': 'line\u2028separator \u2029 and emoji \U0001f600',
+            'keys': {1: 'one', 'two': [None, True, False]},
+        })
+
+    def test_streamed_list(self):
+        Product.objects.bulk_create(
+            Product(
+                name=f'Acme Cable {index}', slug=f'acme-cable-{index}', description='Cable', category=self.electronics,
+                brand=self.acme, sku=f'CABLE-{index}', price=Decimal(f'{5 + index % 7}.{index % 100:02d}'),
+                stock_quantity=index % 3,
+            )
+            for index in range(230)
+        )
+        ProductCard.refresh()
+
+        def fetch(**params):
+            response = self.client.get('/api/products/', params)
+            self.assertEqual(response.status_code, 200)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            return response, content
+
+        # More rows than a chunk (only cursor pages take a page_size): streamed without a Content-Length
+        response, streamed = fetch(paginate='cursor', page_size=250)
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(len(json.loads(streamed)['results']), 233)
+        with mock.patch.object(views.ProductListView, 'stream_chunk_size', 500):
+            response, buffered = fetch(paginate='cursor', page_size=250)
+        self.assertFalse(response.streaming)
+        self.assertEqual(streamed, buffered)
+
+        # A normal page is buffered unless the caller asks for a stream
+        self.assertFalse(fetch()[0].streaming)
+        for params in ({}, {'ordering': 'price'}):
+            response, requested = fetch(stream=1, **params)
+            self.assertTrue(response.streaming)
+            # The links carry the stream parameter along; the rows are the buffered page's
+            self.assertEqual(json.loads(requested)['results'], json.loads(fetch(**params)[1])['results'])
+        # Indented output is never streamed
+        response = self.client.get('/api/products/', {'stream': 1}, HTTP_ACCEPT='application/json; indent=2')
+        self.assertFalse(response.streaming)
+
+
+class RenditionTests(CatalogTestCase):
+    """Local images render into content-addressed sizes, in the background and never inside a request"""
+
+    def write_source(self, name, size=(2400, 1200), mode='RGB', fmt='JPEG'):
+        """Store a generated image under MEDIA_ROOT; returns its ImageField name"""
+        path = os.path.join(settings.MEDIA_ROOT, 'products', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new(mode, size, (200, 40, 40, 128) if mode == 'RGBA' else (200, 40, 40)).save(path, fmt)
+        return f'products/{name}'
+
+    def rendition(self, key, name, fmt):
+        with Image.open(os.path.join(renditions.root(), imaging.rendition_name(key, name, fmt))) as output:
+            return output.format, output.mode, output.size
+
+    def test_generation(self):
+        name = self.write_source('phone.jpg')
+        image = ProductImage.objects.create(product=self.phone, image=name, is_primary=True)
+        self.assertIsNone(ProductCard.objects.get(pk=self.phone.pk).image_rendition_key or None)
+        self.assertEqual(renditions.process(ProductImage.objects.filter(pk=image.pk), max_workers=1), (1, 0))
+
+        image.refresh_from_db()
+        with open(os.path.join(settings.MEDIA_ROOT, name), 'rb') as source:
+            key = imaging.rendition_key(source.read(), imaging.spec_of(renditions.SIZES, renditions.FORMATS))
+        self.assertEqual(image.rendition_key, key)
+        self.assertEqual(ProductCard.objects.get(pk=self.phone.pk).image_rendition_key, key)
+        for size, edge in renditions.SIZES.items():
+            for fmt in renditions.FORMATS:
+                self.assertEqual(
+                    self.rendition(key, size, fmt), (imaging.FORMATS[fmt][0], 'RGB', (edge, edge // 2))
+                )
+
+        served = self.client.get(f'/api/products/{self.phone.slug}/').json()['images'][0]['renditions']
+        self.assertEqual(set(served), set(renditions.SIZES))
+        url = served['thumbnail']['webp']
+        self.assertTrue(url.endswith(imaging.rendition_name(key, 'thumbnail', 'webp')))
+        response = self.client.get(urlsplit(url).path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], renditions.CACHE_CONTROL)
+        response.close()
+
+        # The process pool: identical bytes share the key, transparency is flattened for JPEG, and neither a
+        # broken file nor a remote URL stops the batch
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, name), os.path.join(settings.MEDIA_ROOT, 'products/copy.jpg'))
+        batch = [
+            ProductImage.objects.create(product=self.laptop, image='products/copy.jpg'),
+            ProductImage.objects.create(
+                product=self.hose, image=self.write_source('hose.png', (300, 600), 'RGBA', 'PNG'),
+            ),
+            ProductImage.objects.create(product=self.hose, image='https://cdn.example.com/hose.jpg'),
+        ]
+        broken = os.path.join(settings.MEDIA_ROOT, 'products/broken.jpg')
+        with open(broken, 'wb') as handle:
+            handle.write(b'not an image')
+        batch.append(ProductImage.objects.create(product=self.hose, image='products/broken.jpg'))
+        with self.assertLogs('products.renditions', 'WARNING'):
+            self.assertEqual(renditions.process(batch, max_workers=2), (2, 1))
+        keys = dict(
+            ProductImage.objects.filter(pk__in=[image.pk for image in batch]).values_list('image', 'rendition_key')
+        )
+        self.assertEqual(keys['products/copy.jpg'], key)
+        self.assertEqual((keys['https://cdn.example.com/hose.jpg'], keys['products/broken.jpg']), ('', ''))
+        self.assertEqual(self.rendition(keys['products/hose.png'], 'thumbnail', 'webp'), ('WEBP', 'RGBA', (160, 320)))
+        self.assertEqual(self.rendition(keys['products/hose.png'], 'thumbnail', 'jpeg'), ('JPEG', 'RGB', (160, 320)))
+        self.assertEqual(self.rendition(keys['products/hose.png'], 'zoom', 'jpeg'), ('JPEG', 'RGB', (300, 600)))
+        self.assertEqual(list(renditions.pending()), [batch[-1]])
+
+    def test_replacing_the_file_forgets_the_key(self):
+        image = ProductImage.objects.create(product=self.phone, image=self.write_source('phone.jpg'), is_primary=True)
+        renditions.process([image], max_workers=1)
+        image.refresh_from_db()
+        key = image.rendition_key
+
+        image.alt_text = 'Front'
+        image.save()
+        self.assertEqual(ProductImage.objects.get(pk=image.pk).rendition_key, key)
+
+        image.image = self.write_source('phone-new.jpg', (800, 800))
+        with mock.patch.object(renditions, 'enqueue') as enqueue, self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertEqual(ProductImage.objects.get(pk=image.pk).rendition_key, '')
+        self.assertEqual(ProductCard.objects.get(pk=self.phone.pk).image_rendition_key, '')
+        enqueue.assert_called_once_with([image.pk])
+
+        renditions.process([image], max_workers=1)
+        self.assertNotIn(ProductImage.objects.get(pk=image.pk).rendition_key, ('', key))
+
+    def test_request_path_never_renders(self):
+        name = self.write_source('phone.jpg')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin', password='secret', is_staff=True))
+        feed = f'<products><product><sku>ACME-TABLET</sku><name>Acme Tablet</name><price>349.00</price>' \
+            f'<category>electronics</category><brand>acme</brand><images><image>{name}</image></images>' \
+            f'</product></products>'
+
+        with mock.patch.object(imaging, 'render', side_effect=AssertionError('rendered in the request')), \
+                mock.patch.object(renditions, 'enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                upload = ProductImage.objects.create(product=self.phone, image=name, is_primary=True)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/admin/import/', {'xml_content': feed}, format='json')
+            self.assertEqual((response.status_code, response.data['created']), (200, 1))
+            imported = ProductImage.objects.get(product__sku='ACME-TABLET')
+            self.assertEqual(enqueue.call_args_list, [mock.call([upload.pk]), mock.call([imported.pk])])
+
+            # Until the background render lands the original file is served
+            detail = self.client.get(f'/api/products/{self.phone.slug}/').json()
+            self.assertEqual(detail['images'][0]['renditions'], None)
+            self.assertTrue(detail['images'][0]['image'].endswith(name))
+            listed = {row['slug']: row for row in self.client.get('/api/products/').json()['results']}
+            self.assertEqual(listed[self.phone.slug]['thumbnail'], None)
+
+        # enqueue hands the ids to a worker thread and returns
+        threads = []
+        with mock.patch.object(renditions, 'process', side_effect=lambda images: threads.append(current_thread())):
+            renditions.enqueue([upload.pk])
+            self.assertTrue(renditions.wait(timeout=5))
+        self.assertEqual([thread.name for thread in threads], ['product-image-renditions'])
+        self.assertIsNot(threads[0], current_thread())
+
+
+class ExportImportTests(CatalogTestCase):
+    """Importing a catalog export puts back the catalog it was exported from"""
+
+    FORMATS = ('ndjson', 'csv')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ProductImage.objects.create(product=cls.phone, image='https://cdn.example.com/phone-front.jpg', order=0)
+        ProductImage.objects.create(
+            product=cls.phone, image='https://cdn.example.com/phone-back.jpg', order=1, is_primary=True,
+        )
+        ProductSpecification.objects.create(product=cls.laptop, name='Screen', value='14" OLED')
+        ProductSpecification.objects.create(product=cls.laptop, name='Weight', value='1.2 kg', order=1)
+
+    def export(self, fmt):
+        return b''.join(export.export_chunks(fmt, chunk_size=2))
+
+    def exported_rows(self):
+        """The NDJSON export without the columns a re-import is free to change"""
+        rows = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        return [{key: value for key, value in row.items() if key not in ('id', 'updated_at')} for row in rows]
+
+    def reimport(self, fmt, feed):
+        with self.captureOnCommitCallbacks(execute=True):
+            return importer.ProductImporter(batch_size=2).run(importer.read_feed(io.BytesIO(feed), fmt))
+
+    def test_reimport_is_unchanged(self):
+        original = self.exported_rows()
+        for fmt in self.FORMATS:
+            with self.subTest(fmt=fmt):
+                result = self.reimport(fmt, self.export(fmt))
+                self.assertEqual(result.errors, [])
+                self.assertEqual((result.rows, result.created, result.updated, result.unchanged), (3, 0, 0, 3))
+                self.assertEqual(self.exported_rows(), original)
+
+    def test_round_trip(self):
+        original = self.exported_rows()
+        self.assertEqual(original[0]['images'], [
+            'https://cdn.example.com/phone-front.jpg', 'https://cdn.example.com/phone-back.jpg',
+        ])
+        self.assertEqual(original[0]['image'], 'https://cdn.example.com/phone-back.jpg')
+        for fmt in self.FORMATS:
+            with self.subTest(fmt=fmt):
+                feed = self.export(fmt)
+                phone = Product.objects.get(pk=self.phone.pk)
+                phone.name = 'Acme Smartphone Y'
+                phone.price = Decimal('449.00')
+                phone.original_price = None
+                phone.save()
+                ProductImage.objects.filter(product=phone, is_primary=True).delete()
+                ProductSpecification.objects.filter(product=self.laptop, name='Weight').delete()
+                Product.objects.filter(sku=self.hose.sku).delete()
+
+                result = self.reimport(fmt, feed)
+                self.assertEqual(result.errors, [])
+                self.assertEqual((result.created, result.updated, result.unchanged), (1, 2, 0))
+                self.assertEqual(self.exported_rows(), original)
+                # The bulk writes refreshed the read models they bypassed
+                maintained = table_rows(ProductCard.objects.all())
+                ProductCard.objects.all().delete()
+                ProductCard.refresh()
+                self.assertEqual(table_rows(ProductCard.objects.all()), maintained)
+                self.assertEqual(Category.objects.get(pk=self.garden.pk).active_product_count, 1)
+
+    def test_rewritten_children_send_no_delete_signals(self):
+        rows = self.exported_rows()
+        rows[0]['image'] = 'https://cdn.example.com/phone-side.jpg'
+        rows[0]['images'] = [rows[0]['image']]
+        rows[1]['specifications'] = {'Screen': '16" OLED'}
+        feed = b'\n'.join(json.dumps(row).encode('utf-8') for row in rows)
+        deleted = []
+
+        def receiver(sender, **kwargs):
+            deleted.append(sender)
+
+        for model in (ProductImage, ProductSpecification):
+            post_delete.connect(receiver, sender=model)
+            self.addCleanup(post_delete.disconnect, receiver, sender=model)
+        result = self.reimport('ndjson', feed)
+        self.assertEqual((result.errors, result.updated), ([], 2))
+        self.assertEqual(deleted, [])
+        # The batch refreshed what the receivers would have
+        self.assertEqual(ProductCard.objects.get(product=self.phone).image, 'https://cdn.example.com/phone-side.jpg')
+        self.assertEqual(
+            list(ProductSpecification.objects.filter(product=self.laptop).values_list('value', flat=True)),
+            ['16" OLED'],
+        )
+        found = list(search.search(Product.objects.all(), '16').values_list('pk', flat=True))
+        self.assertEqual(found, [self.laptop.pk])
+
+
+class GenerateDatasetTests(ScratchTestCase):
+    """generate_dataset writes the requested rows and the read models the skipped signals would have kept"""
+
+    def generate(self, **options):
+        call_command('generate_dataset', batch_size=50, stdout=io.StringIO(), **options)
+
+    def dataset(self, seed=1):
+        products = Product.objects.filter(sku__startswith=f'G{seed}-')
+        return (
+            list(products.order_by('sku').values_list('sku', 'name', 'price', 'category__name', 'brand__name')),
+            sorted(Review.objects.filter(product__in=products).values_list('product__sku', 'user__email', 'rating')),
+            list(Order.objects.filter(order_number__startswith=f'G{seed}-').order_by('order_number').values_list(
+                'order_number', 'user__email', 'total_amount',
+            )),
+        )
+
+    def test_counts_and_read_models(self):
+        self.generate(products=80, users=25, reviews=150, orders=40, brands=8)
+        products = Product.objects.filter(sku__startswith='G1-')
+        self.assertEqual(products.count(), 80)
+        self.assertEqual(User.objects.filter(email__startswith='g1.').count(), 25)
+        self.assertEqual(Review.objects.count(), 150)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(ProductImage.objects.filter(is_primary=True).count(), 80)
+        self.assertEqual(ProductSpecification.objects.count(), 160)
+        for order in Order.objects.prefetch_related('items'):
+            self.assertEqual(order.subtotal, sum(item.total_price for item in order.items.all()))
+            self.assertEqual(order.total_amount, order.subtotal + order.tax_amount + order.shipping_amount)
+
+        active = products.filter(is_active=True)
+        self.assertEqual(
+            set(ProductCard.objects.values_list('pk', flat=True)), set(active.values_list('pk', flat=True))
+        )
+        approved = Review.objects.filter(is_approved=True)
+        self.assertEqual(sum(RatingSummary.objects.values_list('review_count', flat=True)), approved.count())
+        self.assertEqual(CatalogStats.objects.get(pk=1).total_products, active.count())
+        for category in Category.objects.all():
+            self.assertEqual(category.active_product_count, active.filter(category=category).count())
+        product = active.first()
+        self.assertIn(product.pk, search.search(Product.objects.all(), product.name).values_list('pk', flat=True))
+
+    def test_same_seed_same_data(self):
+        self.generate(products=40, users=10, reviews=60, orders=15, brands=5)
+        first = self.dataset()
+        Order.objects.all().delete()
+        Product.objects.all().delete()
+        User.objects.all().delete()
+        self.generate(products=40, users=10, reviews=60, orders=15, brands=5)
+        self.assertEqual(self.dataset(), first)
+        with self.assertRaisesMessage(CommandError, 'seed 1 already exists'):
+            self.generate(users=5)
+        self.generate(products=40, brands=5, seed=2)
+        self.assertNotEqual([row[1:] for row in self.dataset(2)[0]], [row[1:] for row in first[0]])
+
+
+class SearchAnalyticsTests(ScratchTestCase):
+    """Space-Saving counts stay within their error bounds and flush into the rollups popular() reads"""
+
+    def setUp(self):
+        super().setUp()
+        # Searches other tests recorded in this worker's sketch
+        search_analytics.drain()
+
+    def flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return search_analytics.flush()
+
+    def test_exact_under_capacity(self):
+        terms = ['phone'] * 5 + ['laptop'] * 3 + ['hose'] * 3 + ['rake']
+        sketch = search_analytics.SpaceSaving(capacity=4)
+        for term in terms:
+            sketch.add(term)
+        self.assertEqual(sketch.top(), [('phone', 5, 0), ('hose', 3, 0), ('laptop', 3, 0), ('rake', 1, 0)])
+        self.assertEqual((len(sketch), sketch.total), (4, len(terms)))
+
+    def test_error_bounds(self):
+        rng = random.Random(7)
+        population = [f'term {index}' for index in range(200)]
+        stream = rng.choices(population, weights=[1 / rank for rank in range(1, 201)], k=5000)
+        sketch = search_analytics.SpaceSaving(capacity=20)
+        for term in stream:
+            sketch.add(term)
+        exact = Counter(stream)
+        self.assertEqual((len(sketch), sketch.total), (20, 5000))
+        self.assertLessEqual(len(sketch.heap), 4 * sketch.capacity + 1)
+        for term, count, error in sketch.top():
+            self.assertLessEqual(count - error, exact[term], term)
+            self.assertLessEqual(exact[term], count, term)
+            self.assertLessEqual(error, sketch.total // sketch.capacity)
+        # Every term searched more than total / capacity times is still tracked
+        tracked = {term for term, _, _ in sketch.top()}
+        self.assertTrue({term for term, count in exact.items() if count > 5000 // 20} <= tracked)
+
+    def test_flush_and_popular(self):
+        for text in ['Phone', ' phone ', 'PHONE', 'Laptop', 'laptop', 'Café', '!!']:
+            search_analytics.record(text)
+        self.assertEqual(self.flush(), 6)
+        expected = [
+            {'term': 'phone', 'searches': 3, 'error': 0},
+            {'term': 'laptop', 'searches': 2, 'error': 0},
+            {'term': 'cafe', 'searches': 1, 'error': 0},
+        ]
+        for window in search_analytics.WINDOWS:
+            self.assertEqual(search_analytics.popular(window), {'terms': expected, 'total': 6})
+        self.assertEqual(SearchTermRollup.objects.filter(period=SearchTermRollup.HOUR).count(), 3)
+        self.assertEqual(list(SearchVolume.objects.order_by('period').values_list('period', 'searches')), [
+            (SearchTermRollup.DAY, 6), (SearchTermRollup.HOUR, 6),
+        ])
+
+        # A second flush adds to the same buckets and invalidates the cached lists
+        search_analytics.record('laptop')
+        search_analytics.record('laptop')
+        self.assertEqual(self.flush(), 2)
+        self.assertEqual(search_analytics.popular('day', limit=1), {
+            'terms': [{'term': 'laptop', 'searches': 4, 'error': 0}], 'total': 8,
+        })
+        response = self.client.get('/api/analytics/popular-searches/', {'window': 'hour', 'limit': 2})
+        self.assertEqual(response.json()['search_terms'], ['laptop', 'phone'])
+        self.assertEqual(self.client.get('/api/analytics/popular-searches/', {'window': 'year'}).status_code, 400)
+
+    def test_flush_trims_buckets(self):
+        for text in ['phone', 'phone', 'phone', 'laptop', 'laptop', 'hose']:
+            search_analytics.record(text)
+        with mock.patch.object(search_analytics, 'CAPACITY', 2):
+            self.flush()
+        self.assertEqual(
+            sorted(SearchTermRollup.objects.values_list('period', 'term')),
+            [('day', 'laptop'), ('day', 'phone'), ('hour', 'laptop'), ('hour', 'phone')],
+        )
+        # The volume still counts the searches of the dropped term
+        self.assertEqual(search_analytics.popular('hour')['total'], 6)
+
+
+class IndexAdvisorTests(CatalogTestCase):
+    """advise_indexes reports an index only when EXPLAIN shows it removes the scan or sort"""
+
+    def test_proposal_is_verified(self):
+        shape = Review.objects.filter(is_approved=True).order_by('-rating')[:20]
+        report, = query_advisor.advise([('reviews by rating', shape)])
+        self.assertEqual(report.temp_sorts, ['ORDER BY'])
+        self.assertEqual((report.proposal.fields, report.proposal.condition), (['-rating'], {'is_approved': True}))
+        # The hypothetical index was rolled back
+        self.assertNotIn(report.proposal.name, query_advisor.database_indexes(Review, 'default'))
+
+    def test_existing_index_is_not_reported_as_covering(self):
+        shape = ProductCard.objects.filter(is_active=True, category_id__in=[self.phones.pk, self.electronics.pk])
+        report, = query_advisor.advise([('cards in categories', shape.order_by('-created_at')[:20])])
+        self.assertEqual(report.temp_sorts, ['ORDER BY'])
+        self.assertIsNone(report.covered_by)
+        self.assertIsNone(report.proposal)
+        # A subtree IN cannot be read in index order, not even from the index built for one category
+        self.assertEqual(report.unresolved_by, 'card_category_created_idx')
+        one_category = shape.filter(category_id=self.phones.pk).order_by('-created_at')[:20]
+        report, = query_advisor.advise([('cards in one category', one_category)])
+        self.assertFalse(report.flagged)
+
+        output = io.StringIO()
+        call_command('advise_indexes', stdout=output)
+        self.assertNotIn('indexed by card_keyset', output.getvalue())
+
+
+class ResponseCacheTests(CatalogTestCase):
+    """Cached catalog responses are served until a write bumps their group's shared generation"""
+
+    def featured(self):
+        return views.FeaturedProductsView.as_view()(APIRequestFactory().get('/api/products/featured/'))
+
+    def categories(self):
+        return self.client.get('/api/categories/')
+
+    def brands(self):
+        return self.client.get('/api/brands/')
+
+    def assertInvalidatedBy(self, fetch, write):
+        fetch()
+        self.assertEqual(fetch()['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertEqual(fetch()['X-Cache'], 'MISS')
+
+    def test_hit_and_miss_counters(self):
+        first, second = self.categories(), self.categories()
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(self.client.get('/api/categories/', {'page': 1})['X-Cache'], 'MISS')
+        self.assertEqual(
+            response_cache.cache_stats()['CategoryListView'], {'hits': 1, 'misses': 2, 'hit_ratio': 0.3333}
+        )
+
+        client = APIClient()
+        self.assertEqual(client.get('/api/stats/cache/').status_code, 401)
+        client.force_authenticate(User.objects.create_user(username='admin', password='secret', is_staff=True))
+        self.assertEqual(client.get('/api/stats/cache/').json()['CategoryListView']['hits'], 1)
+
+    def test_product_writes(self):
+        def reprice():
+            self.phone.price = Decimal('449.00')
+            self.phone.save()
+
+        self.assertInvalidatedBy(self.featured, reprice)
+        self.assertInvalidatedBy(self.categories, reprice)
+        self.assertInvalidatedBy(self.brands, reprice)
+        self.assertInvalidatedBy(self.featured, lambda: Product.objects.get(pk=self.hose.pk).delete())
+
+    def test_review_writes(self):
+        self.assertInvalidatedBy(self.featured, lambda: self.review(self.phone, self.users[2], 1))
+        self.assertInvalidatedBy(self.featured, lambda: Review.objects.filter(product=self.phone).first().delete())
+
+    def test_image_writes(self):
+        self.assertInvalidatedBy(
+            self.featured, lambda: ProductImage.objects.create(product=self.phone, image='products/phone.jpg')
+        )
+        self.assertInvalidatedBy(self.featured, lambda: ProductImage.objects.filter(product=self.phone).delete())
+
+    def test_category_and_brand_writes(self):
+        def rename(instance, name):
+            instance.name = name
+            instance.save()
+
+        self.assertInvalidatedBy(self.categories, lambda: rename(self.garden, 'Outdoor'))
+        self.assertInvalidatedBy(self.featured, lambda: rename(self.phones, 'Mobile Phones'))
+        self.assertInvalidatedBy(self.brands, lambda: rename(self.globex, 'Globex Corp'))
+        self.assertInvalidatedBy(self.featured, lambda: rename(self.acme, 'Acme Industries'))
+        # Groups a write cannot affect keep their entries
+        self.categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            rename(self.globex, 'Globex Inc')
+        self.assertEqual(self.categories()['X-Cache'], 'HIT')
+
+    def test_generations_are_shared_between_processes(self):
+        # Another worker, or a management command, has its own connection to the shared cache
+        other = caches.create_connection(response_cache.GENERATION_CACHE)
+        self.assertEqual([self.categories()['X-Cache'], self.categories()['X-Cache']], ['MISS', 'HIT'])
+        other.set(response_cache.generation_key('categories'), response_cache.new_generation(), timeout=None)
+        self.assertEqual(self.categories()['X-Cache'], 'MISS')
+
+        # A generation lost from the shared cache starts afresh instead of reviving older entries
+        before = response_cache.current_generation('categories')
+        self.assertEqual(self.categories()['X-Cache'], 'HIT')
+        other.delete(response_cache.generation_key('categories'))
+        self.assertEqual(self.categories()['X-Cache'], 'MISS')
+        self.assertNotEqual(response_cache.current_generation('categories'), before)
+
+
+class ConditionalGetTests(CatalogTestCase):
+    """Product and category detail answer If-None-Match and If-Modified-Since with 304 after one query"""
+
+    def detail(self, product, **headers):
+        return self.client.get(f'/api/products/{product.slug}/', headers=headers)
+
+    def assertNotModified(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('Last-Modified'))
+        for headers in ({'If-None-Match': first['ETag']}, {'If-Modified-Since': first['Last-Modified']}):
+            with self.assertNumQueries(1):
+                response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 304)
+        return first
+
+    def assertChangedBy(self, product, write):
+        """The ETag moves with ``write``, and a request for the old one gets the new related products"""
+        etag = conditional.product_validators(product.slug)[0]
+        shown = [card.pk for card in RelatedProduct.cards_for(product.pk, product.category_id)]
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertNotEqual(conditional.product_validators(product.slug)[0], etag)
+        response = self.detail(product, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        return shown, [card['id'] for card in response.json()['related_products']]
+
+    def test_not_modified(self):
+        first = self.assertNotModified(f'/api/products/{self.phone.slug}/')
+        self.assertEqual(first['ETag'], conditional.product_validators(self.phone.slug)[0])
+        self.assertNotModified(f'/api/categories/{self.phones.slug}/')
+        self.assertEqual(self.client.get('/api/products/missing/').status_code, 404)
+
+    @staticmethod
+    def save(product, **fields):
+        for name, value in fields.items():
+            setattr(product, name, value)
+        product.save()
+
+    def test_product_writes(self):
+        self.assertChangedBy(self.phone, lambda: self.save(self.phone, price=Decimal('449.00')))
+        self.assertChangedBy(
+            self.phone, lambda: ProductImage.objects.create(product=self.phone, image='products/back.jpg')
+        )
+        self.assertChangedBy(self.laptop, lambda: self.review(self.laptop, self.users[1], 2))
+
+    def test_related_products(self):
+        tablet = self.create_product('Acme Tablet', self.electronics, self.acme, '299.00')
+        # No links yet: the laptop's page is filled up from its category
+        link = {'product': self.laptop, 'related': self.hose, 'rank': 0, 'score': 0.9}
+        shown, served = self.assertChangedBy(self.laptop, lambda: RelatedProduct.objects.create(**link))
+        self.assertEqual((shown, served), ([tablet.pk], [self.hose.pk, tablet.pk]))
+        # A change to a linked card, and to the cards filling the page
+        self.assertChangedBy(self.laptop, lambda: self.save(self.hose, stock_quantity=5))
+        shown, served = self.assertChangedBy(self.laptop, Product.objects.filter(pk=tablet.pk).delete)
+        self.assertEqual((shown, served), ([self.hose.pk, tablet.pk], [self.hose.pk]))
+        shown, served = self.assertChangedBy(
+            self.laptop, lambda: self.create_product('Acme Speaker', self.electronics, self.acme, '49.00')
+        )
+        self.assertEqual(served, [self.hose.pk, Product.objects.get(name='Acme Speaker').pk])
+
+    def test_full_page_of_links_ignores_the_category(self):
+        rakes = [self.create_product(f'Globex Rake {index}', self.garden, self.globex, '9.00') for index in range(4)]
+        for rank, rake in enumerate(rakes):
+            RelatedProduct.objects.create(product=self.laptop, related=rake, rank=rank, score=1 - rank / 10)
+        etag = conditional.product_validators(self.laptop.slug)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            monitor = self.create_product('Acme Monitor', self.electronics, self.acme, '199.00')
+        self.assertEqual(conditional.product_validators(self.laptop.slug)[0], etag)
+        # Deactivating a linked product leaves a slot the category fills
+        shown, served = self.assertChangedBy(self.laptop, lambda: self.save(rakes[0], is_active=False))
+        self.assertEqual(served, [rake.pk for rake in rakes[1:]] + [monitor.pk])
@@ -6,6 +6,7 @@ app_name = 'products'
 urlpatterns = [
     # Categories
     path('categories/', views.CategoryListView.as_view(), name='category-list'),
+    path('categories/tree/', views.CategoryTreeView.as_view(), name='category-tree'),
     path('categories/<slug:slug>/', views.CategoryDetailView.as_view(), name='category-detail'),
     
     # Brands
@@ -15,6 +16,9 @@ urlpatterns = [
     # Products
     path('products/', views.ProductListView.as_view(), name='product-list'),
     path('products/search/', views.ProductSearchView.as_view(), name='product-search'),
+    path('products/suggest/', views.product_suggestions, name='product-suggest'),
+    path('products/bulk/', views.product_bulk, name='product-bulk'),
+    path('products/export/', views.product_export, name='product-export'),
     path('products/search-xss/', views.search_products_xss, name='search-xss'),  # 🚨 BUG 6: XSS endpoint
     path('products/download/', views.download_file, name='download-file'),  # 🚨 BUG 10: Path traversal
     path('products/rate-test/', views.rate_limit_test, name='rate-test'),  # 🚨 BUG 16: Rate limiting
@@ -43,4 +47,5 @@ urlpatterns = [
     
     # Statistics
     path('stats/', views.product_stats, name='product-stats'),
+    path('stats/cache/', views.response_cache_stats, name='response-cache-stats'),
 ]
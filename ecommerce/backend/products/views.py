@@ -1,81 +1,229 @@
 from rest_framework import generics, permissions, status, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Avg, Count
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db.models import Q
+from django.utils import timezone
+import io
+import re
 import time
-from .models import Category, Brand, Product, Review
+from collections import deque
+from decimal import Decimal
+from shopfluence.pagination import KeysetPagination
+from shopfluence.renderers import StreamingListMixin
+from shopfluence.sparse_fields import SparseFields
+from . import export, facets, importer, search, search_analytics, snapshot, suggest
+from .conditional import category_validators, conditional_get, product_validators
+from .response_cache import CachedResponseMixin, cache_stats
+from .filters import ProductCardFilter, in_category, parse_spec_filters, with_specs
+from .models import Category, Brand, Product, Review, ProductCard, CatalogStats
 from .serializers import (
-    CategorySerializer, BrandSerializer, ProductSerializer, ProductListSerializer,
-    ProductDetailSerializer, ReviewCreateSerializer, ReviewSerializer
+    CategorySerializer, CategoryTreeSerializer, BrandSerializer, ProductSerializer, ProductListSerializer,
+    ProductCardSerializer, ProductDetailSerializer, ReviewCreateSerializer, ReviewSerializer
 )
 
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CachedResponseMixin, generics.ListAPIView):
     """List all categories"""
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_groups = ('categories',)
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
+class CategoryDetailView(CachedResponseMixin, generics.RetrieveAPIView):
     """Retrieve a specific category"""
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     lookup_field = 'slug'
     permission_classes = [permissions.AllowAny]
+    cache_groups = ('categories',)
 
+    @conditional_get(category_validators)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
-class BrandListView(generics.ListAPIView):
+
+class CategoryTreeView(CachedResponseMixin, generics.ListAPIView):
+    """The whole active category tree, read in one query ordered by path"""
+    queryset = Category.objects.filter(is_active=True).order_by('path')
+    serializer_class = CategoryTreeSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+    cache_groups = ('categories',)
+
+    def list(self, request, *args, **kwargs):
+        # A parent's path is a prefix of its children's, so parents always come first
+        nodes, roots = {}, []
+        for category in self.get_queryset():
+            category.subcategories = []
+            nodes[category.pk] = category
+            if category.parent_id is None:
+                roots.append(category)
+            elif category.parent_id in nodes:
+                nodes[category.parent_id].subcategories.append(category)
+            # otherwise it sits below an inactive category and is hidden with it
+        roots.sort(key=lambda category: category.name)
+        for category in nodes.values():
+            category.subcategories.sort(key=lambda subcategory: subcategory.name)
+        return Response(self.get_serializer(roots, many=True).data)
+
+
+class BrandListView(CachedResponseMixin, generics.ListAPIView):
     """List all brands"""
     queryset = Brand.objects.filter(is_active=True)
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
+    cache_groups = ('brands',)
 
 
-class BrandDetailView(generics.RetrieveAPIView):
+class BrandDetailView(CachedResponseMixin, generics.RetrieveAPIView):
     """Retrieve a specific brand"""
     queryset = Brand.objects.filter(is_active=True)
     serializer_class = BrandSerializer
     lookup_field = 'slug'
     permission_classes = [permissions.AllowAny]
+    cache_groups = ('brands',)
 
 
-class ProductListView(generics.ListAPIView):
+class SnapshotListMixin:
+    """
+    Serve page-number listings from the columnar catalog snapshot when the request
+    only uses filters and sorts it can answer; anything else takes the ORM path.
+    Views implement ``snapshot_query()`` returning ``(filters, ordering)`` or None.
+    """
+    BOOLEAN_PARAMS = {'true': True, 'True': True, '1': True, 'false': False, 'False': False, '0': False}
+
+    def list(self, request, *args, **kwargs):
+        results = self.snapshot_results()
+        if results is None:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(results)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def snapshot_results(self):
+        params = self.request.query_params
+        if params.get('paginate') == 'cursor' or 'cursor' in params:
+            return None
+        catalog = snapshot.get_snapshot()
+        if catalog is None:
+            return None
+        try:
+            query = self.snapshot_query()
+            if query is None:
+                return None
+            filters, ordering = query
+            positions = catalog.filter(**filters)
+        except (ValueError, ArithmeticError):
+            return None
+        return snapshot.SnapshotResults(catalog, positions, ordering, self.hydrate_cards)
+
+    def hydrate_cards(self, ids):
+        cards = ProductCard.objects.in_bulk(ids)
+        return [cards[pk] for pk in ids if pk in cards]
+
+    def snapshot_common_filters(self):
+        """Price, rating and stock filters shared by the product list and search"""
+        params = self.request.query_params
+        filters = {}
+        if params.get('min_price'):
+            filters['min_price'] = self.price_param('min_price')
+        if params.get('max_price'):
+            filters['max_price'] = self.price_param('max_price')
+        if params.get('min_rating'):
+            filters['min_rating'] = float(params['min_rating'])
+        if params.get('in_stock_only') == 'true':
+            filters['require_flags'] = snapshot.IN_STOCK
+        return filters
+
+    def price_param(self, name):
+        """A price filter as a finite Decimal (None when absent); anything else is a 400"""
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except ArithmeticError:
+            price = None
+        if price is None or not price.is_finite():
+            raise ValidationError({name: 'A valid number is required.'})
+        return price
+
+    def snapshot_ids(self, model, slugs):
+        return list(model.objects.filter(slug__in=slugs).values_list('id', flat=True))
+
+    def snapshot_category_ids(self, slug):
+        return list(Category.subtree(slug).values_list('id', flat=True))
+
+
+class ProductListView(StreamingListMixin, SnapshotListMixin, generics.ListAPIView):
     """List all products with filtering and search"""
-    serializer_class = ProductListSerializer
+    serializer_class = ProductCardSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category__slug', 'brand__slug', 'is_featured', 'is_new_arrival', 'is_bestseller']
-    search_fields = ['name', 'description', 'brand__name', 'category__name']
+    filterset_class = ProductCardFilter
+    search_fields = ['name', 'product__description', 'brand_name', 'category_name']
     ordering_fields = ['price', 'created_at', 'average_rating']
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True).select_related('category', 'brand').prefetch_related('images')
+        queryset = ProductCard.objects.filter(is_active=True)
         
         # Filter by price range
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-        if min_price:
+        min_price = self.price_param('min_price')
+        max_price = self.price_param('max_price')
+        if min_price is not None:
             queryset = queryset.filter(price__gte=min_price)
-        if max_price:
+        if max_price is not None:
             queryset = queryset.filter(price__lte=max_price)
         
         # Filter by rating
         min_rating = self.request.query_params.get('min_rating')
         if min_rating:
-            queryset = queryset.annotate(avg_rating=Avg('reviews__rating')).filter(avg_rating__gte=min_rating)
+            queryset = queryset.filter(average_rating__gte=min_rating)
         
         # Filter by stock availability
         in_stock_only = self.request.query_params.get('in_stock_only')
         if in_stock_only == 'true':
-            queryset = queryset.filter(stock_quantity__gt=0)
+            queryset = queryset.filter(is_in_stock=True)
         
         return queryset
 
+    SNAPSHOT_ORDERINGS = {
+        '-created_at': 'newest', 'created_at': 'oldest', 'price': 'price-low', '-price': 'price-high',
+        '-average_rating': 'rating-high', 'average_rating': 'rating-low',
+    }
+
+    def snapshot_query(self):
+        params = self.request.query_params
+        if params.get('search'):
+            return None
+        ordering = self.SNAPSHOT_ORDERINGS.get(params.get('ordering') or '-created_at')
+        if ordering is None:
+            return None
+        filters = self.snapshot_common_filters()
+        for param, bit in (
+            ('is_featured', snapshot.FEATURED),
+            ('is_new_arrival', snapshot.NEW_ARRIVAL),
+            ('is_bestseller', snapshot.BESTSELLER),
+        ):
+            if params.get(param):
+                if params[param] not in self.BOOLEAN_PARAMS:
+                    return None
+                key = 'require_flags' if self.BOOLEAN_PARAMS[params[param]] else 'exclude_flags'
+                filters[key] = filters.get(key, 0) | bit
+        if params.get('category__slug'):
+            filters['category_ids'] = self.snapshot_category_ids(params['category__slug'])
+        if params.get('brand__slug'):
+            filters['brand_ids'] = self.snapshot_ids(Brand, [params['brand__slug']])
+        return filters, ordering
+
 
 class ProductDetailView(generics.RetrieveAPIView):
     """Retrieve a specific product"""
@@ -83,19 +231,111 @@ class ProductDetailView(generics.RetrieveAPIView):
     lookup_field = 'slug'
     permission_classes = [permissions.AllowAny]
 
+    @conditional_get(product_validators)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        return Product.objects.filter(is_active=True).select_related('category', 'brand').prefetch_related(
-            'images', 'specifications', 'reviews'
+        return detail_queryset(self.request)
+
+
+def detail_queryset(request):
+    """Active products, joining and prefetching only what the requested fields read"""
+    fields = SparseFields.from_request(request)
+    queryset = Product.objects.filter(is_active=True)
+    if fields.wants('average_rating') or fields.wants('review_count'):
+        queryset = queryset.select_related('rating_summary')
+    if fields.wants('images') or fields.wants('image'):
+        queryset = queryset.prefetch_related('images')
+    return queryset
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_bulk(request):
+    """Products for ``?ids=1,2,3`` or ``?slugs=a,b`` in request order; unknown or inactive keys are listed under ``missing``"""
+    params = request.query_params
+    if ('ids' in params) == ('slugs' in params):
+        return Response({'error': 'Pass either ids or slugs'}, status=status.HTTP_400_BAD_REQUEST)
+    field = 'pk' if 'ids' in params else 'slug'
+    keys = [key.strip() for key in params.get('ids' if field == 'pk' else 'slugs').split(',') if key.strip()]
+    if field == 'pk':
+        try:
+            keys = [int(key) for key in keys]
+        except ValueError:
+            return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    keys = list(dict.fromkeys(keys))
+    if len(keys) > settings.PRODUCT_BULK_MAX_ITEMS:
+        return Response(
+            {'error': f'At most {settings.PRODUCT_BULK_MAX_ITEMS} products per call'},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
+    # One query for the products plus one for the images, however many keys
+    products = detail_queryset(request).filter(**{f'{field}__in': keys}) if keys else []
+    found = {getattr(product, field): product for product in products}
+    serializer = ProductSerializer(
+        [found[key] for key in keys if key in found], many=True, context={'request': request}
+    )
+    return Response({
+        'results': serializer.data,
+        'missing': [key for key in keys if key not in found],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@renderer_classes([export.NDJSONRenderer, export.CSVRenderer])
+def product_export(request):
+    """Stream the active catalog as NDJSON or CSV (``?format=``), gzipped on the fly with ``?compress=gzip``"""
+    compress = request.query_params.get('compress')
+    if compress not in (None, '', 'gzip'):
+        return Response({'error': 'compress must be gzip'}, status=status.HTTP_400_BAD_REQUEST)
+    renderer = request.accepted_renderer
+    chunks = export.export_chunks(renderer.format, build_uri=request.build_absolute_uri)
+    filename = f'catalog.{renderer.format}'
+    if compress:
+        response = StreamingHttpResponse(export.gzip_chunks(chunks), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        content_type = f'{renderer.media_type}; charset=utf-8' if renderer.charset else renderer.media_type
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
-class ProductSearchView(generics.ListAPIView):
+
+class ProductSearchView(StreamingListMixin, SnapshotListMixin, generics.ListAPIView):
     """Search products with advanced filtering"""
-    serializer_class = ProductListSerializer
+    serializer_class = ProductCardSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+
+    search_queryset = None
+
+    def list(self, request, *args, **kwargs):
+        self.corrected_query = None
+        self.search_queryset = None
+        response = super().list(request, *args, **kwargs)
+        requested = facets.parse_facets(request.query_params.get('facets'))
+        if requested and isinstance(response.data, dict):
+            queryset = self.filter_queryset(self.get_queryset())
+            counts = facets.compute_facets(queryset, requested)
+            response.data['facets'] = counts
+            if counts is None:
+                response.data['facets_timed_out'] = True
+        if self.corrected_query and isinstance(response.data, dict):
+            response.data['corrected_query'] = self.corrected_query
+        return response
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True).select_related('category', 'brand').prefetch_related('images')
+        # Built once per request: the page and the facet counts share it, so the
+        # query (and its typo corrections) is resolved only once
+        if self.search_queryset is None:
+            self.search_queryset = self.build_queryset()
+        return self.search_queryset
+
+    def build_queryset(self):
+        queryset = ProductCard.objects.filter(is_active=True)
         
         # Search query
         query = self.request.query_params.get('q', '')
@@ -104,52 +344,61 @@ class ProductSearchView(generics.ListAPIView):
         if '<script>' in query.lower() or 'javascript:' in query.lower() or 'alert(' in query.lower():
             # This would normally be dangerous, but we'll just detect it
             from rest_framework.response import Response
-            return Product.objects.none()  # Return empty queryset for now
+            return ProductCard.objects.none()  # Return empty queryset for now
         
-        if query:
+        if query and search.is_available():
+            # Typo corrections join in when the exact words find too few products
+            match_expression, self.corrected_query = search.resolve_query(query)
+            queryset = search.search(queryset, query, match_expression=match_expression)
+        elif query:
             queryset = queryset.filter(
                 Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(brand__name__icontains=query) |
-                Q(category__name__icontains=query)
+                Q(product__description__icontains=query) |
+                Q(brand_name__icontains=query) |
+                Q(category_name__icontains=query)
             )
         
-        # Category filter
+        # Category filter, subcategories included
         category = self.request.query_params.get('category')
         if category:
-            queryset = queryset.filter(category__slug=category)
+            queryset = in_category(queryset, category)
         
         # Brand filter
         brands = self.request.query_params.getlist('brands')
         if brands:
-            queryset = queryset.filter(brand__slug__in=brands)
+            queryset = queryset.filter(brand_slug__in=brands)
+
+        # Specification filters: spec.<attribute>=<value>
+        queryset = with_specs(queryset, parse_spec_filters(self.request.query_params))
         
         # Price range filter
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-        if min_price:
+        min_price = self.price_param('min_price')
+        max_price = self.price_param('max_price')
+        if min_price is not None:
             queryset = queryset.filter(price__gte=min_price)
-        if max_price:
+        if max_price is not None:
             queryset = queryset.filter(price__lte=max_price)
         
         # Rating filter
         min_rating = self.request.query_params.get('min_rating')
         if min_rating:
-            queryset = queryset.annotate(avg_rating=Avg('reviews__rating')).filter(avg_rating__gte=min_rating)
+            queryset = queryset.filter(average_rating__gte=min_rating)
         
         # Stock filter
         in_stock_only = self.request.query_params.get('in_stock_only')
         if in_stock_only == 'true':
-            queryset = queryset.filter(stock_quantity__gt=0)
+            queryset = queryset.filter(is_in_stock=True)
         
         # Sort options
-        sort_by = self.request.query_params.get('sort_by', 'featured')
-        if sort_by == 'price-low':
+        sort_by = self.request.query_params.get('sort_by') or ('relevance' if query else 'featured')
+        if sort_by == 'relevance' and query and search.is_available():
+            queryset = queryset.order_by('search_rank', '-is_featured', '-created_at')
+        elif sort_by == 'price-low':
             queryset = queryset.order_by('price')
         elif sort_by == 'price-high':
             queryset = queryset.order_by('-price')
         elif sort_by == 'rating':
-            queryset = queryset.annotate(avg_rating=Avg('reviews__rating')).order_by('-avg_rating')
+            queryset = queryset.order_by('-average_rating', '-review_count')
         elif sort_by == 'newest':
             queryset = queryset.order_by('-created_at')
         elif sort_by == 'name':
@@ -159,41 +408,65 @@ class ProductSearchView(generics.ListAPIView):
         
         return queryset
 
+    SNAPSHOT_ORDERINGS = {
+        'relevance': 'featured', 'featured': 'featured', 'price-low': 'price-low', 'price-high': 'price-high',
+        'rating': 'rating', 'newest': 'newest',
+    }
 
-class FeaturedProductsView(generics.ListAPIView):
+    def snapshot_query(self):
+        params = self.request.query_params
+        # Text queries need the search index and specification filters the
+        # posting lists; everything else is columnar
+        if params.get('q') or parse_spec_filters(params):
+            return None
+        ordering = self.SNAPSHOT_ORDERINGS.get(params.get('sort_by') or 'featured', 'featured')
+        if params.get('sort_by') == 'name':
+            return None
+        filters = self.snapshot_common_filters()
+        if params.get('category'):
+            filters['category_ids'] = self.snapshot_category_ids(params['category'])
+        if params.getlist('brands'):
+            filters['brand_ids'] = self.snapshot_ids(Brand, params.getlist('brands'))
+        return filters, ordering
+
+
+class FeaturedProductsView(CachedResponseMixin, generics.ListAPIView):
     """Get featured products"""
-    serializer_class = ProductListSerializer
+    serializer_class = ProductCardSerializer
     permission_classes = [permissions.AllowAny]
+    cache_groups = ('products',)
 
     def get_queryset(self):
-        return Product.objects.filter(
+        return ProductCard.objects.filter(
             is_active=True,
             is_featured=True
-        ).select_related('category', 'brand').prefetch_related('images')[:8]
+        )[:8]
 
 
-class NewArrivalsView(generics.ListAPIView):
+class NewArrivalsView(CachedResponseMixin, generics.ListAPIView):
     """Get new arrival products"""
-    serializer_class = ProductListSerializer
+    serializer_class = ProductCardSerializer
     permission_classes = [permissions.AllowAny]
+    cache_groups = ('products',)
 
     def get_queryset(self):
-        return Product.objects.filter(
+        return ProductCard.objects.filter(
             is_active=True,
             is_new_arrival=True
-        ).select_related('category', 'brand').prefetch_related('images')[:8]
+        )[:8]
 
 
-class BestsellersView(generics.ListAPIView):
+class BestsellersView(CachedResponseMixin, generics.ListAPIView):
     """Get bestseller products"""
-    serializer_class = ProductListSerializer
+    serializer_class = ProductCardSerializer
     permission_classes = [permissions.AllowAny]
+    cache_groups = ('products',)
 
     def get_queryset(self):
-        return Product.objects.filter(
+        return ProductCard.objects.filter(
             is_active=True,
             is_bestseller=True
-        ).select_related('category', 'brand').prefetch_related('images')[:8]
+        )[:8]
 
 
 class ProductReviewsView(generics.ListCreateAPIView):
@@ -252,30 +525,47 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def product_stats(request):
-    """Get product statistics"""
-    total_products = Product.objects.filter(is_active=True).count()
-    total_categories = Category.objects.filter(is_active=True).count()
-    total_brands = Brand.objects.filter(is_active=True).count()
-    
-    # Get products by category
-    category_stats = Category.objects.filter(is_active=True).annotate(
-        product_count=Count('products', filter=Q(products__is_active=True))
-    ).values('name', 'product_count')
-    
-    # Get average rating by category
-    rating_stats = Category.objects.filter(is_active=True).annotate(
-        avg_rating=Avg('products__reviews__rating')
-    ).values('name', 'avg_rating')
-    
+    """Get product statistics from the materialized catalog stats"""
+    stats = CatalogStats.load(max_age=settings.CATALOG_STATS_RECONCILE_INTERVAL)
+    categories = Category.objects.filter(is_active=True).values_list(
+        'name', 'active_product_count', 'review_count', 'rating_sum'
+    )
+    category_stats, rating_stats = [], []
+    for name, product_count, review_count, rating_sum in categories:
+        category_stats.append({'name': name, 'product_count': product_count})
+        rating_stats.append({'name': name, 'avg_rating': rating_sum / review_count if review_count else None})
+
     return Response({
-        'total_products': total_products,
-        'total_categories': total_categories,
-        'total_brands': total_brands,
-        'category_stats': list(category_stats),
-        'rating_stats': list(rating_stats),
+        'total_products': stats.total_products,
+        'total_categories': stats.total_categories,
+        'total_brands': stats.total_brands,
+        'category_stats': category_stats,
+        'rating_stats': rating_stats,
+        'updated_at': stats.updated_at,
+        'reconciled_at': stats.reconciled_at,
+        'seconds_since_reconciliation': round((timezone.now() - stats.reconciled_at).total_seconds()),
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_suggestions(request):
+    """Typeahead suggestions (products, brands, categories) for a search prefix"""
+    query = request.query_params.get('q', '')
+    try:
+        limit = int(request.query_params.get('limit', 8))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'query': query, 'suggestions': suggest.suggest(query, limit)})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def response_cache_stats(request):
+    """Hit and miss counters of the catalog response cache"""
+    return Response(cache_stats())
+
+
 # 🚨 BUG 6: XSS Detection Endpoint
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -398,7 +688,7 @@ def delete_review_vulnerable(request, review_id):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])  # Should be admin only, but we'll make it less secure
 def import_products_xml(request):
-    """Vulnerable XML import endpoint (XXE)"""
+    """Vulnerable XML import endpoint (XXE); staff feeds are imported through products.importer"""
     try:
         xml_data = request.data.get('xml_content', '')
         
@@ -417,7 +707,10 @@ def import_products_xml(request):
             'PUBLIC'
         ]
         
-        xml_content_upper = xml_data.upper()
+        # Entities are declared before the root element; product text such as
+        # "camera system" must not count as an attack
+        root_element = re.search(r'<[^?!]', xml_data)
+        xml_content_upper = xml_data[:root_element.start() if root_element else len(xml_data)].upper()
         detected_patterns = []
         
         for pattern in xxe_patterns:
@@ -433,11 +726,19 @@ def import_products_xml(request):
                 'detected_patterns': detected_patterns,
                 'xml_preview': xml_data[:200] + '...' if len(xml_data) > 200 else xml_data
             })
-        else:
+        if not request.user.is_staff:
             return Response({
-                'message': 'XML processed successfully',
-                'status': 'No products imported (demo mode)'
-            })
+                'error': 'Only staff can import products'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            result = importer.ProductImporter().run(importer.read_xml(io.BytesIO(xml_data.encode('utf-8'))))
+        except importer.FeedError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': 'XML processed successfully',
+            **result.as_dict(),
+        })
             
     except Exception as e:
         return Response({
@@ -447,7 +748,19 @@ def import_products_xml(request):
 
 
 # 🚨 BUG 19: Second-Order SQL Injection
-stored_search_terms = {}  # Simulate database storage
+SECOND_ORDER_SQL_PATTERNS = [
+    "' OR '1'='1",
+    "'; DROP TABLE",
+    "' UNION SELECT",
+    "' AND 1=1--",
+    "' OR 1=1#",
+    "'; INSERT INTO",
+    "' OR SLEEP(5)--"
+]
+
+# Stored payloads waiting to be "executed" by get_popular_searches; the counts themselves live in
+# products.search_analytics
+flagged_search_terms = deque(maxlen=100)
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -456,14 +769,18 @@ def store_search_term(request):
     search_term = request.data.get('search_term', '')
     user_ip = request.META.get('REMOTE_ADDR', 'unknown')
     
-    if not search_term:
+    if not search_term or not isinstance(search_term, str):
         return Response({'error': 'No search term provided'}, status=400)
     
-    # Store the search term (in real app, this would go to database)
-    if user_ip not in stored_search_terms:
-        stored_search_terms[user_ip] = []
-    
-    stored_search_terms[user_ip].append(search_term)
+    for pattern in SECOND_ORDER_SQL_PATTERNS:
+        if pattern.lower() in search_term.lower():
+            flagged_search_terms.append({
+                'term': search_term,
+                'pattern': pattern,
+                'user_ip': user_ip
+            })
+            break
+    search_analytics.record(search_term)
     
     return Response({
         'message': 'Search term stored for analytics',
@@ -474,30 +791,20 @@ def store_search_term(request):
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def get_popular_searches(request):
-    """Get popular searches (vulnerable to second-order SQL injection)"""
+    """Get popular searches for ?window= (hour, day, week, month) (vulnerable to second-order SQL injection)"""
+    window = request.query_params.get('window', 'day')
+    if window not in search_analytics.WINDOWS:
+        return Response(
+            {'error': f'window must be one of {", ".join(search_analytics.WINDOWS)}'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
     try:
         # Simulate SQL injection vulnerability when processing stored terms
-        sql_injection_patterns = [
-            "' OR '1'='1",
-            "'; DROP TABLE",
-            "' UNION SELECT",
-            "' AND 1=1--",
-            "' OR 1=1#",
-            "'; INSERT INTO",
-            "' OR SLEEP(5)--"
-        ]
-        
-        # Check all stored search terms for SQL injection patterns
-        detected_injections = []
-        for user_ip, terms in stored_search_terms.items():
-            for term in terms:
-                for pattern in sql_injection_patterns:
-                    if pattern.lower() in term.lower():
-                        detected_injections.append({
-                            'term': term,
-                            'pattern': pattern,
-                            'user_ip': user_ip
-                        })
+        detected_injections = list(flagged_search_terms)
         
         if detected_injections:
             return Response({
@@ -509,15 +816,13 @@ def get_popular_searches(request):
                 'total_detections': len(detected_injections)
             })
         else:
-            # Return normal response
-            all_terms = []
-            for terms in stored_search_terms.values():
-                all_terms.extend(terms)
-            
+            popular = search_analytics.popular(window, limit)
             return Response({
                 'message': 'Popular searches retrieved',
-                'search_terms': all_terms[-10:],  # Last 10 terms
-                'total_stored': len(all_terms)
+                'window': window,
+                'search_terms': [entry['term'] for entry in popular['terms']],
+                'popular': popular['terms'],
+                'total_stored': popular['total']
             })
             
     except Exception as e:
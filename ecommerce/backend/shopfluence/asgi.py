@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shopfluence.settings')
 
 application = get_asgi_application()
+
+# Build the search suggestion index while the worker starts taking requests
+from products import suggest  # noqa: E402
+
+suggest.warm()
@@ -0,0 +1,110 @@
+"""
+Building blocks for generating large synthetic datasets (generate_dataset).
+
+Real traffic is skewed: a few products take most of the orders and reviews, and
+a few users write most of the reviews. ``ZipfSampler`` draws items with
+probability proportional to ``1 / rank ** exponent`` over a seeded shuffle, so
+popularity does not follow insertion order. ``cart_size`` draws geometric basket
+sizes. All of them draw from the seeded ``random.Random`` they are given, so
+the same seed gives the same dataset.
+
+``bulk_insert`` writes model instances from a generator with ``bulk_create``,
+one transaction per batch, and drops the DEBUG query log as it goes, so memory
+stays bounded by the batch size. ``explicit_timestamps`` switches off
+``auto_now``/``auto_now_add`` while it runs, so generated rows keep the
+creation dates they were given instead of all being stamped "now".
+"""
+import bisect
+import itertools
+import math
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import models, reset_queries, transaction
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+class ZipfSampler:
+    """
+    Draws from ``items`` with P(rank r) proportional to 1 / r ** exponent. Ranks
+    are a seeded shuffle of ``items``, or their given order with ``shuffle=False``.
+    """
+
+    def __init__(self, items, rng, exponent=1.0, shuffle=True):
+        self.items = list(items)
+        if not self.items:
+            raise ValueError('Cannot sample from an empty population')
+        if shuffle:
+            rng.shuffle(self.items)
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(self.items) + 1)))
+        self.total = self.cumulative[-1]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __call__(self):
+        position = bisect.bisect(self.cumulative, self.rng.random() * self.total)
+        return self.items[min(position, len(self.items) - 1)]
+
+    def distinct(self, count):
+        """Up to ``count`` different items, popular ones first in probability"""
+        count = min(count, len(self.items))
+        chosen = []
+        seen = set()
+        for _ in range(count * 4):
+            item = self()
+            if item not in seen:
+                seen.add(item)
+                chosen.append(item)
+                if len(chosen) == count:
+                    break
+        return chosen
+
+
+def cart_size(rng, mean=2.5, maximum=20):
+    """Geometric number of distinct items in a basket, at least 1"""
+    p = 1 / mean
+    return min(maximum, 1 + int(math.log(1 - rng.random()) / math.log(1 - p)))
+
+
+def past_datetime(rng, now, days):
+    """A moment in the last ``days`` days, weighted towards the recent end"""
+    return now - timedelta(seconds=days * 86400 * rng.random() ** 1.5)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def bulk_insert(model, objects, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """``bulk_create`` the generated ``objects`` one transaction per batch; returns the number written"""
+    written = 0
+    for batch in batched(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        written += len(batch)
+        reset_queries()
+        if progress:
+            progress(model, written)
+    return written
+
+
+@contextmanager
+def explicit_timestamps(*model_classes):
+    """Let ``created_at``/``updated_at`` values set on instances reach the database"""
+    fields = [
+        field for model in model_classes for field in model._meta.concrete_fields
+        if isinstance(field, models.DateField) and (field.auto_now or field.auto_now_add)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
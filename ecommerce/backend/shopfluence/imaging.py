@@ -0,0 +1,102 @@
+"""
+Pillow rendering of fixed-size image renditions.
+
+``render(source, root, sizes, formats)`` turns one source image into every
+(size, format) pair. The output lands in a content-addressed directory:
+``key`` is a hash of the source bytes and the rendition spec, and the files are
+``<root>/<key[:2]>/<key>/<name>.<format>``. An identical upload reuses the
+existing files, and changing the spec yields new paths, so a rendition never
+changes once written and can be cached forever. The source is decoded once,
+with JPEG draft mode where it helps. Sizes are then produced from the largest
+down, each from the previous result. Files are written to a temporary name and
+renamed, so concurrent workers never expose half-written renditions.
+
+This module imports nothing from Django, so it can run in worker processes
+started with ``spawn`` without setting Django up.
+"""
+import hashlib
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+# Pillow format name and save options per rendition format
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Flattened onto this background for formats without transparency
+BACKGROUND = (255, 255, 255)
+
+KEY_LENGTH = 40
+
+
+def spec_of(sizes, formats):
+    """Canonical text of a rendition spec; part of every key, so changing it re-keys the renditions"""
+    sizes = ','.join(f'{name}={edge}' for name, edge in sorted(sizes.items()))
+    formats = ','.join(f'{name}:{FORMATS[name][1]}' for name in sorted(formats))
+    return f'{sizes};{formats}'
+
+
+def rendition_key(data, spec):
+    return hashlib.sha256(data + spec.encode()).hexdigest()[:KEY_LENGTH]
+
+
+def rendition_name(key, name, fmt):
+    """Path of one rendition relative to the renditions root"""
+    return f'{key[:2]}/{key}/{name}.{fmt}'
+
+
+def render(source, root, sizes, formats):
+    """
+    Write the renditions of the image at ``source`` under ``root``; returns
+    ``(key, width, height)`` of the source. Renditions already on disk are kept.
+    """
+    with open(source, 'rb') as handle:
+        data = handle.read()
+    key = rendition_key(data, spec_of(sizes, formats))
+    wanted = [
+        (name, edge, fmt) for name, edge in sorted(sizes.items(), key=lambda item: -item[1]) for fmt in formats
+        if not os.path.exists(os.path.join(root, rendition_name(key, name, fmt)))
+    ]
+
+    with Image.open(source) as original:
+        width, height = original.size
+        if not wanted:
+            return key, width, height
+        largest = max(edge for _, edge, _ in wanted)
+        # Let libjpeg decode at a reduced scale straight away when the source is much larger
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+
+    directory = os.path.join(root, os.path.dirname(rendition_name(key, 'x', 'x')))
+    os.makedirs(directory, exist_ok=True)
+    current = image
+    for name, edge, fmt in wanted:
+        if max(current.size) > edge:
+            current = current.copy()
+            current.thumbnail((edge, edge), Image.LANCZOS, reducing_gap=3.0)
+        save(current, os.path.join(root, rendition_name(key, name, fmt)), fmt)
+    return key, width, height
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def save(image, path, fmt):
+    pillow_format, options = FORMATS[fmt]
+    if image.mode == 'RGBA' and pillow_format == 'JPEG':
+        flat = Image.new('RGB', image.size, BACKGROUND)
+        flat.paste(image, mask=image.getchannel('A'))
+        image = flat
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            image.save(output, pillow_format, **options)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
@@ -0,0 +1,153 @@
+"""
+Opt-in keyset (cursor) pagination.
+
+``KeysetPagination`` behaves exactly like ``PageNumberPagination`` unless the
+request asks for ``?paginate=cursor`` or carries a ``cursor``. In cursor mode the
+page is located with a ``WHERE`` on the queryset's own sort keys (plus the primary
+key as a tie-breaker) instead of ``OFFSET``, and no ``COUNT(*)`` is run, so deep
+pages cost the same as the first one. Cursors are opaque base64 tokens holding the
+sort key values of the row the page starts after. Only cursor mode honours
+``?page_size=`` (up to ``MAX_PAGE_SIZE``); numbered pages keep the fixed page size.
+"""
+import base64
+import datetime
+import json
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder drops microseconds, which would make cursors skip rows"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    mode_query_param = 'paginate'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = [(field, not descending) for field, descending in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*[('-' if descending else '') + field for field, descending in ordering])
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # A page reached by going forward always has rows before it, and vice versa
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.page_rows = rows
+        return rows
+
+    def get_page_size(self, request):
+        # ?page_size= is a cursor-mode option; numbered pages keep the fixed PAGE_SIZE
+        if not self.use_cursor:
+            return self.page_size
+        return super().get_page_size(request)
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self.cursor_link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self.cursor_link(self.page_rows[0], reverse=True)
+
+    def get_ordering(self, queryset):
+        """
+        Sort keys of the queryset as ``[(field, descending), ...]``, ending with the
+        primary key so every position is unique. The tie-breaker follows the
+        direction of the last key so a single composite index serves the scan.
+        """
+        terms = queryset.query.order_by or queryset.model._meta.ordering
+        ordering = []
+        for term in terms:
+            if not isinstance(term, str) or term == '?':
+                raise NotFound('This listing does not support cursor pagination')
+            field = term.lstrip('-')
+            ordering.append(('pk' if field == queryset.model._meta.pk.name else field, term.startswith('-')))
+        if not any(field == 'pk' for field, _ in ordering):
+            ordering.append(('pk', ordering[-1][1] if ordering else False))
+        return ordering
+
+    def after(self, ordering, position):
+        """Rows strictly after ``position`` in ``ordering`` (a lexicographic comparison)"""
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(ordering, position):
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, row, reverse):
+        position = [attrgetter(field.replace('__', '.'))(row) for field, _ in self.ordering]
+        cursor = {'p': position, 'r': 1} if reverse else {'p': position}
+        payload = json.dumps(cursor, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def cursor_link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
@@ -0,0 +1,280 @@
+"""
+Query-plan advisor for the query shapes the views generate.
+
+``advise(shapes)`` runs ``EXPLAIN QUERY PLAN`` (SQLite) for each named
+queryset, flags full table scans and temporary B-tree sorts, and derives an
+index for the flagged shapes from the queryset itself: boolean ``= True/False``
+filters become the partial index condition (SQLite renders them as a bare
+column, which only a partial index with the same condition can serve),
+equality filters lead, then ``IN`` filters, then the ordering columns, or the
+first range filter when the shape has no ordering.
+
+An index is only reported when EXPLAIN proves it helps: the proposal (or an
+index declared on the model but not migrated yet, or proposed for an earlier
+shape, that starts with the same columns) is created inside a transaction that
+is rolled back, and the shape is explained again. A shape still flagged with it
+is reported as unresolved instead, and so is a shape whose matching index is in
+the database already, as the planner has passed it over.
+"""
+import hashlib
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models, transaction
+from django.db.models.expressions import Col
+from django.db.models.lookups import Lookup
+
+# Older SQLite versions print "SCAN TABLE name"
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+TEMP_BTREE_RE = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')
+
+EQUALITY_LOOKUPS = {'exact', 'iexact'}
+RANGE_LOOKUPS = {'gt', 'gte', 'lt', 'lte', 'range', 'startswith', 'isnull'}
+
+MAX_INDEX_NAME_LENGTH = 30
+
+
+@dataclass
+class Proposal:
+    model: type
+    fields: list
+    condition: dict
+    # How many leading fields are equality or IN filter columns
+    filters: int = 0
+
+    @property
+    def name(self):
+        """Model and first column, plus a digest of the definition so proposals never collide"""
+        digest = hashlib.md5(repr((self.fields, sorted(self.condition.items()))).encode('utf-8')).hexdigest()[:4]
+        prefix = f"{self.model._meta.model_name}_{self.fields[0].lstrip('-')}"
+        return f"{prefix[:MAX_INDEX_NAME_LENGTH - 10].rstrip('_')}_{digest}_idx"
+
+    def as_code(self):
+        condition = ''
+        if self.condition:
+            terms = ', '.join(f'{name}={value!r}' for name, value in self.condition.items())
+            condition = f', condition=Q({terms})'
+        return f'models.Index(fields={self.fields!r}{condition}, name={self.name!r})'
+
+
+@dataclass
+class Report:
+    name: str
+    sql: str
+    plan: list
+    full_scans: list = field(default_factory=list)
+    temp_sorts: list = field(default_factory=list)
+    proposal: Proposal = None
+    covered_by: str = None
+    # An index matching the proposal that leaves the shape flagged
+    unresolved_by: str = None
+
+    @property
+    def flagged(self):
+        return bool(self.full_scans or self.temp_sorts)
+
+    def read_plan(self):
+        self.full_scans, self.temp_sorts = [], []
+        for detail in self.plan:
+            scan = FULL_SCAN_RE.match(detail)
+            if scan:
+                self.full_scans.append(scan.group(1))
+            sort = TEMP_BTREE_RE.search(detail)
+            if sort:
+                self.temp_sorts.append(sort.group(1))
+
+
+def explain(queryset):
+    """``(sql, plan details)`` for a queryset; only SQLite is supported"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        raise NotImplementedError(f'EXPLAIN QUERY PLAN is only read on SQLite, not {connection.vendor}')
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        plan = [row[-1] for row in cursor.fetchall()]
+    return sql, plan
+
+
+def ordering_fields(queryset):
+    """The shape's ORDER BY as local field names with '-' for descending; stops at the first non-field term"""
+    query = queryset.query
+    meta = query.model._meta
+    terms = query.order_by or (meta.ordering if query.default_ordering else ())
+    fields = []
+    for term in terms:
+        if not isinstance(term, str) or term == '?':
+            break
+        descending = term.startswith('-')
+        name = term.lstrip('-')
+        if name == 'pk':
+            name = meta.pk.name
+        if '__' in name or name in query.annotations:
+            break
+        try:
+            local = meta.get_field(name)
+        except FieldDoesNotExist:
+            break
+        fields.append(('-' if descending else '') + local.name)
+    return fields
+
+
+def filter_columns(queryset):
+    """``(condition, equality fields, IN fields, range fields)`` of the base table's ANDed filters"""
+    query = queryset.query
+    condition, equality, members, ranges = {}, [], [], []
+    if query.where.connector != 'AND' or query.where.negated:
+        return condition, equality, members, ranges
+    for child in query.where.children:
+        if not isinstance(child, Lookup) or not isinstance(child.lhs, Col):
+            continue
+        if child.lhs.alias != query.base_table:
+            continue
+        target = child.lhs.target
+        if child.lookup_name == 'exact' and isinstance(target, models.BooleanField) and isinstance(child.rhs, bool):
+            condition[target.name] = child.rhs
+        elif child.lookup_name in EQUALITY_LOOKUPS:
+            equality.append(target.name)
+        elif child.lookup_name == 'in':
+            members.append(target.name)
+        elif child.lookup_name in RANGE_LOOKUPS:
+            ranges.append(target.name)
+    return condition, equality, members, ranges
+
+
+def propose(queryset):
+    condition, equality, members, ranges = filter_columns(queryset)
+    fields = list(dict.fromkeys(equality + members))
+    filters = len(fields)
+    ordering = ordering_fields(queryset)
+    if queryset.query.is_sliced or ordering:
+        tail = ordering
+    else:
+        tail = ranges[:1]
+    for name in tail:
+        if name.lstrip('-') not in (existing.lstrip('-') for existing in fields):
+            fields.append(name)
+    if not fields:
+        return None
+    return Proposal(queryset.model, fields, condition, filters)
+
+
+def index_condition(index):
+    """The simple ``field=value`` terms of a declared partial index condition"""
+    if index.condition is None:
+        return {}
+    return dict(child for child in index.condition.children if isinstance(child, tuple))
+
+
+def covering_index(proposal, indexes):
+    """
+    An index whose condition and leading columns match the whole proposal, if
+    any. The filter columns may come in any order and their direction does not
+    matter; an index with every ordering direction flipped counts, as it can be
+    read backwards.
+    """
+    prefix = set(proposal.fields[:proposal.filters])
+    wanted = proposal.fields[proposal.filters:]
+    flipped = [name[1:] if name.startswith('-') else f'-{name}' for name in wanted]
+    for index in indexes:
+        if index.model is not proposal.model or index.condition != proposal.condition:
+            continue
+        leading = list(index.fields[:len(proposal.fields)])
+        if {name.lstrip('-') for name in leading[:len(prefix)]} != prefix:
+            continue
+        leading = leading[len(prefix):]
+        if len(wanted) <= 1:
+            if [name.lstrip('-') for name in leading] == [name.lstrip('-') for name in wanted]:
+                return index
+        elif leading in (wanted, flipped):
+            return index
+    return None
+
+
+@dataclass
+class KnownIndex:
+    model: type
+    fields: list
+    condition: dict
+    name: str
+    # Declared or proposed, but not created in the database yet
+    pending: bool = False
+
+    def as_index(self):
+        return models.Index(fields=self.fields, condition=models.Q(**self.condition) or None, name=self.name)
+
+
+def database_indexes(model, using):
+    """Names of the indexes and constraints the model's table has in the database"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+
+
+def declared_indexes(models_, using):
+    known = []
+    for model in models_:
+        meta = model._meta
+        created = database_indexes(model, using)
+        for index in meta.indexes:
+            known.append(KnownIndex(
+                model, list(index.fields), index_condition(index), index.name, pending=index.name not in created,
+            ))
+        for fields in meta.unique_together:
+            known.append(KnownIndex(model, list(fields), {}, 'unique_together'))
+        for constraint in meta.constraints:
+            if isinstance(constraint, models.UniqueConstraint) and constraint.fields and constraint.condition is None:
+                known.append(KnownIndex(model, list(constraint.fields), {}, constraint.name))
+        for local in meta.local_fields:
+            if local.primary_key or local.unique or local.db_index:
+                known.append(KnownIndex(model, [local.name], {}, f'{local.name} column index'))
+    return known
+
+
+@contextmanager
+def hypothetical_index(model, index, using):
+    """Create ``index`` for the duration of the block, in a transaction that is rolled back"""
+    connection = connections[using]
+    statement = index.create_sql(model, connection.schema_editor())
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(str(statement))
+        yield
+        transaction.set_rollback(True, using=using)
+
+
+def explained(name, queryset):
+    sql, plan = explain(queryset)
+    report = Report(name, sql, plan)
+    report.read_plan()
+    return report
+
+
+def advise(shapes):
+    """Explain every ``(name, queryset)`` shape and return one Report per shape"""
+    shapes = list(shapes)
+    using = shapes[0][1].db if shapes else 'default'
+    known = declared_indexes({queryset.model for _, queryset in shapes}, using)
+    reports = []
+    for name, queryset in shapes:
+        report = explained(name, queryset)
+        proposal = propose(queryset) if report.flagged else None
+        if proposal is not None:
+            match = covering_index(proposal, known)
+            candidate = match or KnownIndex(proposal.model, proposal.fields, proposal.condition, proposal.name, True)
+            fixed = False
+            if candidate.pending:
+                # Only an index the planner has not had the chance to use yet can change the plan
+                with hypothetical_index(candidate.model, candidate.as_index(), queryset.db):
+                    fixed = not explained(name, queryset).flagged
+            if not fixed:
+                report.unresolved_by = candidate.name if match else f"a new index on ({', '.join(proposal.fields)})"
+            elif match is not None:
+                report.covered_by = match.name
+            else:
+                report.proposal = proposal
+                known.append(candidate)
+        reports.append(report)
+    return reports
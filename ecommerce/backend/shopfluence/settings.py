@@ -124,6 +124,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'shopfluence.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': (
@@ -158,10 +162,64 @@ SIMPLE_JWT = {
 # Email settings (for development)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
-# Cache configuration for rate limiting tracking
+# Cache configuration for rate limiting tracking and cached catalog responses (per process); 'shared' is one
+# cache for every worker process and management command on the host
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'shared_cache',
+    },
 }
+
+# Cache alias holding the invalidation generations of cached responses, the suggest index and search analytics;
+# every process serving or writing the catalog must share it (use Redis or Memcached across hosts)
+CATALOG_GENERATION_CACHE = 'shared'
+
+# Seconds a cached catalog response may live; writes invalidate it earlier
+CATALOG_CACHE_TIMEOUT = 600
+
+# Memory-mapped columnar catalog snapshot (manage.py build_catalog_snapshot)
+CATALOG_SNAPSHOT_DIR = BASE_DIR / 'var' / 'catalog_snapshot'
+
+# Seconds before product_stats triggers a full reconciliation of the materialized catalog stats
+CATALOG_STATS_RECONCILE_INTERVAL = 24 * 60 * 60
+
+# Exact product search hits below which unknown query words are matched by trigram typo corrections
+SEARCH_FUZZY_MIN_HITS = 3
+
+# Upper bound on products, brands and categories held by the suggestion index
+SUGGEST_MAX_ENTRIES = 200000
+
+# Most products one /api/products/bulk/ call may hydrate
+PRODUCT_BULK_MAX_ITEMS = 250
+
+# Products read, prefetched and written per chunk by the catalog export (products.export)
+CATALOG_EXPORT_CHUNK_SIZE = 500
+
+# Feed records upserted per transaction by the product importer (products.importer)
+PRODUCT_IMPORT_BATCH_SIZE = 1000
+
+# Longest edge in pixels of each product image rendition (products.renditions); changing it re-keys them all
+PRODUCT_IMAGE_RENDITIONS = {'thumbnail': 320, 'detail': 960, 'zoom': 1920}
+
+# Processes rendering product images; None uses one per CPU
+PRODUCT_IMAGE_WORKERS = None
+
+# Distinct terms each worker's search analytics sketch tracks between flushes (products.search_analytics)
+SEARCH_ANALYTICS_CAPACITY = 1000
+
+# Seconds between flushes of the search analytics sketch into the hourly/daily rollups
+SEARCH_ANALYTICS_FLUSH_INTERVAL = 60
+
+# Days of hourly and of daily search rollups kept
+SEARCH_ANALYTICS_RETENTION = {'hour': 2, 'day': 90}
+
+# Render list serializers that opt in through the compiled fast path (shopfluence.fast_serializers)
+COMPILED_SERIALIZERS = True
+
+# Largest ?page_size= cursor-mode listings accept (shopfluence.pagination)
+MAX_PAGE_SIZE = 500
@@ -0,0 +1,109 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?omit=`` for read responses.
+
+Both take comma-separated field names, with dots reaching into nested
+serializers: ``?fields=id,name,price,category.name`` keeps four fields and
+only the name of the category, ``?omit=brand,items.product.image`` drops the
+brand and every item's product image. Unknown names are ignored.
+
+Serializers opt in with SparseFieldsMixin; the root serializer reads the
+request and hands each nested serializer its part of the spec. Views call
+``SparseFields.from_request(request).wants('path')`` to skip the joins and
+prefetches that only feed omitted fields.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_paths(value):
+    """``'a,b.c'`` -> ``{'a': None, 'b': {'c': None}}``; None marks a whole field"""
+    tree = {}
+    for path in (value or '').split(','):
+        parts = [part.strip() for part in path.split('.')]
+        if not all(parts):
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                break  # the whole field is already selected
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+class SparseFields:
+    """Which fields a response should contain; ``include`` None means every field"""
+
+    def __init__(self, include=None, omit=None):
+        self.include = include
+        self.omit = omit or {}
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        cached = getattr(request, '_sparse_fields', None)
+        if cached is None:
+            params = request.query_params
+            include = parse_paths(params.get('fields')) if params.get('fields') else None
+            cached = request._sparse_fields = cls(include or None, parse_paths(params.get('omit')))
+        return cached
+
+    def __bool__(self):
+        return self.include is not None or bool(self.omit)
+
+    def has(self, name):
+        if name in self.omit and self.omit[name] is None:
+            return False
+        return self.include is None or name in self.include
+
+    def child(self, name):
+        include = None if self.include is None else self.include.get(name)
+        return SparseFields(include, self.omit.get(name))
+
+    def wants(self, path):
+        """Whether the dotted ``path`` (or anything under it) is part of the response"""
+        spec = self
+        for name in path.split('.'):
+            if not spec.has(name):
+                return False
+            spec = spec.child(name)
+        return True
+
+
+class SparseFieldsMixin:
+    """Serializer mixin that drops the fields excluded by ``?fields=``/``?omit=`` on reads"""
+
+    def __init__(self, *args, sparse_fields=None, **kwargs):
+        self._sparse_fields = sparse_fields
+        super().__init__(*args, **kwargs)
+
+    @property
+    def sparse_fields(self):
+        if self._sparse_fields is None:
+            parent = self.parent
+            if isinstance(parent, serializers.ListSerializer):
+                parent = parent.parent
+            is_root = parent is None
+            self._sparse_fields = SparseFields.from_request(self.context.get('request')) if is_root else SparseFields()
+        return self._sparse_fields
+
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self.sparse_fields
+        if not spec:
+            return fields
+        for name in list(fields):
+            if not spec.has(name):
+                del fields[name]
+                continue
+            field = fields[name]
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, SparseFieldsMixin):
+                nested._sparse_fields = spec.child(name)
+        return fields
+
+    def sparse_child(self, name):
+        """Spec for a nested serializer built by hand, e.g. in a SerializerMethodField"""
+        return self.sparse_fields.child(name)
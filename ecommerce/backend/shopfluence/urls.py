@@ -1,11 +1,16 @@
 """
 URL configuration for shopfluence project.
 """
+import re
+from urllib.parse import urlsplit
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from products import renditions
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
@@ -18,6 +23,12 @@ urlpatterns = [
     
 ]
 
+# Product image renditions are immutable, so they are served with long-lived cache headers
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns.append(re_path(
+        rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}{renditions.DIRECTORY}/(?P<path>.+)$', renditions.serve,
+    ))
+
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_advised_indexes'),
+        ('wishlist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wishlistitem',
+            index=models.Index(fields=['wishlist', '-added_at'], name='wishlist_item_added_idx'),
+        ),
+    ]
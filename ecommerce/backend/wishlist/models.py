@@ -47,6 +47,9 @@ class WishlistItem(models.Model):
     class Meta:
         unique_together = ['wishlist', 'product']
         ordering = ['-added_at']
+        indexes = [
+            models.Index(fields=['wishlist', '-added_at'], name='wishlist_item_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} in {self.wishlist}"
@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from .models import Wishlist, WishlistItem
-from products.serializers import ProductListSerializer
+from products.serializers import ProductCardSerializer
+from shopfluence.sparse_fields import SparseFieldsMixin
 
 
-class WishlistItemSerializer(serializers.ModelSerializer):
+class WishlistItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for wishlist items"""
-    product = ProductListSerializer(read_only=True)
+    product = ProductCardSerializer(source='product.card', read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     is_available = serializers.BooleanField(read_only=True)
     
@@ -17,7 +18,7 @@ class WishlistItemSerializer(serializers.ModelSerializer):
         return obj.product.is_in_stock if obj.product else False
 
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for wishlist"""
     items = serializers.SerializerMethodField()
     total_items = serializers.IntegerField(read_only=True)
@@ -29,8 +30,10 @@ class WishlistSerializer(serializers.ModelSerializer):
     
     def get_items(self, obj):
         """Get wishlist items with proper serialization"""
-        items = obj.items.all()
-        return WishlistItemSerializer(items, many=True).data
+        items = obj.items.select_related('product__card')
+        return WishlistItemSerializer(
+            items, many=True, context=self.context, sparse_fields=self.sparse_child('items')
+        ).data
 
 
 class AddToWishlistSerializer(serializers.Serializer):
@@ -38,9 +41,9 @@ class AddToWishlistSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
 
 
-class WishlistItemDetailSerializer(serializers.ModelSerializer):
+class WishlistItemDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Detailed serializer for wishlist items"""
-    product = ProductListSerializer(read_only=True)
+    product = ProductCardSerializer(source='product.card', read_only=True)
     is_available = serializers.BooleanField(read_only=True)
     
     class Meta:
@@ -8,6 +8,7 @@ from .serializers import (
     WishlistItemDetailSerializer
 )
 from products.models import Product
+from shopfluence.sparse_fields import SparseFields
 
 
 class WishlistView(generics.RetrieveAPIView):
@@ -83,7 +84,10 @@ class WishlistItemDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         wishlist = get_object_or_404(Wishlist, user=self.request.user)
-        return WishlistItem.objects.filter(wishlist=wishlist)
+        items = WishlistItem.objects.filter(wishlist=wishlist)
+        if SparseFields.from_request(self.request).wants('product'):
+            items = items.select_related('product__card')
+        return items
 
 
 @api_view(['GET'])
@@ -100,7 +100,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'leaderboard_app.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50
@@ -119,3 +119,9 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only in development
+
+# Render list serializers that opt in through the compiled fast path (leaderboard_app.fast_serializers)
+COMPILED_SERIALIZERS = True
+
+# Largest ?page_size= the leaderboard listing accepts (leaderboard_app.pagination)
+LEADERBOARD_MAX_PAGE_SIZE = 1000
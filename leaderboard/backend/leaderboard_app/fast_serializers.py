@@ -0,0 +1,207 @@
+"""
+Compiled read-only representation for list serializers.
+
+DRF's ``Serializer.to_representation`` walks every readable field for every
+row: ``get_attribute`` with its exception handling, a ``PKOnlyObject`` per
+foreign key, and a ``to_representation`` call even for plain strings and
+integers. ``compile_serializer(serializer)`` does that walk once per response
+instead. Each bound field becomes a reader specialised for its type: an
+``attrgetter`` plus a builtin conversion for plain fields, the ``_id`` column
+for primary-key relations, the bound method for ``SerializerMethodField``, a
+compiled child for nested serializers. The result is a plain function from an
+object to the dict the serializer would produce. Fields it does not recognise,
+and values it cannot read directly (callables, a missing object along the
+source path, mapping rows), go through the field's own ``get_attribute`` and
+``to_representation``, so the output is the same either way.
+
+Serializers opt in with ``list_serializer_class = CompiledListSerializer`` in
+their Meta; ``many=True`` instances, in list views and nested, then render
+through the compiled function. ``COMPILED_SERIALIZERS = False`` switches back
+to DRF, which is what ``manage.py benchmark_serializers`` compares against.
+"""
+import datetime
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import ISO_8601, fields, relations, serializers
+from rest_framework.fields import SkipField
+from rest_framework.settings import api_settings
+
+# Field classes whose to_representation is a builtin conversion (None: the value itself)
+CONVERSIONS = {
+    fields.CharField: str,
+    fields.SlugField: str,
+    fields.EmailField: str,
+    fields.URLField: str,
+    fields.IntegerField: int,
+    fields.FloatField: float,
+    fields.ReadOnlyField: None,
+}
+
+# Marks a field left out of the representation, like DRF's SkipField
+SKIP = object()
+
+
+def is_enabled():
+    return getattr(settings, 'COMPILED_SERIALIZERS', True)
+
+
+def source_getter(field):
+    if field.source == '*':
+        return lambda instance: instance
+    return attrgetter('.'.join(field.source_attrs))
+
+
+def generic_reader(field):
+    """The field's own DRF path, with Serializer.to_representation's None and SkipField handling"""
+    def read(instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return SKIP
+        check_for_none = attribute.pk if isinstance(attribute, relations.PKOnlyObject) else attribute
+        return None if check_for_none is None else field.to_representation(attribute)
+    return read
+
+
+def value_reader(get, convert, fallback):
+    def read(instance):
+        try:
+            value = get(instance)
+        except AttributeError:
+            return fallback(instance)
+        if value is None:
+            return None
+        if callable(value) and not isinstance(value, models.manager.BaseManager):
+            return fallback(instance)
+        return value if convert is None else convert(value)
+    return read
+
+
+def pk_column(field):
+    """``<name>_id`` for a PrimaryKeyRelatedField over a local foreign key, else None"""
+    if type(field) is not relations.PrimaryKeyRelatedField or field.pk_field is not None:
+        return None
+    if len(field.source_attrs) != 1:
+        return None
+    model = getattr(getattr(field.parent, 'Meta', None), 'model', None)
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except (AttributeError, FieldDoesNotExist):
+        return None
+    return model_field.attname if model_field.many_to_one or model_field.one_to_one else None
+
+
+def uses_default_representation(serializer):
+    representation = type(serializer).to_representation
+    if isinstance(serializer, serializers.ListSerializer):
+        return representation in (serializers.ListSerializer.to_representation, CompiledListSerializer.to_representation)
+    return representation is serializers.Serializer.to_representation
+
+
+def field_reader(field):
+    fallback = generic_reader(field)
+
+    if isinstance(field, fields.SerializerMethodField):
+        return getattr(field.parent, field.method_name)
+
+    if isinstance(field, serializers.BaseSerializer):
+        if not uses_default_representation(field):
+            return fallback
+        get = source_getter(field)
+        if isinstance(field, serializers.ListSerializer):
+            if not uses_default_representation(field.child):
+                return fallback
+            represent_child = compile_serializer(field.child)
+
+            def represent(value):
+                rows = value.all() if isinstance(value, models.manager.BaseManager) else value
+                return [represent_child(row) for row in rows]
+        else:
+            represent = compile_serializer(field)
+        return value_reader(get, represent, fallback)
+
+    column = pk_column(field)
+    if column is not None:
+        return value_reader(attrgetter(column), None, fallback)
+
+    # Anything else that reads its value the standard way only needs the conversion
+    if type(field).get_attribute is not fields.Field.get_attribute:
+        return fallback
+    return value_reader(source_getter(field), converter(field), fallback)
+
+
+def converter(field):
+    """The cheapest function equal to ``field.to_representation`` for non-None values"""
+    field_type = type(field)
+    if field_type in CONVERSIONS:
+        return CONVERSIONS[field_type]
+    if field_type is fields.BooleanField:
+        to_representation = field.to_representation
+        return lambda value: value if value is True or value is False else to_representation(value)
+    if field_type is fields.DateTimeField:
+        return datetime_converter(field)
+    if field_type in (fields.FileField, fields.ImageField):
+        # URLs depend only on the file name (and the request), and the same
+        # category image or brand logo shows up on many rows
+        to_representation, urls = field.to_representation, {}
+
+        def file_url(value):
+            name = value.name
+            if name not in urls:
+                urls[name] = to_representation(value)
+            return urls[name]
+        return file_url
+    return field.to_representation
+
+
+def datetime_converter(field):
+    """ISO 8601 output with the field's time zone resolved once instead of per value"""
+    to_representation = field.to_representation
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return to_representation
+
+    def iso(value):
+        if type(value) is not datetime.datetime or value.utcoffset() is None:
+            return to_representation(value)
+        text = value.astimezone(field_timezone).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return iso
+
+
+def compile_serializer(serializer):
+    """A function from an instance to ``serializer.to_representation(instance)``, built once per bound serializer"""
+    compiled = getattr(serializer, '_compiled_representation', None)
+    if compiled is not None:
+        return compiled
+
+    readers = [
+        (field.field_name, field_reader(field))
+        for field in serializer.fields.values() if not field.write_only
+    ]
+
+    def represent(instance):
+        data = {}
+        for name, read in readers:
+            value = read(instance)
+            if value is not SKIP:
+                data[name] = value
+        return data
+
+    serializer._compiled_representation = represent
+    return represent
+
+
+class CompiledListSerializer(serializers.ListSerializer):
+    """ListSerializer that renders its rows through the compiled child representation"""
+
+    def to_representation(self, data):
+        if not is_enabled():
+            return super().to_representation(data)
+        rows = data.all() if isinstance(data, models.manager.BaseManager) else data
+        represent = compile_serializer(self.child)
+        return [represent(row) for row in rows]
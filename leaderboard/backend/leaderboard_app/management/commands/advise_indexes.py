@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from leaderboard_app import query_advisor
+from leaderboard_app.models import BugDiscovery, LeaderboardUser
+from leaderboard_app.views import LeaderboardListView, RecentDiscoveriesView
+
+
+def view_queryset(view_class, params=None, **kwargs):
+    """The queryset a list view builds for a GET with ``params``"""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    view = view_class(request=request, args=(), kwargs=kwargs, format_kwarg=None)
+    return view.filter_queryset(view.get_queryset())
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN for the query shapes of the leaderboard views, '
+        'flag full scans and temporary sorts, and propose indexes for them'
+    )
+
+    def shapes(self):
+        now = timezone.now()
+        yield 'leaderboard', view_queryset(LeaderboardListView, {'limit': 50})
+        yield 'user rank', LeaderboardUser.objects.filter(total_score__gt=100).order_by()
+        yield 'recent discoveries', view_queryset(RecentDiscoveriesView)
+        yield 'discoveries in the last 24h', BugDiscovery.objects.filter(discovered_at__gte=now - timedelta(days=1)).order_by()
+        yield 'user discoveries', BugDiscovery.objects.filter(user_id=1)
+        yield 'user discoveries in the last 7 days', BugDiscovery.objects.filter(
+            user_id=1, discovered_at__gte=now - timedelta(days=7)
+        ).order_by()
+
+    def handle(self, *args, **options):
+        try:
+            reports = query_advisor.advise(self.shapes())
+        except NotImplementedError as error:
+            raise CommandError(str(error))
+
+        for report in reports:
+            problems = [f'full scan of {table}' for table in report.full_scans]
+            problems += [f'temp B-tree for {clause}' for clause in report.temp_sorts]
+            status = self.style.WARNING('; '.join(problems)) if problems else self.style.SUCCESS('ok')
+            self.stdout.write(f'{report.name}: {status}')
+            if report.covered_by:
+                self.stdout.write(f'    indexed by {report.covered_by} once it is created')
+            if report.unresolved_by:
+                self.stdout.write(f'    still flagged with {report.unresolved_by}; no single index serves this shape')
+            if report.proposal:
+                self.stdout.write(f'    propose on {report.proposal.model.__name__}: {report.proposal.as_code()}')
+            if options['verbosity'] > 1:
+                self.stdout.write(f'    {report.sql}')
+                for detail in report.plan:
+                    self.stdout.write(f'      {detail}')
+
+        proposals = [report.proposal for report in reports if report.proposal]
+        self.stdout.write('')
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS('No missing indexes'))
+            return
+        self.stdout.write(self.style.WARNING(f'{len(proposals)} missing index(es):'))
+        for proposal in proposals:
+            self.stdout.write(f'  {proposal.model._meta.label}: {proposal.as_code()}')
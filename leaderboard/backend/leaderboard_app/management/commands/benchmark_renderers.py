@@ -0,0 +1,98 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from leaderboard_app import renderers
+from leaderboard_app.models import BugDiscovery, LeaderboardUser
+from leaderboard_app.renderers import FastJSONRenderer, RowStream
+from leaderboard_app.serializers import BugDiscoverySerializer, LeaderboardUserSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Render list payloads with DRF\'s JSONRenderer, with FastJSONRenderer and streamed, check the '
+        'bytes are identical and report time and peak memory of each'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Rows per payload (existing rows are repeated)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per renderer (the median is reported)')
+
+    def cases(self, rows):
+        yield 'LeaderboardUserSerializer', LeaderboardUserSerializer, LeaderboardUser.ranked()[:rows]
+        yield 'BugDiscoverySerializer', BugDiscoverySerializer, BugDiscovery.objects.select_related('user')[:rows]
+        # Raw datetime values, as hand-built responses return them
+        yield 'BugDiscovery.values()', None, BugDiscovery.objects.values(
+            'user__user_id', 'bug_identifier', 'points_awarded', 'discovered_at'
+        )[:rows]
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; FastJSONRenderer falls back to DRF'))
+        context = {'request': Request(APIRequestFactory().get('/', SERVER_NAME='localhost'))}
+        drf, fast = JSONRenderer(), FastJSONRenderer()
+        mismatches = []
+
+        self.stdout.write(
+            f'{"payload":<28}{"rows":>7}{"drf ms":>9}{"fast ms":>9}{"speedup":>9}'
+            f'{"full peak KiB":>15}{"streamed peak KiB":>19}'
+        )
+        for name, serializer_class, queryset in self.cases(options['rows']):
+            rows = list(queryset)
+            if not rows:
+                self.stdout.write(f'{name:<28}   no rows, skipped')
+                continue
+            rows = (rows * (options['rows'] // len(rows) + 1))[:options['rows']]
+
+            if serializer_class is None:
+                def payload():
+                    return {'count': len(rows), 'results': rows}
+
+                def stream():
+                    return fast.stream(payload())
+            else:
+                def payload():
+                    return {'count': len(rows), 'results': serializer_class(rows, many=True, context=context).data}
+
+                def stream():
+                    serializer = serializer_class(rows, many=True, context=context)
+                    return fast.stream({'count': len(rows), 'results': RowStream(serializer, 200)})
+
+            data = payload()
+            expected = drf.render(data)
+            drf_ms = self.median(lambda: drf.render(data), options['repeat'])
+            fast_ms = self.median(lambda: fast.render(data), options['repeat'])
+            full_peak = self.peak(lambda: len(drf.render(payload())))
+            streamed_peak = self.peak(lambda: sum(len(piece) for piece in stream()))
+
+            self.stdout.write(
+                f'{name:<28}{len(rows):>7}{drf_ms:>9.1f}{fast_ms:>9.1f}{drf_ms / max(fast_ms, 1e-6):>8.1f}x'
+                f'{full_peak / 1024:>15.0f}{streamed_peak / 1024:>19.0f}'
+            )
+            if fast.render(data) != expected or b''.join(stream()) != expected:
+                mismatches.append(name)
+
+        if mismatches:
+            raise CommandError(f'Output differs from JSONRenderer for: {", ".join(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('FastJSONRenderer and streamed output are byte-identical to JSONRenderer'))
+
+    def median(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
+
+    def peak(self, function):
+        """Peak bytes allocated while ``function`` runs"""
+        tracemalloc.start()
+        try:
+            function()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
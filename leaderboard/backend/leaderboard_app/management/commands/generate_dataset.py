@@ -0,0 +1,147 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from leaderboard_app.datagen import DEFAULT_BATCH_SIZE, ZipfSampler, bulk_insert, past_datetime
+from leaderboard_app.models import BugDiscovery, LeaderboardStats, LeaderboardUser
+
+# Vulnerability class -> base points, in the range the sample data awards
+BUG_KINDS = {
+    'XSS': 60, 'SQL_INJECTION': 90, 'CSRF': 55, 'IDOR': 80, 'XXE': 85, 'SSRF': 70, 'RACE_CONDITION': 65,
+    'AUTH_BYPASS': 100, 'PRIVILEGE_ESCALATION': 95, 'INFO_DISCLOSURE': 40, 'OPEN_REDIRECT': 35,
+    'RCE': 120, 'PATH_TRAVERSAL': 75, 'SESSION_FIXATION': 45, 'INSECURE_DESERIALIZATION': 110,
+}
+BUG_TARGETS = [
+    'LOGIN', 'SEARCH', 'CART', 'CHECKOUT', 'PROFILE', 'REVIEWS', 'WISHLIST', 'ADMIN',
+    'API', 'UPLOAD', 'ORDERS', 'PASSWORD_RESET',
+]
+HANDLE_PREFIXES = ['Cyber', 'Byte', 'Null', 'Root', 'Shadow', 'Ghost', 'Hex', 'Zero', 'Packet', 'Kernel']
+HANDLE_SUFFIXES = ['Hawk', 'Ninja', 'Hunter', 'Breaker', 'Wolf', 'Sentinel', 'Fox', 'Cipher', 'Spark', 'Owl']
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large synthetic leaderboard (users and bug discoveries) with skewed activity for load and '
+        'benchmark runs; the same --seed gives the same data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0)
+        parser.add_argument('--discoveries', type=int, default=0)
+        parser.add_argument('--bugs', type=int, default=2000, help='Distinct bug identifiers discoveries draw from')
+        parser.add_argument('--seed', type=int, default=1, help='Also tags the generated user ids')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per bulk_create')
+
+    def handle(self, *args, **options):
+        self.seed = options['seed']
+        self.prefix = f'g{self.seed}_'
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        if options['users'] and LeaderboardUser.objects.filter(user_id__startswith=self.prefix).exists():
+            raise CommandError(f'A dataset with seed {self.seed} already exists; pass another --seed')
+
+        started = time.perf_counter()
+        users = discoveries = 0
+        if options['users']:
+            users = self.generate_users(options['users'])
+        # Discoveries go to this seed's users, or to everyone when the seed has none
+        hunters = LeaderboardUser.objects.filter(user_id__startswith=self.prefix)
+        if not hunters.exists():
+            hunters = LeaderboardUser.objects.all()
+        if options['discoveries']:
+            discoveries = self.generate_discoveries(options['discoveries'], options['bugs'], hunters)
+        generated = time.perf_counter() - started
+
+        self.stdout.write('Recomputing scores and statistics...')
+        if discoveries:
+            self.recount_scores(hunters)
+        LeaderboardStats.update_stats()
+        total = users + discoveries
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {total} rows in {generated:.1f}s ({total / max(generated, 1e-6):.0f} rows/s), '
+            f'{time.perf_counter() - started:.1f}s with scores: {users} users, {discoveries} bug discoveries'
+        ))
+
+    def rng(self, purpose):
+        """Independent stream per table, so changing --discoveries leaves the generated users alone"""
+        return random.Random(f'{self.seed}:{purpose}')
+
+    def report_progress(self, model, written):
+        if written % (self.batch_size * 50) == 0:
+            self.stdout.write(f'   {written} {model._meta.verbose_name_plural}')
+
+    def generate_users(self, count):
+        rng = self.rng('users')
+
+        def users():
+            for index in range(count):
+                joined = past_datetime(rng, self.now, 365)
+                yield LeaderboardUser(
+                    user_id=f'{self.prefix}user{index:08d}',
+                    display_name=f'{rng.choice(HANDLE_PREFIXES)}{rng.choice(HANDLE_SUFFIXES)}{rng.randint(1, 999)}',
+                    created_at=joined,
+                    last_activity=joined,
+                )
+
+        return bulk_insert(LeaderboardUser, users(), self.batch_size, progress=self.report_progress)
+
+    def bug_catalog(self, count):
+        """``count`` (identifier, points) pairs: every kind on every target, numbered once those run out"""
+        kinds = list(BUG_KINDS)
+        bugs = []
+        for index in range(count):
+            kind = kinds[index % len(kinds)]
+            target = BUG_TARGETS[index // len(kinds) % len(BUG_TARGETS)]
+            series = index // (len(kinds) * len(BUG_TARGETS))
+            identifier = f'{kind}_{target}' + (f'_{series + 1}' if series else '')
+            bugs.append((identifier, BUG_KINDS[kind] + 5 * (index // len(kinds) % 4)))
+        return bugs
+
+    def generate_discoveries(self, count, bug_count, users):
+        rng = self.rng('discoveries')
+        joined = dict(users.order_by('id').values_list('id', 'created_at'))
+        if not joined:
+            raise CommandError('There are no users to credit discoveries to; pass --users')
+        # A few hunters find most bugs, and the easy bugs are found by many of them
+        hunters = ZipfSampler(sorted(joined), rng, exponent=0.9)
+        bugs = ZipfSampler(self.bug_catalog(bug_count), rng, exponent=0.9)
+        taken = set(BugDiscovery.objects.filter(user__in=users).values_list('user_id', 'bug_identifier'))
+        count = min(count, len(joined) * bug_count // 2)
+
+        def discoveries():
+            for _ in range(count):
+                user_id, (identifier, points) = hunters(), bugs()
+                attempts = 0
+                while (user_id, identifier) in taken:
+                    # Prolific hunters run out of bugs; pass the find to someone else
+                    attempts += 1
+                    user_id = rng.choice(hunters.items)
+                    if attempts > 10:
+                        identifier, points = rng.choice(bugs.items)
+                taken.add((user_id, identifier))
+                started = joined[user_id]
+                yield BugDiscovery(
+                    user_id=user_id,
+                    bug_identifier=identifier,
+                    # Report quality bonus, so hunters with the same finds still rank apart
+                    points_awarded=points + rng.randint(0, 20),
+                    discovered_at=started + (self.now - started) * rng.random() ** 0.5,
+                    description=f'Successfully identified {identifier} vulnerability',
+                )
+
+        return bulk_insert(BugDiscovery, discoveries(), self.batch_size, progress=self.report_progress)
+
+    def recount_scores(self, users):
+        """bulk_create skips BugDiscovery.save(); recompute the totals it would have kept, in one UPDATE"""
+        found = BugDiscovery.objects.filter(user=OuterRef('pk')).order_by().values('user')
+        users.update(
+            total_score=Coalesce(Subquery(found.annotate(total=Sum('points_awarded')).values('total')[:1]), 0),
+            bugs_found=Coalesce(Subquery(found.annotate(total=Count('id')).values('total')[:1]), 0),
+            last_activity=Coalesce(
+                Subquery(found.annotate(latest=Max('discovered_at')).values('latest')[:1]), F('created_at')
+            ),
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bugdiscovery',
+            index=models.Index(fields=['-discovered_at'], name='discovery_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bugdiscovery',
+            index=models.Index(fields=['user', '-discovered_at'], name='discovery_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboarduser',
+            index=models.Index(fields=['-total_score', '-bugs_found', 'created_at'], name='leaderboard_rank_idx'),
+        ),
+    ]
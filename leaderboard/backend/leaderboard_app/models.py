@@ -1,6 +1,15 @@
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
 
+# Days of discoveries listed under a user's recent discoveries
+RECENT_DAYS = 7
+
+
+def recent_since():
+    return timezone.now() - timedelta(days=RECENT_DAYS)
+
 
 class LeaderboardUser(models.Model):
     """User model for the leaderboard system"""
@@ -13,23 +22,49 @@ class LeaderboardUser(models.Model):
 
     class Meta:
         ordering = ['-total_score', '-bugs_found', 'created_at']
+        indexes = [
+            models.Index(fields=['-total_score', '-bugs_found', 'created_at'], name='leaderboard_rank_idx'),
+        ]
 
     def __str__(self):
         return f"{self.display_name} ({self.total_score} points)"
 
+    @classmethod
+    def ranked(cls):
+        """Users with their rank annotated and recent discoveries prefetched, so listing them runs no per-row queries"""
+        higher_scores = cls.objects.filter(total_score__gt=models.OuterRef('total_score')).order_by().annotate(
+            count=models.Func(models.F('pk'), function='COUNT')
+        ).values('count')
+        recent = models.Prefetch(
+            'bug_discoveries',
+            queryset=BugDiscovery.objects.filter(discovered_at__gte=recent_since()),
+            to_attr='prefetched_recent_discoveries',
+        )
+        return cls.objects.annotate(higher_scores=models.Subquery(higher_scores)).prefetch_related(recent)
+
     @property
     def rank(self):
         """Calculate user's rank based on total score"""
-        return LeaderboardUser.objects.filter(
-            total_score__gt=self.total_score
-        ).count() + 1
+        higher_scores = getattr(self, 'higher_scores', None)
+        if higher_scores is None:
+            higher_scores = LeaderboardUser.objects.filter(total_score__gt=self.total_score).count()
+        return higher_scores + 1
+
+    @property
+    def recent_discoveries(self):
+        """Bug discoveries of the last RECENT_DAYS days, newest first"""
+        prefetched = getattr(self, 'prefetched_recent_discoveries', None)
+        if prefetched is not None:
+            return prefetched
+        return list(self.bug_discoveries.filter(discovered_at__gte=recent_since()))
 
     @property
     def recent_discoveries_7d(self):
         """Count of bug discoveries in the last 7 days"""
-        from datetime import timedelta
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        return self.bug_discoveries.filter(discovered_at__gte=seven_days_ago).count()
+        prefetched = getattr(self, 'prefetched_recent_discoveries', None)
+        if prefetched is not None:
+            return len(prefetched)
+        return self.bug_discoveries.filter(discovered_at__gte=recent_since()).count()
 
 
 class BugDiscovery(models.Model):
@@ -43,6 +78,10 @@ class BugDiscovery(models.Model):
     class Meta:
         ordering = ['-discovered_at']
         unique_together = ['user', 'bug_identifier']  # Prevent duplicate bug discoveries
+        indexes = [
+            models.Index(fields=['-discovered_at'], name='discovery_recent_idx'),
+            models.Index(fields=['user', '-discovered_at'], name='discovery_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.display_name} found {self.bug_identifier} (+{self.points_awarded})"
@@ -80,9 +119,9 @@ class LeaderboardStats(models.Model):
         
         stats.total_users = LeaderboardUser.objects.count()
         stats.total_bugs_found = BugDiscovery.objects.count()
-        stats.total_points_awarded = sum(
-            user.total_score for user in LeaderboardUser.objects.all()
-        )
+        stats.total_points_awarded = LeaderboardUser.objects.aggregate(
+            total=models.Sum('total_score')
+        )['total'] or 0
         stats.save()
         return stats
 
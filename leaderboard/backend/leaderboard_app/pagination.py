@@ -0,0 +1,8 @@
+from django.conf import settings
+from rest_framework.pagination import PageNumberPagination
+
+
+class LeaderboardPagination(PageNumberPagination):
+    """Page-number pagination that lets clients ask for larger pages with ?page_size="""
+    page_size_query_param = 'page_size'
+    max_page_size = settings.LEADERBOARD_MAX_PAGE_SIZE
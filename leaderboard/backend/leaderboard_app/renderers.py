@@ -0,0 +1,210 @@
+"""
+Faster JSON rendering, and streamed list responses.
+
+``FastJSONRenderer`` is a drop-in ``JSONRenderer``: with orjson installed it
+encodes in C, handing only the values orjson does not know (``Decimal``, dates
+and times, lazy strings, querysets) to DRF's encoder so they come out exactly
+as before. Floats are the exception orjson cannot hand over: it writes NaN and
+the infinities as ``null``, where JSONRenderer refuses them, and spells
+exponents differently (``1e16`` for ``1e+16``), so data holding such a float,
+or a ``Decimal`` DRF turns into one, is rendered by JSONRenderer. Without orjson, or when the client asks for
+indented output, it is DRF's renderer.
+
+``StreamingListMixin`` streams list responses: instead of building every row's
+dict and then the whole JSON document, the rows are serialized and encoded a
+chunk at a time through a ``StreamingHttpResponse``, so the peak memory of a
+large page is one chunk. Only pages of more than one chunk are streamed (or any
+page with ``?stream=1``); smaller ones are rendered in one piece, keeping their
+Content-Length. The pagination envelope and anything a view adds to
+``response.data`` are encoded as usual. Views pick either per class, through
+``renderer_classes`` and the mixin.
+"""
+import math
+from itertools import compress, islice
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional, DRF's encoder is used instead
+    orjson = None
+
+# JSONRenderer escapes these for JavaScript; orjson writes them raw
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+# Python writes floats outside [1e-4, 1e16) with an exponent; orjson's spelling differs there
+PLAIN_FLOAT_MIN = 1e-4
+PLAIN_FLOAT_MAX = 1e16
+
+
+def plain_floats(data):
+    """
+    Whether every float in ``data`` is finite and written without an exponent, so
+    orjson writes it like json. The containers are walked a level at a time, with
+    each level's values sorted by type in C (map, compress), which keeps the check
+    well below the encoding time.
+    """
+    values = [data]
+    while values:
+        types = list(map(type, values))
+        kinds = set(types)
+        float_kinds = {kind for kind in kinds if issubclass(kind, float)}
+        if float_kinds:
+            magnitudes = [abs(value) for value in compress(values, map(float_kinds.__contains__, types)) if value]
+            # A NaN or infinity makes the sum non-finite; finite values below the maximum cannot overflow it
+            if magnitudes and not (
+                math.isfinite(sum(magnitudes))
+                and PLAIN_FLOAT_MIN <= min(magnitudes) and max(magnitudes) < PLAIN_FLOAT_MAX
+            ):
+                return False
+        container_kinds = {kind for kind in kinds if issubclass(kind, (dict, list, tuple))}
+        containers = compress(values, map(container_kinds.__contains__, types)) if container_kinds else ()
+        values = []
+        for container in containers:
+            values.extend(container.values() if isinstance(container, dict) else container)
+    return True
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes through orjson when it is installed"""
+
+    def __init__(self):
+        super().__init__()
+        self.encoder_default = self.encoder_class().default
+
+    def default(self, obj):
+        """DRF's conversion, refusing the floats orjson would write differently (Decimals become floats)"""
+        value = self.encoder_default(obj)
+        # NaN fails both comparisons
+        if value.__class__ is float and value and not PLAIN_FLOAT_MIN <= abs(value) < PLAIN_FLOAT_MAX:
+            raise TypeError(f'{value!r} is rendered by JSONRenderer')
+        return value
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if not plain_floats(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        except TypeError:
+            # Integers beyond 64 bits and the like; DRF raises if it cannot encode either
+            return super().render(data, accepted_media_type, renderer_context)
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+    def stream(self, data, renderer_context=None):
+        """Encode ``data`` piece by piece, serializing any ``RowStream`` in it a chunk at a time"""
+        if isinstance(data, RowStream):
+            yield b'['
+            first = True
+            for rows in data.chunks():
+                if rows:
+                    yield (b'' if first else b',') + self.render(rows, renderer_context=renderer_context)[1:-1]
+                    first = False
+            yield b']'
+        elif isinstance(data, dict) and any(isinstance(value, RowStream) for value in data.values()):
+            yield b'{'
+            for index, (key, value) in enumerate(data.items()):
+                yield (b',' if index else b'') + self.render(str(key), renderer_context=renderer_context) + b':'
+                yield from self.stream(value, renderer_context)
+            yield b'}'
+        elif data is None:
+            yield b'null'  # render() turns a None body into an empty response
+        else:
+            yield self.render(data, renderer_context=renderer_context)
+
+
+class RowStream:
+    """Stands in for ``serializer.data`` of a many=True serializer until the response is streamed"""
+
+    def __init__(self, serializer, chunk_size):
+        self.serializer = serializer
+        self.chunk_size = chunk_size
+
+    @property
+    def data(self):
+        return self
+
+    def chunks(self):
+        rows = self.serializer.instance
+        if isinstance(rows, QuerySet):
+            rows = rows.iterator(chunk_size=self.chunk_size)
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield self.serializer.to_representation(chunk)
+
+
+class StreamingListMixin:
+    """
+    List view mixin that streams the response when it is rendered as compact JSON by
+    FastJSONRenderer and holds more than ``stream_chunk_size`` rows, or the caller asks
+    for it with ``?stream=1``; normal pages are buffered. Errors raised while streaming
+    can only cut the response short, so views that may fail half way through their
+    rows should not use it.
+    """
+    stream_chunk_size = 200
+    stream_query_param = 'stream'
+    streamable = False
+    streaming = False
+
+    def list(self, request, *args, **kwargs):
+        self.streamable = self.should_stream(request)
+        self.streaming = False
+        return super().list(request, *args, **kwargs)
+
+    def should_stream(self, request):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if not isinstance(renderer, FastJSONRenderer):
+            return False
+        return renderer.get_indent(request.accepted_media_type, self.get_renderer_context()) is None
+
+    def stream_requested(self, request):
+        return request.query_params.get(self.stream_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def is_large(self, rows):
+        """Whether ``rows`` exceed one chunk; an unevaluated queryset (no pagination) counts as large"""
+        if isinstance(rows, QuerySet) and rows._result_cache is None:
+            return True
+        return len(rows) > self.stream_chunk_size
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if (
+            self.streamable and isinstance(serializer, ListSerializer)
+            and (self.stream_requested(self.request) or self.is_large(serializer.instance))
+        ):
+            self.streaming = True
+            return RowStream(serializer, self.stream_chunk_size)
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if not self.streaming or not isinstance(response, Response) or response.exception:
+            return response
+        renderer = response.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        streamed = StreamingHttpResponse(
+            renderer.stream(response.data, response.renderer_context),
+            status=response.status_code,
+            content_type=content_type,
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streamed[header] = value
+        return streamed
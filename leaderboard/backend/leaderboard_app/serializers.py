@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .fast_serializers import CompiledListSerializer
 from .models import LeaderboardUser, BugDiscovery, LeaderboardStats
 
 
@@ -8,12 +9,13 @@ class BugDiscoverySerializer(serializers.ModelSerializer):
     class Meta:
         model = BugDiscovery
         fields = ['id', 'bug_identifier', 'points_awarded', 'discovered_at', 'description', 'user_display_name']
+        list_serializer_class = CompiledListSerializer
 
 
 class LeaderboardUserSerializer(serializers.ModelSerializer):
     rank = serializers.ReadOnlyField()
     recent_discoveries_7d = serializers.ReadOnlyField()
-    recent_discoveries = BugDiscoverySerializer(source='bug_discoveries', many=True, read_only=True)
+    recent_discoveries = BugDiscoverySerializer(many=True, read_only=True)
     
     class Meta:
         model = LeaderboardUser
@@ -21,6 +23,7 @@ class LeaderboardUserSerializer(serializers.ModelSerializer):
             'id', 'user_id', 'display_name', 'total_score', 'bugs_found', 
             'rank', 'created_at', 'last_activity', 'recent_discoveries_7d', 'recent_discoveries'
         ]
+        list_serializer_class = CompiledListSerializer
 
 
 class LeaderboardStatsSerializer(serializers.ModelSerializer):
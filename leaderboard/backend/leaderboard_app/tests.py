@@ -1,3 +1,175 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import Count, Max, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import fast_serializers, views
+from .models import BugDiscovery, LeaderboardStats, LeaderboardUser
+from .serializers import BugDiscoverySerializer, LeaderboardUserSerializer
+
+
+def compiled_and_plain(serializer_class, instances):
+    """Rendered output of a many=True serializer through the compiled path and through DRF's own"""
+    compiled = serializer_class(instances, many=True).data
+    with override_settings(COMPILED_SERIALIZERS=False):
+        plain = serializer_class(instances, many=True).data
+    return JSONRenderer().render(compiled), JSONRenderer().render(plain)
+
+
+# The ecommerce project's package these modules are copied from, when both projects are checked out together
+SHARED_SOURCE = settings.BASE_DIR.parent.parent / 'ecommerce' / 'backend' / 'shopfluence'
+
+
+@skipUnless(SHARED_SOURCE.is_dir(), 'the ecommerce project is not checked out next to this one')
+class SharedModuleTests(SimpleTestCase):
+    """The modules copied from the ecommerce project stay verbatim copies"""
+
+    def test_copies_match(self):
+        for name in ('datagen', 'fast_serializers', 'query_advisor', 'renderers'):
+            with self.subTest(module=name):
+                copy = Path(__file__).with_name(f'{name}.py').read_text()
+                self.assertEqual(copy, (SHARED_SOURCE / f'{name}.py').read_text())
+
+
+class CompiledSerializerTests(TestCase):
+    """CompiledListSerializer renders the leaderboard exactly like DRF's ListSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        alice = LeaderboardUser.objects.create(user_id='alice', display_name='Alice')
+        bob = LeaderboardUser.objects.create(user_id='bob', display_name='Bob')
+        # Tied with Bob on score, and never found anything recent
+        LeaderboardUser.objects.create(user_id='carol', display_name='Carol', total_score=30, bugs_found=1)
+        # No discoveries at all
+        LeaderboardUser.objects.create(user_id='dave', display_name='Dave')
+        BugDiscovery.objects.create(user=alice, bug_identifier='xss', points_awarded=50, description='Stored XSS')
+        BugDiscovery.objects.create(
+            user=alice, bug_identifier='idor', points_awarded=20, discovered_at=now - timedelta(days=10),
+        )
+        BugDiscovery.objects.create(user=bob, bug_identifier='sqli', points_awarded=30)
+
+    def assertSameOutput(self, serializer_class, instances):
+        self.assertTrue(fast_serializers.is_enabled())
+        compiled, plain = compiled_and_plain(serializer_class, instances)
+        self.assertEqual(compiled, plain)
+        return compiled
+
+    def test_leaderboard_user_serializer(self):
+        # Annotated ranks with prefetched discoveries, as the list view serves them, and the per-row fallbacks
+        ranked = self.assertSameOutput(LeaderboardUserSerializer, LeaderboardUser.ranked())
+        plain = self.assertSameOutput(LeaderboardUserSerializer, LeaderboardUser.objects.all())
+        self.assertEqual(ranked, plain)
+        self.assertIn(b'"recent_discoveries":[]', plain)
+        # Only the last week's discoveries are listed, and read in one prefetch query
+        self.assertIn(b'"xss"', plain)
+        self.assertNotIn(b'"idor"', plain)
+        with self.assertNumQueries(2):
+            users = list(LeaderboardUser.ranked())
+            LeaderboardUserSerializer(users, many=True).data
+        alice = next(user for user in users if user.user_id == 'alice')
+        self.assertEqual([discovery.bug_identifier for discovery in alice.prefetched_recent_discoveries], ['xss'])
+
+    def test_bug_discovery_serializer(self):
+        self.assertSameOutput(BugDiscoverySerializer, BugDiscovery.objects.select_related('user'))
+
+
+class GenerateDatasetTests(TestCase):
+    """generate_dataset writes the requested rows and the totals BugDiscovery.save() would have kept"""
+
+    def generate(self, **options):
+        call_command('generate_dataset', batch_size=50, stdout=StringIO(), **options)
+
+    def dataset(self, seed=1):
+        users = LeaderboardUser.objects.filter(user_id__startswith=f'g{seed}_')
+        discoveries = BugDiscovery.objects.filter(user__in=users)
+        return (
+            sorted(users.values_list('user_id', 'display_name')),
+            sorted(discoveries.values_list('user__user_id', 'bug_identifier', 'points_awarded')),
+        )
+
+    def test_counts_and_totals(self):
+        LeaderboardUser.objects.create(user_id='manual', display_name='Manual')
+        self.generate(users=120, discoveries=900, bugs=60)
+        users, discoveries = self.dataset()
+        self.assertEqual((len(users), len(discoveries)), (120, 900))
+        self.assertEqual(len({(user_id, bug) for user_id, bug, _ in discoveries}), 900)
+
+        generated = LeaderboardUser.objects.filter(user_id__startswith='g1_')
+        recount = {
+            row['pk']: (row['score'] or 0, row['found'], row['latest'] or row['created_at'])
+            for row in generated.values('pk', 'created_at').annotate(
+                score=Sum('bug_discoveries__points_awarded'), found=Count('bug_discoveries'),
+                latest=Max('bug_discoveries__discovered_at'),
+            )
+        }
+        stored = {
+            row[0]: row[1:]
+            for row in generated.values_list('pk', 'total_score', 'bugs_found', 'last_activity')
+        }
+        self.assertEqual(stored, recount)
+        self.assertEqual(LeaderboardUser.objects.get(user_id='manual').bugs_found, 0)
+
+        stats = LeaderboardStats.objects.get(pk=1)
+        self.assertEqual((stats.total_users, stats.total_bugs_found), (121, 900))
+        self.assertEqual(stats.total_points_awarded, sum(points for _, _, points in discoveries))
+
+    def test_more_discoveries_for_an_existing_seed(self):
+        self.generate(users=30, discoveries=100, bugs=20)
+        self.generate(discoveries=50, bugs=20)
+        users = LeaderboardUser.objects.all()
+        self.assertEqual(BugDiscovery.objects.count(), 150)
+        self.assertEqual(
+            sum(users.values_list('total_score', flat=True)),
+            BugDiscovery.objects.aggregate(total=Sum('points_awarded'))['total'],
+        )
+        self.assertEqual(sum(users.values_list('bugs_found', flat=True)), 150)
+
+    def test_same_seed_same_data(self):
+        self.generate(users=40, discoveries=200, bugs=30)
+        first = self.dataset()
+        LeaderboardUser.objects.all().delete()
+        self.generate(users=40, discoveries=200, bugs=30)
+        self.assertEqual(self.dataset(), first)
+        with self.assertRaisesMessage(CommandError, 'seed 1 already exists'):
+            self.generate(users=10)
+        self.generate(users=40, discoveries=200, bugs=30, seed=2)
+        names = [[display_name for _, display_name in self.dataset(seed)[0]] for seed in (1, 2)]
+        self.assertNotEqual(names[0], names[1])
+
+
+class StreamedLeaderboardTests(TestCase):
+    """Leaderboard pages of more than one chunk are streamed with the bytes of a buffered page"""
+
+    def test_streamed_page(self):
+        LeaderboardUser.objects.bulk_create(
+            LeaderboardUser(user_id=f'user{index}', display_name=f'User {index}', total_score=index % 37)
+            for index in range(250)
+        )
+
+        def fetch(**params):
+            response = self.client.get('/api/leaderboard/', params)
+            self.assertEqual(response.status_code, 200)
+            return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+        response, streamed = fetch(page_size=300)
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(json.loads(streamed)['results']), 250)
+        with mock.patch.object(views.LeaderboardListView, 'stream_chunk_size', 500):
+            response, buffered = fetch(page_size=300)
+        self.assertFalse(response.streaming)
+        self.assertEqual(streamed, buffered)
+
+        response, page = fetch()
+        self.assertFalse(response.streaming)
+        response, requested = fetch(stream=1)
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(requested)['results'], json.loads(page)['results'])
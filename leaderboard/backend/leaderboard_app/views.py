@@ -12,14 +12,17 @@ from .serializers import (
     LeaderboardStatsSerializer,
     RecordBugSerializer
 )
+from .pagination import LeaderboardPagination
+from .renderers import StreamingListMixin
 
 
-class LeaderboardListView(generics.ListAPIView):
+class LeaderboardListView(StreamingListMixin, generics.ListAPIView):
     """Get the leaderboard rankings"""
     serializer_class = LeaderboardUserSerializer
+    pagination_class = LeaderboardPagination
     
     def get_queryset(self):
-        queryset = LeaderboardUser.objects.all()
+        queryset = LeaderboardUser.ranked()
         
         # Optional filtering
         search = self.request.query_params.get('search', None)
@@ -53,7 +56,7 @@ class StatsView(generics.RetrieveAPIView):
         return LeaderboardStats.update_stats()
 
 
-class RecentDiscoveriesView(generics.ListAPIView):
+class RecentDiscoveriesView(StreamingListMixin, generics.ListAPIView):
     """Get recent bug discoveries"""
     serializer_class = BugDiscoverySerializer
     
@@ -61,7 +64,7 @@ class RecentDiscoveriesView(generics.ListAPIView):
         # Default to last 24 hours
         hours = self.kwargs.get('hours', 24)
         cutoff_time = timezone.now() - timedelta(hours=hours)
-        return BugDiscovery.objects.filter(discovered_at__gte=cutoff_time)
+        return BugDiscovery.objects.filter(discovered_at__gte=cutoff_time).select_related('user')
 
 
 @api_view(['POST'])